@@ -1,86 +1,854 @@
+import gc
 import os
+import re
 import sys
+import time
+import bisect
+import pickle
+import json
+import uuid
+import hashlib
+import functools
+import itertools
+import threading
 import traceback
 import mariadb
 import shutil
+import io
+import heapq
+import math
+import statistics
+import csv
+import gzip
+import fcntl
+import socket
 import logging
+import tarfile
+import zipfile
+import click
+import xml.etree.ElementTree as ET
+from array import array
+from collections import Counter, deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
 from flask import (
-    Flask, render_template, request, jsonify,
-    url_for, send_from_directory, abort, current_app
+    Flask, render_template, request, jsonify, Response, stream_with_context,
+    url_for, send_file, send_from_directory, abort, current_app, g, has_request_context
 )
 from flask_cors import CORS
+from markupsafe import Markup
 from werkzeug.utils import secure_filename
-from werkzeug.exceptions import NotFound, BadRequest, InternalServerError
+from werkzeug.exceptions import HTTPException, NotFound, BadRequest, InternalServerError
+from werkzeug.wsgi import wrap_file
+
+try:
+    import redis  # optional: shared query-cache backend
+except ImportError:
+    redis = None
+try:
+    import numpy  # optional: vectorized charge analytics
+except ImportError:
+    numpy = None
+try:
+    import zstandard  # optional: zstd Content-Encoding for downloads
+except ImportError:
+    zstandard = None
 
 # --- Configuration ---
 # (Keep your existing BASE_DIR, UPLOAD_FOLDER, ALLOWED_EXTENSIONS, DB_CONFIG)
 BASE_DIR = Path(__file__).parent.resolve()
 UPLOAD_FOLDER = BASE_DIR / "uploads"
-UPLOAD_FOLDER.mkdir(exist_ok=True, parents=True)
 ALLOWED_EXTENSIONS = {".xml", ".tsv"}
+GAPFILL_COLUMNS = (
+    "id", "Species_Name", "growth_media", "gapfill_algorithm", "annotation_tool", "file_name", "file_link",
+    "growth_data", "growth_file", "biomass_file_5mM", "biomass_file_20mM", "Biomass_RCH1",
+)
 DB_CONFIG = {
 
 }
 
 
 # --- App & DB Initialization ---
-# (Keep your existing Flask app setup, CORS, logging, global conn, connect_db)
+# (Keep your existing Flask app setup, CORS, logging, connection pool, connect_db)
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 app.config['UPLOAD_FOLDER'] = str(UPLOAD_FOLDER)
+app.config['DB_POOL_SIZE'] = 8            # max open connections per process
+app.config['DB_POOL_MIN_IDLE'] = 1        # connections opened eagerly at startup
+app.config['DB_POOL_TIMEOUT'] = 10.0      # seconds a request waits for a free connection
+app.config['DB_POOL_IDLE_CHECK'] = 30.0   # ping a connection only if it sat idle longer than this
+app.config['DB_POOL_MAX_LIFETIME'] = 3600.0  # recycle connections older than this
+app.config['DB_REPLICAS'] = []            # read replicas, e.g. [{"host": "db-replica1"}]; other connect() arguments come from DB_CONFIG
+app.config['DB_REPLICA_MAX_LAG'] = 5.0    # seconds behind the primary before a replica stops receiving reads
+app.config['DB_REPLICA_LAG_CHECK'] = 2.0  # seconds between replication lag checks per replica
+app.config['DB_READ_YOUR_WRITES'] = 60.0  # seconds after a client's write during which its reads must include that write
+app.config['API_PAGE_SIZE'] = 100         # default ?limit= for /api/models
+app.config['API_MAX_PAGE_SIZE'] = 1000
+app.config['STREAM_FETCH_SIZE'] = 500     # rows pulled per fetchmany() when streaming
+app.config['SEARCH_MAX_RESULTS'] = 500    # rows rendered for one search
+app.config['SEARCH_SYNC_INTERVAL'] = 5.0  # seconds between incremental index syncs (picks up other workers' inserts)
+app.config['SEARCH_REBUILD_INTERVAL'] = 900.0  # seconds between full rebuilds (picks up edits made outside the app)
+app.config['QUERY_CACHE_TTL'] = 60.0      # seconds a cached read-route result stays valid
+app.config['QUERY_CACHE_MAX_ENTRIES'] = 512
+app.config['QUERY_CACHE_SHARED_URL'] = None  # e.g. "redis://localhost:6379/0" to share results across workers
+app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = 1024  # rendered results tables and pages kept in memory
+app.config['PAGE_CACHE_TTL'] = 3600.0     # seconds a rendered informational page (about, help, ...) is reused
+app.config['INGEST_BATCH_SIZE'] = 1000    # rows per executemany() when indexing SBML uploads
+app.config['JOB_WORKERS'] = 2             # background threads processing upload jobs
+app.config['JOB_MAX_ATTEMPTS'] = 3        # tries per job for transient (connection) errors
+app.config['JOB_RETRY_DELAY'] = 5.0       # seconds before the first retry, doubled each attempt
+app.config['JOB_STALE_AFTER'] = 600.0     # a running job with no heartbeat for this long is assumed crashed
+app.config['JOB_HEARTBEAT_INTERVAL'] = 15.0  # seconds between a worker's heartbeats for the jobs it runs
+app.config['JOB_STAGING_GRACE'] = 600.0   # staging dirs younger than this are never treated as orphaned
+app.config['BULK_BATCH_SIZE'] = 200       # models inserted (and committed) per batch by bulk imports
+app.config['CAS_COMPRESSION'] = "gzip"    # store uploaded objects gzip-compressed on disk (None to store raw)
+app.config['CAS_CHUNK_SIZE'] = 1024 * 1024  # bytes read/hashed/written per step when storing uploads
+app.config['RESUMABLE_UPLOAD_MAX_SIZE'] = 50 * 1024 ** 3  # largest file accepted through /api/uploads
+app.config['DOWNLOAD_COMPRESS_MIN_SIZE'] = 1024  # smaller files are always sent uncompressed
+app.config['DOWNLOAD_LEGACY_MAX_AGE'] = 0        # Cache-Control max-age for files outside the content store (revalidated via ETag)
+app.config['CHARGE_TOP_DEFAULT'] = 30     # metabolites in the top-|charge| list unless ?top= is given
+app.config['CHARGE_TOP_MAX'] = 200        # longest top-|charge| list kept in cached summaries
+app.config['CHARGE_MEMO_ENTRIES'] = 256   # charge summaries kept in memory in front of the on-disk cache
+app.config['SLOW_QUERY_SECONDS'] = 0.5    # statements slower than this are logged with their timing
+app.config['SLOW_REQUEST_SECONDS'] = 2.0  # requests slower than this are logged with their timing
+app.config['PROFILER_ENABLED'] = os.environ.get("GAPFILL_PROFILER", "") == "1"  # exposes /debug/profile
+app.config['PROFILER_INTERVAL'] = 0.005   # seconds between stack samples
+app.config['PROFILER_MAX_SECONDS'] = 60   # longest profile a single request may take
+app.config['ASGI_VIEW_THREADS'] = 16      # asgi.py: threads running Flask views (DB-bound work); size near DB_POOL_SIZE
+app.config['ASGI_IO_THREADS'] = 32        # asgi.py: threads for file reads/writes and response body iteration
+app.config['ASGI_BODY_SPOOL_SIZE'] = 1024 * 1024  # asgi.py: request bodies above this are buffered on disk
+app.config['REACTION_INDEX_SYNC_INTERVAL'] = 5.0      # seconds between incremental reaction->model index syncs
+app.config['REACTION_INDEX_REBUILD_INTERVAL'] = 900.0  # seconds between full rebuilds (picks up deleted/edited results)
+app.config['COMPARE_SYNC_INTERVAL'] = 5.0        # seconds between incremental reaction-set syncs for /api/compare
+app.config['COMPARE_REBUILD_INTERVAL'] = 900.0   # seconds between full reaction-set rebuilds
+app.config['COMPARE_MAX_MODELS'] = 200     # models per /api/compare request (the Jaccard matrix is quadratic)
+app.config['COMPARE_MAX_REACTIONS'] = 1000  # reaction ids listed per set with ?reactions=N
+app.config['GROWTH_MEMO_ENTRIES'] = 65536  # per-file column reductions kept in memory for /api/growth/aggregate
+app.config['AUTO_MIGRATE'] = True         # apply pending schema migrations when a process starts (see `flask --app app migrate`)
+app.config['MIGRATION_LOCK_TIMEOUT'] = 300  # seconds a process waits for another one's migrations to finish
+app.config['QUERY_LOG_ENABLED'] = False   # record distinct SELECTs so /api/db/query-plans can EXPLAIN live traffic
+app.config['QUERY_LOG_MAX_STATEMENTS'] = 1000
+app.config['QUERY_PLAN_CHECK_ON_STARTUP'] = False  # EXPLAIN the read routes' queries at startup and log full table scans
+app.config['PRELOAD_INDEXES'] = True      # build the search and reaction indexes once before workers fork (shared copy-on-write)
+app.config.from_prefixed_env("GAPFILL")  # e.g. GAPFILL_DB_POOL_SIZE=4 overrides any setting above
+STAGING_FOLDER = UPLOAD_FOLDER / ".staging"
+OBJECTS_FOLDER = UPLOAD_FOLDER / "objects"
+PARTIAL_FOLDER = UPLOAD_FOLDER / ".partial"
+ENCODED_CACHE_FOLDER = UPLOAD_FOLDER / ".cache" / "encoded"
+ANALYTICS_CACHE_FOLDER = UPLOAD_FOLDER / ".cache" / "analytics"
+COLUMNAR_FOLDER = UPLOAD_FOLDER / ".cache" / "columnar"
 CORS(app)
 logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 app.logger.setLevel(logging.INFO)
-conn = None
-# (Include connect_db function here)
-def connect_db():
-    global conn
-    try:
-        if conn and not getattr(conn, '_closed', True):
-             try: conn.close()
-             except mariadb.Error: pass # Ignore error closing already closed/bad conn
-        app.logger.info("Attempting to connect to MariaDB...")
-        conn = mariadb.connect(**DB_CONFIG)
-        conn.autocommit = False
-        app.logger.info("Successfully connected to MariaDB.")
+
+# --- Metrics ---
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(pairs):
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+class CounterMetric:
+    """ Monotonic counter with optional labels. """
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock: self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock: items = list(self._values.items())
+        for key, value in items: yield self.name, list(zip(self.labelnames, key)), value
+
+
+class HistogramMetric:
+    """ Prometheus-style histogram: cumulative buckets plus sum and count per label set. """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None: state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def samples(self):
+        with self._lock: items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + [("le", "+Inf" if bound == float("inf") else repr(bound))], cumulative
+            yield f"{self.name}_sum", labels, state[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """
+    In-process metric registry rendered in the Prometheus text format by /metrics.
+
+    Collectors are callables run at scrape time that yield (name, kind, help, samples)
+    tuples, where samples is a list of (labels dict, value); they export gauges read from
+    existing stats() methods (pool, caches) without duplicating that bookkeeping.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = CounterMetric(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = HistogramMetric(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+            lines += [f"{name}{_format_labels(labels)} {value:g}" if isinstance(value, float) else f"{name}{_format_labels(labels)} {value}" for name, labels, value in metric.samples()]
+        for collect in self._collectors:
+            try:
+                for name, kind, help_text, samples in collect():
+                    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                    lines += [f"{name}{_format_labels(sorted(labels.items()))} {value}" for labels, value in samples]
+            except Exception as e:
+                app.logger.warning(f"Metrics collector {collect.__name__} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP requests by endpoint, method and status.", ("endpoint", "method", "status"))
+HTTP_LATENCY = metrics.histogram("http_request_duration_seconds", "Time to produce the response (streamed bodies excluded).", ("endpoint", "method"))
+DB_QUERIES = metrics.counter("db_queries_total", "SQL statements executed, by statement kind and table.", ("statement",))
+DB_QUERY_ERRORS = metrics.counter("db_query_errors_total", "SQL statements that raised, by statement kind and table.", ("statement",))
+DB_QUERY_LATENCY = metrics.histogram("db_query_duration_seconds", "execute()/executemany() time per statement.", ("statement",))
+DB_QUERY_ROWS = metrics.counter("db_query_rows_total", "Rows fetched (SELECT) or affected (DML), by statement.", ("statement",))
+DB_SLOW_QUERIES = metrics.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_SECONDS.", ("statement",))
+DB_CURSOR_RETRIES = metrics.counter("db_cursor_retries_total", "Cursor checkouts retried on a fresh connection after a connection error.")
+UPLOAD_BYTES = metrics.counter("upload_bytes_total", "Uploaded bytes received, by path (form, chunk, bulk).", ("source",))
+UPLOAD_FILES = metrics.counter("upload_files_total", "Files stored, by path and whether the content was already stored.", ("source", "deduplicated"))
+UPLOAD_LATENCY = metrics.histogram("upload_duration_seconds", "Time spent receiving and storing an upload body or chunk.", ("source",))
+
+def record_upload(source, size, seconds, deduplicated=None):
+    UPLOAD_BYTES.inc(size, source=source)
+    UPLOAD_LATENCY.observe(seconds, source=source)
+    if deduplicated is not None: UPLOAD_FILES.inc(source=source, deduplicated=str(bool(deduplicated)).lower())
+
+_SQL_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?`?(\w+)", re.IGNORECASE)
+
+@functools.lru_cache(maxsize=1024)
+def statement_label(sql):
+    """ Low-cardinality metric label for a statement, e.g. 'SELECT gapfill_models'. """
+    verb = sql.split(None, 1)[0].upper() if sql.strip() else "OTHER"
+    match = _SQL_TABLE_RE.search(sql)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+class InstrumentedCursor:
+    """
+    Cursor proxy recording per-statement timings and row counts.
+
+    execute()/executemany() are timed into db_query_duration_seconds; rows are counted
+    as they are fetched (or from rowcount for DML), and statements slower than
+    SLOW_QUERY_SECONDS are logged. Everything else is delegated to the real cursor.
+    """
+
+    def __init__(self, cursor, replica=None):
+        self._cursor = cursor
+        self._label = None
+        self.replica = replica  # the ReplicaPool the cursor reads from, None for the primary
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def _timed(self, method, sql, args, kwargs):
+        self._label = label = statement_label(sql)
+        if query_log.enabled and label.startswith("SELECT"): query_log.record(sql, args[0] if args else ())
+        started = time.perf_counter()
+        try:
+            result = method(sql, *args, **kwargs)
+        except Exception:
+            DB_QUERY_ERRORS.inc(statement=label)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            DB_QUERIES.inc(statement=label)
+            DB_QUERY_LATENCY.observe(elapsed, statement=label)
+        if not label.startswith(("SELECT", "SHOW")) and self._cursor.rowcount and self._cursor.rowcount > 0:
+            DB_QUERY_ROWS.inc(self._cursor.rowcount, statement=label)
+        if elapsed >= app.config['SLOW_QUERY_SECONDS']:
+            DB_SLOW_QUERIES.inc(statement=label)
+            app.logger.warning(f"Slow query ({elapsed:.3f}s, {label}): {' '.join(sql.split())[:500]}")
+        return result
+
+    def execute(self, sql, *args, **kwargs):
+        return self._timed(self._cursor.execute, sql, args, kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._timed(self._cursor.executemany, sql, args, kwargs)
+
+    def _count(self, rows):
+        if rows and self._label: DB_QUERY_ROWS.inc(len(rows), statement=self._label)
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None and self._label: DB_QUERY_ROWS.inc(statement=self._label)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        return self._count(self._cursor.fetchmany(*args, **kwargs))
+
+    def fetchall(self):
+        return self._count(self._cursor.fetchall())
+
+
+class QueryLog:
+    """ Distinct SELECT statements seen while enabled, each with the parameters of its latest run, for EXPLAIN. """
+
+    def __init__(self, max_statements=1000, enabled=False):
+        self.max_statements = max_statements
+        self.enabled = enabled
+        self._statements = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, sql, params):
+        key = " ".join(sql.split())
+        with self._lock:
+            if key in self._statements or len(self._statements) < self.max_statements:
+                self._statements[key] = tuple(params or ())
+
+    def statements(self):
+        with self._lock: return list(self._statements.items())
+
+    def clear(self):
+        with self._lock: self._statements.clear()
+
+query_log = QueryLog(app.config['QUERY_LOG_MAX_STATEMENTS'], enabled=app.config['QUERY_LOG_ENABLED'])
+# Statements that read a whole table on purpose (maintenance commands, catalog-wide analytics)
+# carry this comment, so the query plan check does not report their full scans.
+FULL_SCAN_OK = "/* full-scan-ok */"
+
+
+class SamplingProfiler:
+    """
+    Opt-in statistical profiler (PROFILER_ENABLED / GAPFILL_PROFILER=1).
+
+    While running it snapshots every thread's stack through sys._current_frames() each
+    `interval` seconds and counts identical stacks, so hot paths show up in proportion
+    to the wall-clock time spent in them, including time blocked on the database.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval, self.max_depth = interval, max_depth
+        self._busy = threading.Lock()
+
+    def _stack(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{Path(code.co_filename).name}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def profile(self, seconds):
+        """ Samples for `seconds`; returns (Counter of 'a;b;c' collapsed stacks, sample rounds). Raises RuntimeError if already running. """
+        if not self._busy.acquire(blocking=False): raise RuntimeError("A profile is already running.")
+        try:
+            stacks, rounds, me = Counter(), 0, threading.get_ident()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != me: stacks[self._stack(frame)] += 1
+                rounds += 1
+                time.sleep(self.interval)
+            return stacks, rounds
+        finally:
+            self._busy.release()
+
+profiler = SamplingProfiler(interval=app.config['PROFILER_INTERVAL'])
+
+def connect_db(config=None):
+    """ Opens a new MariaDB connection with autocommit disabled. """
+    app.logger.info("Attempting to connect to MariaDB...")
+    new_conn = mariadb.connect(**(config if config is not None else DB_CONFIG))
+    new_conn.autocommit = False
+    app.logger.info("Successfully connected to MariaDB.")
+    return new_conn
+
+
+class PooledConnection:
+    """ A pooled MariaDB connection plus the bookkeeping the pool needs for health checks. """
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Thread-safe MariaDB connection pool.
+
+    Connections are handed out LIFO so the warmest one is reused first. Instead of a
+    ping per request, a connection is only pinged when it has been idle for longer
+    than `idle_check` seconds, and is recycled once it exceeds `max_lifetime`.
+    """
+
+    def __init__(self, connect, size=8, timeout=10.0, idle_check=30.0, max_lifetime=3600.0, name="primary"):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self.max_lifetime = max_lifetime
+        self._connect = connect
+        self._idle = deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._opened = 0  # connections currently open (idle + checked out + being opened)
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.connect_errors = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def acquire(self):
+        """ Checks out a healthy connection, waiting up to `timeout` seconds for one to free up. """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        entry = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._opened < self.size:
+                    self._opened += 1  # reserve a slot, the connection is opened outside the lock
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise mariadb.OperationalError(f"Timed out after {self.timeout}s waiting for a '{self.name}' DB connection ({self.size} in use).")
+                self._cond.wait(remaining)
+            self.in_use += 1
+        try:
+            entry = self._ensure_healthy(entry)
+        except Exception:
+            with self._cond:
+                self.in_use -= 1
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        waited = time.monotonic() - started
+        with self._cond:
+            self.checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+        return entry
+
+    def release(self, entry, discard=False):
+        """ Returns a connection to the pool, rolling back any open transaction first. """
+        if not discard:
+            try:
+                entry.conn.rollback()
+            except mariadb.Error as e:
+                app.logger.warning(f"Rollback on release failed, discarding connection: {e}")
+                discard = True
+        if discard:
+            self._close(entry)
+        else:
+            entry.last_used = time.monotonic()
+        with self._cond:
+            self.in_use -= 1
+            if discard:
+                self._opened -= 1
+            else:
+                self._idle.append(entry)
+            self._cond.notify()
+
+    def prefill(self, count):
+        """ Opens up to `count` idle connections ahead of the first request. """
+        for _ in range(min(count, self.size)):
+            with self._cond:
+                if self._opened >= self.size: return
+                self._opened += 1
+            try:
+                entry = PooledConnection(self._connect())
+            except mariadb.Error:
+                with self._cond:
+                    self._opened -= 1
+                    self.connect_errors += 1
+                raise
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def close_all(self):
+        """ Closes every idle connection (checked-out ones are closed when released as discarded). """
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._opened -= len(idle)
+        for entry in idle: self._close(entry)
+
+    def note_reconnect(self):
+        """ Counts a connection replaced after it failed (a health check here, or a query in get_db_cursor). """
+        with self._cond: self.reconnects += 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "name": self.name,
+                "size": self.size,
+                "open": self._opened,
+                "idle": len(self._idle),
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "reconnects": self.reconnects,
+                "connect_errors": self.connect_errors,
+                "wait_time_total_s": round(self.wait_time_total, 6),
+                "wait_time_max_s": round(self.wait_time_max, 6),
+                "wait_time_avg_s": round(self.wait_time_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+    def _ensure_healthy(self, entry):
+        now = time.monotonic()
+        if entry is not None:
+            if now - entry.created_at > self.max_lifetime:
+                app.logger.debug(f"Recycling '{self.name}' connection older than {self.max_lifetime}s.")
+                self._close(entry)
+                entry = None
+            elif now - entry.last_used > self.idle_check:
+                try:
+                    entry.conn.ping()
+                except mariadb.Error as e:
+                    app.logger.warning(f"Idle '{self.name}' connection failed health check, reconnecting: {e}")
+                    self._close(entry)
+                    entry = None
+                    self.note_reconnect()
+        if entry is None:
+            try:
+                entry = PooledConnection(self._connect())
+            except mariadb.Error:
+                with self._cond: self.connect_errors += 1
+                raise
+        return entry
+
+    @staticmethod
+    def _close(entry):
+        try: entry.conn.close()
+        except mariadb.Error: pass # Ignore error closing already closed/bad conn
+
+
+db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """ Returns the process-wide connection pool, creating it on first use. """
+    global db_pool
+    if db_pool is None:
+        with _db_pool_lock:
+            if db_pool is None:
+                db_pool = ConnectionPool(
+                    connect_db,
+                    size=app.config['DB_POOL_SIZE'],
+                    timeout=app.config['DB_POOL_TIMEOUT'],
+                    idle_check=app.config['DB_POOL_IDLE_CHECK'],
+                    max_lifetime=app.config['DB_POOL_MAX_LIFETIME'],
+                )
+    return db_pool
+
+def init_db_pool():
+    """ Creates the pool and opens the configured number of idle connections. """
+    try:
+        get_db_pool().prefill(app.config['DB_POOL_MIN_IDLE'])
     except mariadb.Error as e:
-        app.logger.error(f"FATAL: Could not connect/reconnect to MariaDB: {e}", exc_info=True)
-        conn = None
-connect_db() # Initial connect attempt
+        app.logger.error(f"FATAL: Could not connect to MariaDB while warming the pool: {e}", exc_info=True)
+    for replica in get_db_replicas().replicas:
+        try: replica.pool.prefill(app.config['DB_POOL_MIN_IDLE'])
+        except mariadb.Error as e: app.logger.error(f"Could not connect to read replica '{replica.name}': {e}")
+
+
+# --- Read Replicas ---
+class ReplicaPool:
+    """
+    A read replica's connection pool plus its replication lag.
+
+    The lag (Seconds_Behind_Master from SHOW SLAVE STATUS) is re-measured every `check_interval`
+    seconds by the router's background thread; requests only read the cached value. A replica that
+    is not replicating, lags more than `max_lag`, or has not been checked for STALE_CHECKS intervals
+    receives no reads.
+    """
+
+    STALE_CHECKS = 3
+
+    def __init__(self, pool, max_lag=5.0, check_interval=2.0):
+        self.pool = pool
+        self.name = pool.name
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None         # seconds behind the primary at the last check; None if unknown or not replicating
+        self.checked_at = 0.0   # wall-clock time of the last check
+        self.reads = 0
+        self.check_errors = 0
+        self._checking = threading.Lock()
+
+    def healthy(self):
+        fresh = time.time() - self.checked_at <= self.STALE_CHECKS * self.check_interval
+        return self.lag is not None and self.lag <= self.max_lag and fresh
+
+    def applied_through(self):
+        """ Wall-clock time up to which the replica had applied the primary's writes when last checked. """
+        # Seconds_Behind_Master has one-second resolution.
+        return self.checked_at - self.lag - 1.0 if self.lag is not None else 0.0
+
+    def usable(self, since=0.0):
+        """ True if the replica is healthy and has applied every write made up to wall-clock time `since`. """
+        return self.healthy() and self.applied_through() >= since
+
+    def mark_failed(self, error):
+        """ Takes the replica out of rotation until its next lag check. """
+        self.lag, self.checked_at = None, time.time()
+        app.logger.warning(f"Read replica '{self.name}' failed, reading from the primary until the next check: {error}")
+
+    def refresh(self):
+        """ Re-measures the lag; called from the router's background thread, never from a request. """
+        if not self._checking.acquire(blocking=False): return
+        try:
+            was_healthy, started = self.healthy(), time.time()
+            try:
+                self.lag = self._measure()
+            except mariadb.Error as e:
+                self.check_errors += 1
+                self.lag = None
+                app.logger.warning(f"Replication lag check on '{self.name}' failed: {e}")
+            self.checked_at = started
+            if was_healthy != self.healthy():
+                app.logger.log(logging.INFO if self.healthy() else logging.WARNING,
+                               f"Read replica '{self.name}' {'in' if self.healthy() else 'out of'} rotation (lag: {self.lag}s, max {self.max_lag}s).")
+        finally:
+            self._checking.release()
+
+    def _measure(self):
+        """ Seconds_Behind_Master (the largest one with multi-source replication); None if replication is not running. """
+        entry = self.pool.acquire()
+        discard = False
+        try:
+            cur = InstrumentedCursor(entry.conn.cursor())
+            cur.execute("SHOW SLAVE STATUS")
+            rows = dict_rows(cur)
+            cur.close()
+        except (mariadb.InterfaceError, mariadb.OperationalError):
+            discard = True
+            raise
+        finally:
+            self.pool.release(entry, discard=discard)
+        lags = [row.get("Seconds_Behind_Master") for row in rows]
+        return float(max(lags)) if lags and None not in lags else None
+
+
+class ReplicaRouter:
+    """
+    Spreads read-only queries round-robin over the replicas usable for the caller; None means the primary.
+    A background thread, started on first use and stopped by close_all(), keeps each replica's lag current.
+    """
+
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self._turn = itertools.count()
+        self.primary_fallbacks = 0
+        self._monitor = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """ Starts the lag checks (no-op when running or without replicas). """
+        if not self.replicas or self._monitor is not None: return
+        with self._lock:
+            if self._monitor is None:
+                self._stopping = threading.Event()
+                self._monitor = threading.Thread(target=self._check_lag, args=(self._stopping,), name="replica-lag", daemon=True)
+                self._monitor.start()
+
+    def _check_lag(self, stopping):
+        interval = min(replica.check_interval for replica in self.replicas)
+        while not stopping.is_set():
+            for replica in self.replicas:
+                try: replica.refresh()
+                except Exception as e: app.logger.error(f"Replication lag check on '{replica.name}' crashed: {e}", exc_info=True)
+            stopping.wait(interval)
+
+    def choose(self, since=0.0):
+        """ A replica that has applied every write up to `since`, or None to read from the primary. """
+        if not self.replicas: return None
+        if self._monitor is None: self.start()
+        start = next(self._turn)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.usable(since): return replica
+        self.primary_fallbacks += 1
+        return None
+
+    def close_all(self):
+        with self._lock:
+            monitor, self._monitor = self._monitor, None
+            self._stopping.set()
+        if monitor is not None and monitor is not threading.current_thread(): monitor.join(timeout=5)
+        for replica in self.replicas: replica.pool.close_all()
+
+    def stats(self):
+        return [dict(replica.pool.stats(), lag_s=replica.lag, healthy=replica.healthy(), reads=replica.reads, check_errors=replica.check_errors)
+                for replica in self.replicas]
+
+db_replicas = None
+
+def get_db_replicas():
+    """ Returns the process-wide ReplicaRouter over DB_REPLICAS (with no replicas when none are configured). """
+    global db_replicas
+    if db_replicas is None:
+        with _db_pool_lock:
+            if db_replicas is None:
+                db_replicas = ReplicaRouter([
+                    ReplicaPool(
+                        ConnectionPool(
+                            functools.partial(connect_db, {**DB_CONFIG, **replica}),
+                            size=app.config['DB_POOL_SIZE'],
+                            timeout=app.config['DB_POOL_TIMEOUT'],
+                            idle_check=app.config['DB_POOL_IDLE_CHECK'],
+                            max_lifetime=app.config['DB_POOL_MAX_LIFETIME'],
+                            name=f"replica{i + 1}",
+                        ),
+                        max_lag=app.config['DB_REPLICA_MAX_LAG'],
+                        check_interval=app.config['DB_REPLICA_LAG_CHECK'],
+                    )
+                    for i, replica in enumerate(app.config['DB_REPLICAS'])
+                ])
+    return db_replicas
 
 
 # --- Database Helper Functions ---
 # (Keep your existing get_db_cursor, dict_rows, insert_gapfill_row functions)
-def get_db_cursor():
-    global conn
+def get_db_conn(readonly=False):
+    """
+    Returns the connection checked out for the current app context, checking one out if needed.
+    With readonly=True the connection may be a read replica's (see choose_read_replica()).
+    """
+    if readonly and "db_entry" not in g:
+        entry = g.get("db_read_entry")
+        if entry is None:
+            replica = choose_read_replica()
+            if replica is not None:
+                try:
+                    entry = replica.pool.acquire()
+                except mariadb.Error as e:
+                    replica.mark_failed(e)
+                else:
+                    g.db_read_entry, g.db_read_replica = entry, replica
+                    replica.reads += 1
+        if entry is not None: return entry.conn
+    entry = g.get("db_entry")
+    if entry is None:
+        entry = get_db_pool().acquire()
+        g.db_entry = entry
+    return entry.conn
+
+def release_db_conn(discard=False):
+    """ Hands the current app context's connections (primary and replica) back to their pools. """
+    entry = g.pop("db_entry", None)
+    if entry is not None:
+        get_db_pool().release(entry, discard=discard)
+    release_read_conn(discard)
+
+def release_read_conn(discard=False):
+    entry, replica = g.pop("db_read_entry", None), g.pop("db_read_replica", None)
+    if entry is not None: replica.pool.release(entry, discard=discard)
+
+LAST_WRITE_COOKIE = "gapfill_last_write"
+
+def note_write(at=None):
+    """ Records that this client's data just changed; the response then tells it when (see read_since()). """
+    g.db_wrote_at = max(g.get("db_wrote_at", 0.0), at or time.time())
+
+def read_since():
+    """ Time of the client's last write (X-Last-Write header or cookie) while within DB_READ_YOUR_WRITES, else 0. """
+    try:
+        wrote_at = float(request.headers.get("X-Last-Write") or request.cookies.get(LAST_WRITE_COOKIE) or 0)
+    except ValueError:
+        return 0.0
+    return wrote_at if time.time() - wrote_at < app.config['DB_READ_YOUR_WRITES'] else 0.0
+
+def choose_read_replica():
+    """ The replica serving this request's read-only queries, or None for the primary. """
+    # Jobs and CLI commands read back what they wrote, and a request already on the primary stays there.
+    if not app.config['DB_REPLICAS'] or not has_request_context() or "db_entry" in g: return None
+    return get_db_replicas().choose(read_since())
+
+def get_db_cursor(readonly=False, **cursor_kwargs):
+    """ A cursor on the app context's connection; readonly=True lets SELECT-only work go to a read replica. """
     MAX_RETRIES = 2
     for attempt in range(MAX_RETRIES):
         try:
-            is_closed = getattr(conn, '_closed', True)
-            if conn is None or is_closed:
-                app.logger.warning(f"DB connection is None or closed (Attempt {attempt + 1}/{MAX_RETRIES}). Reconnecting.")
-                connect_db()
-                if conn is None: raise mariadb.OperationalError("Database reconnection failed.")
-            conn.ping()
-            app.logger.debug("DB connection ping successful.")
-            return conn.cursor()
+            conn = get_db_conn(readonly)
+            return InstrumentedCursor(conn.cursor(**cursor_kwargs), replica=g.get("db_read_replica") if readonly and "db_entry" not in g else None)
         except (mariadb.Error, mariadb.InterfaceError, mariadb.OperationalError) as e:
             app.logger.error(f"DB Error in get_db_cursor (Attempt {attempt + 1}/{MAX_RETRIES}): {e}", exc_info=False)
+            replica = g.get("db_read_replica") if readonly and "db_entry" not in g else None
+            if replica is not None:
+                replica.mark_failed(e)  # the retry reads from another replica or the primary
+                release_read_conn(discard=True)
+                had_conn = False
+            else:
+                had_conn = "db_entry" in g
+                release_db_conn(discard=True)
             if attempt < MAX_RETRIES - 1:
-                 app.logger.warning("Retrying DB connection...")
-                 conn = None; connect_db()
+                app.logger.warning("Retrying with a fresh pooled connection...")
+                DB_CURSOR_RETRIES.inc()
+                if had_conn: get_db_pool().note_reconnect()
             else:
                 app.logger.error("Max DB connection retries reached. Raising error.")
                 raise
-        except AttributeError as ae:
-             app.logger.error(f"AttributeError getting DB cursor: {ae}", exc_info=True)
-             raise mariadb.InterfaceError("Internal error checking DB connection state.") from ae
         except Exception as e:
-             app.logger.error(f"Unexpected error in get_db_cursor: {e}", exc_info=True)
-             raise
+            app.logger.error(f"Unexpected error in get_db_cursor: {e}", exc_info=True)
+            raise
     raise mariadb.OperationalError("Failed to get DB cursor after multiple retries.")
 
 def dict_rows(cur):
@@ -96,14 +864,36 @@ def dict_rows(cur):
         app.logger.error(f"Error processing results in dict_rows: {e}", exc_info=True)
         return []
 
-def insert_gapfill_row(cur, meta):
-    sql = """
+def iter_dict_rows(cur, batch_size=None):
+    """ Generator version of dict_rows: pulls rows with fetchmany() so memory stays bounded. """
+    if not cur.description: return
+    cols = [d[0] for d in cur.description]
+    batch_size = batch_size or app.config['STREAM_FETCH_SIZE']
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows: return
+        for row in rows: yield dict(zip(cols, row))
+
+def parse_fields_param(raw, allowed=GAPFILL_COLUMNS):
+    """ Parses a ?fields=a,b,c projection, always keeping 'id'. Raises BadRequest on unknown columns. """
+    if not raw: return list(allowed)
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown: raise BadRequest(f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}.")
+    if "id" not in fields: fields.insert(0, "id")
+    return list(dict.fromkeys(fields))
+
+INSERT_GAPFILL_SQL = """
     INSERT INTO gapfill_models
       (Species_Name, growth_media, gapfill_algorithm, annotation_tool, file_name, file_link,
        growth_data, growth_file, biomass_file_5mM, biomass_file_20mM)
     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """
-    values_tuple = (
+INSERT_GAPFILL_ROW = "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+INSERT_ROWS_PER_STATEMENT = 1000  # keeps a multi-row INSERT well under the 65535 placeholder limit
+
+def gapfill_values(meta):
+    return (
         meta.get("Species_Name", "P.simiae"),
         meta.get("growth_media"),
         meta.get("gapfill_algorithm"),
@@ -115,198 +905,1581 @@ def insert_gapfill_row(cur, meta):
         meta.get("biomass_file_5mM"),
         meta.get("biomass_file_20mM"),
     )
-    app.logger.debug(f"Executing SQL: {sql} with values: {values_tuple}")
+
+def _constraint_error(e):
+    """ Maps MariaDB constraint errnos to a user-facing IntegrityError, or returns None. """
+    if e.errno == 1048:
+        try: column_name = str(e).split("'")[1]
+        except IndexError: column_name = "a required field"
+        return mariadb.IntegrityError(f"Database Constraint Error: '{column_name}' cannot be empty.")
+    if e.errno == 1062: return mariadb.IntegrityError(f"Database Constraint Error: Duplicate entry detected.")
+    return None
+
+def insert_gapfill_row(cur, meta):
+    values_tuple = gapfill_values(meta)
+    app.logger.debug(f"Inserting gapfill_models row for file_link={meta.get('file_link')!r}")
     try:
-        cur.execute(sql, values_tuple)
-        app.logger.info(f"Insert successful, last row ID: {cur.lastrowid}")
+        cur.execute(INSERT_GAPFILL_SQL, values_tuple)
+        app.logger.debug(f"Insert successful, last row ID: {cur.lastrowid}")
         return cur.lastrowid
     except mariadb.Error as e:
          current_app.logger.error(f"Error inserting data: {e} with meta keys: {list(meta.keys())}", exc_info=True)
-         if e.errno == 1048:
-              try: column_name = str(e).split("'")[1]
-              except IndexError: column_name = "a required field"
-              raise mariadb.IntegrityError(f"Database Constraint Error: '{column_name}' cannot be empty.")
-         elif e.errno == 1062: raise mariadb.IntegrityError(f"Database Constraint Error: Duplicate entry detected.")
-         else: raise
+         raise _constraint_error(e) or e
 
+def insert_gapfill_rows(cur, metas):
+    """
+    Inserts many gapfill_models rows with multi-row INSERTs and returns their ids in order.
 
-# --- Teardown Function ---
-# (Keep existing teardown)
-@app.teardown_appcontext
-def close_db_connection(exception=None):
-    if exception: app.logger.error(f"App teardown with exception: {exception}", exc_info=True)
-    pass
+    LAST_INSERT_ID() is the first id a multi-row INSERT generated, and InnoDB gives the
+    statement a consecutive range (innodb_autoinc_lock_mode 0 or 1, MariaDB's default), so
+    the ids follow from it without reading rows back that a concurrent upload of the same
+    file could also match.
+    """
+    ids = []
+    for start in range(0, len(metas), INSERT_ROWS_PER_STATEMENT):
+        chunk = metas[start:start + INSERT_ROWS_PER_STATEMENT]
+        try:
+            cur.execute(INSERT_GAPFILL_SQL.replace(INSERT_GAPFILL_ROW, ", ".join([INSERT_GAPFILL_ROW] * len(chunk))),
+                        tuple(value for meta in chunk for value in gapfill_values(meta)))
+        except mariadb.Error as e:
+            raise _constraint_error(e) or e
+        if cur.rowcount != len(chunk): raise mariadb.DatabaseError(f"Inserted {cur.rowcount} of {len(chunk)} gapfill_models rows.")
+        cur.execute("SELECT LAST_INSERT_ID(), @@auto_increment_increment")
+        first_id, step = cur.fetchone()
+        ids.extend(range(first_id, first_id + step * len(chunk), step))
+    return ids
 
-# --- Health check ---
-# (Keep existing ping)
-@app.route("/ping")
-def ping(): return "pong", 200
+def build_gapfill_meta(main_filename, main_relative_path, form_data, optional_paths, species_name=None):
+    """ Assembles the gapfill_models column values for one upload. """
+    return {
+        "Species_Name": species_name or "P.simiae",
+        "growth_media": form_data.get("growth_media"),
+        "gapfill_algorithm": form_data.get("gapfill_algorithm"),
+        "annotation_tool": form_data.get("annotation_tool"),
+        "file_name": main_filename,
+        "file_link": main_relative_path,
+        "growth_data": form_data.get("growth_data"),
+        "growth_file": optional_paths.get('growth_file'),
+        "biomass_file_5mM": optional_paths.get('biomass_file_5mM'),
+        "biomass_file_20mM": optional_paths.get('biomass_file_20mM'),
+        "Biomass_RCH1": None,
+    }
 
-# --- Web UI Routes ---
 
-# --- SQL Demo page ---
-@app.route("/demo")
-def demo_queries():
-    cur = None
-    metabolic_reactions, gapfill_reactions, experiments = [], [], []
-    try:
-        cur = get_db_cursor()
+# --- Query Result Cache ---
+class LocalCacheBackend:
+    """ Thread-safe in-process LRU with per-entry TTL. """
 
-        # Metabolic Reactions
-        cur.execute("SELECT reaction_id, reaction_name, metabolites, flux_value FROM metabolic_reactions WHERE organism_id = 'Ecoli_K12'")
-        metabolic_reactions = dict_rows(cur)
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.evictions = 0
 
-        # Gap-Filling Reactions
-        cur.execute("SELECT model_id, reaction_id, reaction_name, source_database FROM gap_filling_results WHERE model_id = 'Model_123'")
-        gapfill_reactions = dict_rows(cur)
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None: return None
+            if item[0] < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
 
-        # Experimental Conditions
-        cur.execute("SELECT experiment_id, media_composition, temperature, growth_outcome FROM experimental_conditions WHERE experiment_id = 'Exp_20250321'")
-        experiments = dict_rows(cur)
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
 
-    except Exception as e:
-        app.logger.error(f"Error executing demo queries: {e}", exc_info=True)
-    finally:
-        if cur:
-            try: cur.close()
-            except: pass
+    def delete(self, key):
+        with self._lock: self._entries.pop(key, None)
 
-    return render_template(
-        "demo_queries.html",
-        metabolic_reactions=metabolic_reactions,
-        gapfill_reactions=gapfill_reactions,
-        experiments=experiments,
-        current_year=datetime.now().year
-    )
+    def __len__(self):
+        return len(self._entries)
 
 
+class SharedCacheBackend:
+    """
+    Cache backend shared by every worker process, on top of a Redis-style client.
 
-#Linked Databases such as KEGG 
-@app.route('/linked_databases')
-def linked_databases():
-    """Renders the Linked Databases page."""
-    app.logger.info("Rendering Linked Databases page")
-    return render_template('linked_databases.html', current_year=datetime.now().year)
+    Only get(key), set(key, value, ex=seconds), delete(key) and incr(key) are used, so
+    a local stand-in with the same methods (see InMemoryCacheClient) can replace Redis
+    in development and tests.
+    """
 
-#Intro page, brand spanking new
-@app.route('/intro')
-def intro():
-    """Renders the Introduction page."""
-    app.logger.info("Rendering Introduction page")
-    return render_template('intro.html', current_year=datetime.now().year)
+    def __init__(self, client, prefix="gapfill:qc:"):
+        self.client = client
+        self.prefix = prefix
+        self.evictions = 0  # expiry happens inside the shared store and is not observable here
 
-# KEEP Existing route for main page (index/search/upload)
-@app.route("/")
-def index():
-    """ Renders the main page, showing the latest 5 models. """
-    # (Keep existing code for this function)
-    models = []
-    error_message = None
-    cur = None
-    try:
-        app.logger.info(f"Request received for index route '/'")
-        cur = get_db_cursor()
-        cur.execute("SELECT * FROM gapfill_models ORDER BY id DESC LIMIT 5")
-        models = dict_rows(cur)
-        app.logger.info(f"Retrieved {len(models)} models for index display.")
-    except (mariadb.Error, mariadb.InterfaceError, mariadb.OperationalError) as db_e:
-        app.logger.error(f"Database error retrieving models for index: {db_e}", exc_info=True)
-        error_message = "Database connection or query error retrieving models. Please try again later."
-    except Exception as e:
-        app.logger.error(f"Unexpected error in index(): {e}", exc_info=True)
-        error_message = "An unexpected server error occurred while retrieving models."
-    finally:
-        if cur:
-            try: cur.close()
-            except mariadb.Error as e: app.logger.error(f"Error closing cursor in index(): {e}", exc_info=True)
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
 
-    return render_template(
-        "index.html",
-        search_results=models,
-        media_search=None, # Indicate no search was performed
-        current_year=datetime.now().year,
-        error_message=error_message
-    )
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=max(1, int(ttl)))
 
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
 
-# KEEP Existing search route
-@app.route("/search", methods=["POST"])
-def search():
-    """ Handles searching models by growth media and renders the results using index.html. """
-    models = []
-    term = request.form.get("media_search", "").strip()
-    growth_filter = request.form.get("growth_filter", "all")
-    error_message = None
-    cur = None
-    app.logger.info(f"Handling search request for term: '{term}'")
-    try:
-        cur = get_db_cursor()
-        # Build dynamic query based on growth_filter
-        query = "SELECT * FROM gapfill_models WHERE growth_media LIKE ?"
-        params = [f"%{term}%"]
-        if growth_filter == "growth":
-            query += " AND growth_data = ?"
-            params.append("Growth")
-        elif growth_filter == "no_growth":
-            query += " AND (growth_data != ? OR growth_data IS NULL)"
-            params.append("Growth")
-        query += " ORDER BY id DESC"
-        cur.execute(query, tuple(params))
-        models = dict_rows(cur)
-        app.logger.info(f"Found {len(models)} models matching search term '{term}' and filter '{growth_filter}'.")
-    except (mariadb.Error, mariadb.InterfaceError, mariadb.OperationalError) as db_e:
-        app.logger.error(f"Database error during search for '{term}': {db_e}", exc_info=True)
-        error_message = f"Database error during search for '{term}'. Please try again later."
-    except Exception as e:
-        app.logger.error(f"Unexpected error in search(): {e}", exc_info=True)
-        error_message = f"Search failed for '{term}' due to a server error."
-    finally:
-        if cur:
-             try: cur.close()
-             except mariadb.Error as e: app.logger.error(f"Error closing cursor in search(): {e}", exc_info=True)
+    def incr(self, key):
+        """ Atomically increments a counter (stored as a plain integer, not pickled) and returns the new value. """
+        return int(self.client.incr(self.prefix + key))
 
-    return render_template(
-        "index.html", # Still render index.html for search results
-        search_results=models,
-        media_search=term, # Pass the search term back
-        growth_filter=growth_filter,
-        current_year=datetime.now().year,
-        error_message=error_message
-    )
+    def get_counter(self, key):
+        raw = self.client.get(self.prefix + key)
+        return int(raw) if raw is not None else None
 
-# --- ADD New Routes ---
 
-@app.route('/about')
-def about():
-    """Renders the About page."""
-    app.logger.info("Rendering About page")
-    # Can add logic here to fetch data if needed for the about page
-    return render_template('about.html', current_year=datetime.now().year)
+class InMemoryCacheClient:
+    """ Minimal stand-in for a Redis client (get/set with ex=/delete/incr). """
 
-@app.route('/help')
-def help_page():
-    """Renders the Help page."""
-    app.logger.info("Rendering Help page")
-    # Can add logic here if needed
-    return render_template('help.html', current_year=datetime.now().year)
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
 
-# Optional: Add a /files route similar to teammate's, but maybe query DB?
-# @app.route('/files')
-# def files():
-#     """Lists all available models from database (example)."""
-#     all_models = []
-#     error_message = None
-#     cur = None
-#     try:
-#         app.logger.info("Fetching all models for /files page")
-#         cur = get_db_cursor()
-#         # Fetch necessary columns, including paths/filenames
-#         cur.execute("SELECT id, file_name, file_link, growth_file, biomass_file_5mM, biomass_file_20mM FROM gapfill_models ORDER BY id DESC")
-#         all_models = dict_rows(cur)
-#     except Exception as e:
-#         app.logger.error(f"Error fetching models for /files page: {e}", exc_info=True)
-#         error_message = "Could not retrieve file list."
-#     finally:
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (item[0] is not None and item[0] < time.time()): return None
+            return item[1]
+
+    def set(self, key, value, ex=None):
+        with self._lock: self._data[key] = (time.time() + ex if ex else None, value)
+
+    def delete(self, key):
+        with self._lock: self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            value = int(item[1]) + 1 if item is not None else 1
+            self._data[key] = (None, str(value).encode())
+            return value
+
+
+class QueryCache:
+    """
+    Result cache for read-only queries, keyed on normalized SQL plus parameters.
+
+    Lookups go to the local LRU first, then to the optional shared backend. Every key
+    also embeds a generation number for each table the query reads; invalidate(table)
+    bumps that generation (in the shared backend too, so other workers see it), which
+    makes every older entry for the table unreachable without scanning for it.
+    """
+
+    def __init__(self, local, shared=None, ttl=60.0):
+        self.local = local
+        self.shared = shared
+        self.ttl = ttl
+        self._generations = {}
+        self._invalidated_at = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.shared_hits = self.invalidations = 0
+
+    @staticmethod
+    def normalize_sql(sql):
+        return " ".join(sql.split())
+
+    def generation(self, table):
+        if self.shared is not None:
+            try:
+                gen = self.shared.get_counter(f"generation:{table}")
+                if gen is not None: return gen
+            except Exception as e:
+                app.logger.warning(f"Shared cache unavailable reading generation for '{table}': {e}")
+        return self._generations.get(table, 0)
+
+    def make_key(self, sql, params, tables):
+        gens = ",".join(f"{t}@{self.generation(t)}" for t in sorted(tables))
+        raw = f"{self.normalize_sql(sql)}|{params!r}|{gens}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                app.logger.warning(f"Shared cache get failed: {e}")
+                value = None
+            if value is not None:
+                self.shared_hits += 1
+                self.local.set(key, value, self.ttl)
+        with self._lock:
+            if value is None: self.misses += 1
+            else: self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            try: self.shared.set(key, value, ttl)
+            except Exception as e: app.logger.warning(f"Shared cache set failed: {e}")
+
+    def invalidate(self, *tables):
+        """ Drops every cached result that read from any of `tables`. """
+        with self._lock:
+            now = time.time()
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                self._invalidated_at[table] = now
+                if self.shared is not None:
+                    try:
+                        # INCR, not get-then-set: two workers invalidating at once must both move the generation.
+                        self._generations[table] = self.shared.incr(f"generation:{table}")
+                        self.shared.set(f"at:{table}", now, 30 * 24 * 3600)
+                    except Exception as e: app.logger.warning(f"Shared cache invalidation failed for '{table}': {e}")
+            self.invalidations += 1
+
+    def invalidated_at(self, tables):
+        """ Wall-clock time of the latest invalidate() of any of `tables` (0 if none). """
+        latest = 0.0
+        for table in tables:
+            at = None
+            if self.shared is not None:
+                try: at = self.shared.get(f"at:{table}")
+                except Exception as e: app.logger.warning(f"Shared cache unavailable reading invalidation time for '{table}': {e}")
+            latest = max(latest, at if at is not None else self._invalidated_at.get(table, 0.0))
+        return latest
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_hits": self.shared_hits,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.local.evictions + getattr(self.shared, "evictions", 0),
+            "invalidations": self.invalidations,
+            "entries": len(self.local),
+            "max_entries": self.local.max_entries,
+            "shared_backend": type(self.shared.client).__name__ if self.shared is not None else None,
+        }
+
+def build_query_cache():
+    shared = None
+    url = app.config['QUERY_CACHE_SHARED_URL']
+    if url:
+        if redis is None:
+            app.logger.warning("QUERY_CACHE_SHARED_URL is set but the 'redis' package is not installed; using the local cache only.")
+        else:
+            shared = SharedCacheBackend(redis.Redis.from_url(url))
+    return QueryCache(LocalCacheBackend(app.config['QUERY_CACHE_MAX_ENTRIES']), shared, ttl=app.config['QUERY_CACHE_TTL'])
+
+query_cache = build_query_cache()
+
+def cached_query(sql, params=(), tables=("gapfill_models",), ttl=None):
+    """ Runs a read-only query through the result cache (on a read replica if one is usable); `tables` lists every table it reads. """
+    key = query_cache.make_key(sql, tuple(params), tables)
+    rows = query_cache.get(key)
+    if rows is not None: return list(rows)
+    cur = get_db_cursor(readonly=True)
+    try:
+        cur.execute(sql, tuple(params))
+        rows = dict_rows(cur)
+    finally:
+        try: cur.close()
+        except mariadb.Error as e: app.logger.error(f"Error closing cursor in cached_query(): {e}", exc_info=True)
+    # A replica that has not yet applied the write behind the last invalidation would pin
+    # pre-write rows under the new generation: serve them, but don't cache them.
+    if cur.replica is None or cur.replica.applied_through() >= query_cache.invalidated_at(tables):
+        query_cache.set(key, rows, ttl)
+    return list(rows)
+
+
+# --- Search Index ---
+# Weight of a match in each indexed column; growth media is what users search for most.
+SEARCH_FIELDS = {"growth_media": 3.0, "gapfill_algorithm": 1.0, "annotation_tool": 1.0, "Species_Name": 1.0}
+# Short names accepted in "field:term" queries, e.g. "glucose algorithm:seed tool:rast".
+SEARCH_FIELD_ALIASES = {
+    "media": "growth_media", "growth_media": "growth_media",
+    "algorithm": "gapfill_algorithm", "gapfill_algorithm": "gapfill_algorithm",
+    "tool": "annotation_tool", "annotation": "annotation_tool", "annotation_tool": "annotation_tool",
+    "species": "Species_Name", "species_name": "Species_Name",
+}
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+def _insert_ordered(ordered, value):
+    """ Inserts into a sorted array; new ids are the largest, so this is normally an append. """
+    if not ordered or ordered[-1] < value: ordered.append(value)
+    else: ordered.insert(bisect.bisect_left(ordered, value), value)
+
+class SearchIndex:
+    """
+    In-process inverted index over the searchable gapfill_models columns.
+
+    Each field keeps token -> set(model ids) postings plus a sorted vocabulary, so a
+    query term is matched as a token prefix with a bisect instead of a table scan.
+    Model ids are also kept in id order, so an empty query pages from the newest end.
+    The index is loaded from the database on first use, extended incrementally with
+    `id > max_id` syncs (cheap on the primary key) and by add_document() on insert.
+    Database reads happen outside the lock: a rebuild fills a fresh index and swaps it in,
+    so queries keep using the current one meanwhile.
+    """
+    _STATE = ("_postings", "_vocab", "_all_ids", "_growth_ids", "_ordered_ids", "_ordered_growth_ids", "max_id")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._pending = None  # add_document() calls made while a rebuild is running, replayed on the new index
+        self._reset()
+
+    def _reset(self):
+        self._postings = {field: {} for field in SEARCH_FIELDS}
+        self._vocab = {field: [] for field in SEARCH_FIELDS}
+        self._all_ids = set()
+        self._growth_ids = set()
+        self._ordered_ids = array("q")
+        self._ordered_growth_ids = array("q")
+        self.max_id = 0
+        self.loaded_at = None
+        self.synced_at = 0.0
+
+    def add_document(self, model_id, row):
+        """ Indexes one gapfill_models row (a dict with the SEARCH_FIELDS columns and growth_data). """
+        with self._lock:
+            if self._pending is not None: self._pending.append((model_id, row))
+            if model_id not in self._all_ids:
+                self._all_ids.add(model_id)
+                _insert_ordered(self._ordered_ids, model_id)
+            if row.get("growth_data") == "Growth" and model_id not in self._growth_ids:
+                self._growth_ids.add(model_id)
+                _insert_ordered(self._ordered_growth_ids, model_id)
+            for field in SEARCH_FIELDS:
+                postings, vocab = self._postings[field], self._vocab[field]
+                for token in set(tokenize(row.get(field))):
+                    ids = postings.get(token)
+                    if ids is None:
+                        postings[token] = ids = set()
+                        bisect.insort(vocab, token)
+                    ids.add(model_id)
+            self.max_id = max(self.max_id, model_id)
+
+    def sync(self, force_rebuild=False):
+        """ Loads new rows from the database; does a full rebuild on first use or when the rebuild interval passed. """
+        def due():
+            rebuild = force_rebuild or self.loaded_at is None or now - self.loaded_at > app.config['SEARCH_REBUILD_INTERVAL']
+            return rebuild, rebuild or now - self.synced_at >= app.config['SEARCH_SYNC_INTERVAL']
+
+        now = time.monotonic()
+        if not due()[1]: return
+        # One thread syncs; the others keep querying the current index unless there is none yet.
+        if not self._sync_lock.acquire(blocking=self.loaded_at is None or force_rebuild): return
+        try:
+            rebuild, needed = due()
+            if not needed: return
+            if not rebuild:
+                added = self._load()
+                if added: app.logger.info(f"Search index picked up {added} new models.")
+                self.synced_at = now
+                return
+            with self._lock: self._pending = []
+            fresh = SearchIndex()
+            try:
+                fresh._load()
+            finally:
+                with self._lock:
+                    pending, self._pending = self._pending, None
+            with self._lock:
+                for model_id, row in pending: fresh.add_document(model_id, row)
+                for name in self._STATE: setattr(self, name, getattr(fresh, name))
+                self.loaded_at = self.synced_at = now
+            app.logger.info(f"Search index rebuilt with {len(self._all_ids)} models.")
+        finally:
+            self._sync_lock.release()
+
+    def _load(self):
+        """ Adds the rows above max_id from the database. Returns how many. """
+        columns = ", ".join(["id", "growth_data"] + list(SEARCH_FIELDS))
+        cur = get_db_cursor(readonly=True, buffered=False)
+        try:
+            cur.execute(f"SELECT {columns} FROM gapfill_models WHERE id > ? ORDER BY id", (self.max_id,))
+            added = 0
+            for row in iter_dict_rows(cur):
+                self.add_document(row["id"], row)
+                added += 1
+        finally:
+            cur.close()
+        return added
+
+    def _match(self, field, prefix):
+        """ Returns (ids, exact_ids) for every token in `field` starting with `prefix`. """
+        vocab, postings = self._vocab[field], self._postings[field]
+        ids, exact = set(), postings.get(prefix, set())
+        for i in range(bisect.bisect_left(vocab, prefix), len(vocab)):
+            token = vocab[i]
+            if not token.startswith(prefix): break
+            ids |= postings[token]
+        return ids, exact
+
+    def query(self, text, growth_filter="all", limit=None):
+        """
+        Returns (model ids ranked by relevance, best first, then newest; total matches).
+
+        Every query term must match (AND). A bare term matches a token prefix in any
+        indexed field; "field:term" restricts it to one field. An empty query returns
+        every model, newest first. growth_filter is 'all', 'growth' or 'no_growth'.
+        With `limit`, only that many ids are ranked and returned.
+        """
+        terms = []
+        for raw in text.split():
+            field = None
+            if ":" in raw:
+                alias, raw = raw.split(":", 1)
+                field = SEARCH_FIELD_ALIASES.get(alias.lower())
+                if field is None: raise ValueError(f"Unknown search field '{alias}'. Use one of: {', '.join(sorted(set(SEARCH_FIELD_ALIASES) - set(SEARCH_FIELDS)))}.")
+            terms.extend((field, token) for token in tokenize(raw))
+
+        with self._lock:
+            if not terms: return self._newest(growth_filter, limit)
+            # Scores only take a few distinct values, so ranking works on {score: ids} tiers with set operations.
+            if growth_filter == "growth": tiers = {0.0: self._growth_ids}
+            elif growth_filter == "no_growth": tiers = {0.0: self._all_ids - self._growth_ids}
+            else: tiers = {0.0: self._all_ids}
+            for field, token in terms:
+                term_tiers = self._term_tiers([field] if field else SEARCH_FIELDS, token)
+                combined = {}
+                for score, ids in tiers.items():
+                    for term_score, term_ids in term_tiers.items():
+                        both = ids & term_ids
+                        if both: combined.setdefault(score + term_score, set()).update(both)
+                tiers = combined
+                if not tiers: return [], 0
+            total = sum(len(ids) for ids in tiers.values())
+            ranked = []
+            for score in sorted(tiers, reverse=True):
+                ids, wanted = tiers[score], None if limit is None else limit - len(ranked)
+                if wanted is None or len(ids) <= wanted:
+                    ranked.extend(sorted(ids, reverse=True))
+                    continue
+                if len(ids) > len(self._ordered_ids) // 8:
+                    # A broad tier: walking the ids newest first finds the page after few misses.
+                    ranked.extend(itertools.islice((model_id for model_id in reversed(self._ordered_ids) if model_id in ids), wanted))
+                else:
+                    ranked.extend(heapq.nlargest(wanted, ids))
+                break
+        return ranked, total
+
+    def _term_tiers(self, fields, token):
+        """ {score: ids} for one query term, each id scored by its best matching field. """
+        options = []
+        for fld in fields:
+            ids, exact = self._match(fld, token)
+            # Exact token matches outrank prefix matches within the same field.
+            options += [(SEARCH_FIELDS[fld] * 1.5, exact), (SEARCH_FIELDS[fld], ids)]
+        tiers, seen = {}, set()
+        for score, ids in sorted(options, key=lambda option: -option[0]):
+            ids = ids - seen
+            if not ids: continue
+            seen |= ids
+            tiers.setdefault(score, set()).update(ids)
+        return tiers
+
+    def _newest(self, growth_filter, limit):
+        """ (ids newest first, total) for an empty query; reads only the page from the ordered ids. """
+        if growth_filter == "no_growth":
+            newest = (model_id for model_id in reversed(self._ordered_ids) if model_id not in self._growth_ids)
+            return list(itertools.islice(newest, limit)), len(self._all_ids) - len(self._growth_ids)
+        ordered = self._ordered_growth_ids if growth_filter == "growth" else self._ordered_ids
+        page = ordered[-limit:] if limit is not None and limit < len(ordered) else ordered
+        return page.tolist()[::-1], len(ordered)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": len(self._all_ids),
+                "max_id": self.max_id,
+                "tokens": {field: len(vocab) for field, vocab in self._vocab.items()},
+            }
+
+search_index = SearchIndex()
+
+def fetch_models_by_ids(cur, ids, chunk_size=500):
+    """ Fetches full gapfill_models rows for `ids`, preserving the order of `ids`. """
+    rows_by_id = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        cur.execute(f"SELECT * FROM gapfill_models WHERE id IN ({', '.join('?' * len(chunk))})", tuple(chunk))
+        for row in dict_rows(cur): rows_by_id[row["id"]] = row
+    return [rows_by_id[model_id] for model_id in ids if model_id in rows_by_id]
+
+
+# --- Content-Addressed Upload Store ---
+# Uploaded files are stored once per distinct content under objects/<aa>/<bb>/<sha256>[.gz].
+# Database columns reference them as "sha256/<digest>/<original filename>", so links still
+# end in a readable file name. Files uploaded before the store existed keep their old
+# relative paths (e.g. "xml_files/model.xml") and are resolved against UPLOAD_FOLDER.
+CAS_PREFIX = "sha256/"
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+class ContentStore:
+    """
+    Content-addressed file store with streaming SHA-256 and optional gzip on disk.
+
+    put_stream() hashes and writes in CAS_CHUNK_SIZE steps to a temp file, then renames
+    it into place atomically; content that is already stored is deduplicated. Objects
+    are never deleted by request handlers, only by the gc-objects command once nothing
+    references them.
+    """
+
+    def __init__(self, root, compression=None, chunk_size=1024 * 1024):
+        self.root = Path(root)
+        self.compression = compression
+        self.chunk_size = chunk_size
+
+    def _object_path(self, digest):
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def locate(self, digest):
+        """ Returns (path, encoding) of a stored object, or (None, None). encoding is 'gzip' or None. """
+        if not _DIGEST_RE.match(digest or ""): return None, None
+        base = self._object_path(digest)
+        gz = base.with_name(base.name + ".gz")
+        if gz.is_file(): return gz, "gzip"
+        if base.is_file(): return base, None
+        return None, None
+
+    def exists(self, digest):
+        return self.locate(digest)[0] is not None
+
+    def put_stream(self, stream):
+        """ Stores everything read from `stream`. Returns (digest, size, deduplicated). """
+        tmp_dir = self.root / ".tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp = tmp_dir / uuid.uuid4().hex
+        hasher, size = hashlib.sha256(), 0
+        try:
+            with open(tmp, "wb") as raw:
+                out = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) if self.compression == "gzip" else raw
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk: break
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                if out is not raw: out.close()
+            digest = hasher.hexdigest()
+            if self.exists(digest):
+                tmp.unlink()
+                return digest, size, True
+            final = self._object_path(digest)
+            if self.compression == "gzip": final = final.with_name(final.name + ".gz")
+            final.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, final)
+            return digest, size, False
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def put_file(self, path):
+        with open(path, "rb") as fh: return self.put_stream(fh)
+
+    def open(self, digest):
+        """ Opens a stored object for reading its original (decompressed) bytes. """
+        path, encoding = self.locate(digest)
+        if path is None: raise FileNotFoundError(f"No stored object {digest}")
+        return gzip.open(path, "rb") if encoding == "gzip" else open(path, "rb")
+
+    def iter_objects(self):
+        """ Yields (digest, path) for every stored object. """
+        if not self.root.is_dir(): return
+        for path in self.root.glob("??/??/*"):
+            digest = path.name.split(".", 1)[0]
+            if _DIGEST_RE.match(digest): yield digest, path
+
+content_store = ContentStore(OBJECTS_FOLDER, compression=app.config['CAS_COMPRESSION'], chunk_size=app.config['CAS_CHUNK_SIZE'])
+
+def make_ref(digest, filename):
+    return f"{CAS_PREFIX}{digest}/{filename}"
+
+def parse_ref(value):
+    """ Returns (digest, filename) for a "sha256/<digest>/<name>" reference, else None. """
+    if not value or not value.startswith(CAS_PREFIX): return None
+    digest, _, filename = value[len(CAS_PREFIX):].partition("/")
+    return (digest, filename) if _DIGEST_RE.match(digest) and filename else None
+
+def resolve_upload_path(relative_path):
+    """ Maps a legacy file_link/growth_file value to an absolute path inside UPLOAD_FOLDER. """
+    path = (UPLOAD_FOLDER / relative_path).resolve()
+    if UPLOAD_FOLDER not in path.parents: raise ValueError(f"Path escapes the upload folder: {relative_path}")
+    return path
+
+def open_stored_file(value):
+    """ Opens a stored file (content reference or legacy relative path) as a binary stream of its original bytes. """
+    ref = parse_ref(value)
+    if ref: return content_store.open(ref[0])
+    return open(resolve_upload_path(value), "rb")
+
+def store_upload(file_storage):
+    """ Streams an uploaded werkzeug FileStorage into the content store and returns its reference. """
+    filename = secure_filename(file_storage.filename or "")
+    if not filename: raise ValueError("Invalid filename (became empty after securing).")
+    started = time.perf_counter()
+    digest, size, deduplicated = content_store.put_stream(file_storage.stream)
+    record_upload("form", size, time.perf_counter() - started, deduplicated)
+    app.logger.debug(f"Stored '{filename}' ({size} bytes) as {digest[:12]}" + (" (deduplicated)" if deduplicated else ""))
+    return make_ref(digest, filename)
+
+def find_duplicate_model(cur, meta):
+    """ Id of an existing model with the same main file content and the same metadata, if any. """
+    cur.execute(
+        "SELECT id FROM gapfill_models WHERE file_link = ? AND growth_media <=> ? AND gapfill_algorithm <=> ?"
+        " AND annotation_tool <=> ? AND growth_data <=> ? LIMIT 1",
+        (meta["file_link"], meta.get("growth_media"), meta.get("gapfill_algorithm"), meta.get("annotation_tool"), meta.get("growth_data")),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+@app.cli.command("gc-objects")
+@click.option("--min-age-hours", type=float, default=24.0, help="Only delete objects older than this (protects in-flight uploads).")
+@click.option("--dry-run", is_flag=True)
+def gc_objects_command(min_age_hours, dry_run):
+    """ Deletes stored objects that no gapfill_models row or unfinished job references. """
+    referenced = set()
+    cur = get_db_cursor(buffered=False)
+    cur.execute(f"SELECT {FULL_SCAN_OK} file_link, growth_file, biomass_file_5mM, biomass_file_20mM FROM gapfill_models")
+    for row in iter_dict_rows(cur):
+        for value in row.values():
+            ref = parse_ref(value)
+            if ref: referenced.add(ref[0])
+    cur.close()
+    cur = get_db_cursor()
+    check_jobs_schema(cur)
+    cur.execute("SELECT payload FROM upload_jobs WHERE status IN ('queued', 'running')")
+    for (payload,) in cur.fetchall(): referenced.update(m.group(1) for m in re.finditer(r"sha256/([0-9a-f]{64})/", payload))
+    cur.close()
+    cutoff = time.time() - min_age_hours * 3600
+    removed = freed = 0
+    for digest, path in content_store.iter_objects():
+        if digest in referenced or path.stat().st_mtime > cutoff: continue
+        freed += path.stat().st_size
+        removed += 1
+        if not dry_run: path.unlink(missing_ok=True)
+    click.echo(f"{'Would remove' if dry_run else 'Removed'} {removed} unreferenced object(s), {freed} bytes.")
+    if PARTIAL_FOLDER.is_dir():
+        stale = [p for p in PARTIAL_FOLDER.iterdir() if p.stat().st_mtime < cutoff]
+        if not dry_run:
+            for path in stale: path.unlink(missing_ok=True)
+        click.echo(f"{'Would remove' if dry_run else 'Removed'} {len(stale)} abandoned partial upload file(s).")
+    for folder, label in ((ENCODED_CACHE_FOLDER, "cached compressed download(s)"), (ANALYTICS_CACHE_FOLDER, "cached charge summaries"), (COLUMNAR_FOLDER, "columnar growth/biomass table(s)")):
+        if not folder.is_dir(): continue
+        # Derived files are rebuilt on demand; drop those of deleted objects and any left unused.
+        stale = [p for p in folder.iterdir() if p.stat().st_atime < cutoff or (_DIGEST_RE.match(re.split(r"[.-]", p.name)[0]) and not content_store.exists(re.split(r"[.-]", p.name)[0]))]
+        if not dry_run:
+            for path in stale: path.unlink(missing_ok=True)
+        click.echo(f"{'Would remove' if dry_run else 'Removed'} {len(stale)} {label}.")
+
+
+# --- Resumable Uploads ---
+def _partial_paths(upload_id):
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id or ""): abort(404, "Upload not found.")
+    return PARTIAL_FOLDER / upload_id, PARTIAL_FOLDER / f"{upload_id}.json"
+
+def _partial_status(upload_id):
+    data_path, meta_path = _partial_paths(upload_id)
+    if not meta_path.is_file(): abort(404, "Upload not found.")
+    meta = json.loads(meta_path.read_text())
+    meta.update(upload_id=upload_id, offset=data_path.stat().st_size if data_path.exists() else 0)
+    return meta
+
+@app.route("/api/uploads", methods=["POST"])
+def api_upload_start():
+    """
+    Starts a chunked, resumable upload for files larger than one request allows.
+
+    JSON body: {"filename": ..., "size": total bytes (optional)}. Then PUT chunks to
+    /api/uploads/<id> with a "Content-Range: bytes start-end/total" header (or an
+    "Upload-Offset" header), GET it to learn the offset to resume from, and POST
+    /api/uploads/<id>/complete to hash it into the store and obtain its reference.
+    """
+    body = request.get_json(silent=True) or {}
+    filename = secure_filename(body.get("filename") or "")
+    if not filename: return jsonify(error="A valid 'filename' is required."), 400
+    size = body.get("size")
+    if size is not None and (not isinstance(size, int) or size < 0 or size > app.config['RESUMABLE_UPLOAD_MAX_SIZE']):
+        return jsonify(error=f"'size' must be an integer up to {app.config['RESUMABLE_UPLOAD_MAX_SIZE']} bytes."), 400
+    upload_id = uuid.uuid4().hex
+    PARTIAL_FOLDER.mkdir(parents=True, exist_ok=True)
+    data_path, meta_path = _partial_paths(upload_id)
+    data_path.touch()
+    meta_path.write_text(json.dumps({"filename": filename, "size": size, "created_at": datetime.now().isoformat()}))
+    return jsonify(upload_id=upload_id, offset=0, size=size, chunk_url=url_for("api_upload_chunk", upload_id=upload_id)), 201
+
+@app.route("/api/uploads/<upload_id>", methods=["GET"])
+def api_upload_status(upload_id):
+    """ Reports how many bytes of a resumable upload have been received. """
+    return jsonify(_partial_status(upload_id))
+
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+@app.route("/api/uploads/<upload_id>", methods=["PUT", "PATCH"])
+def api_upload_chunk(upload_id):
+    """ Appends one chunk, streamed from the request body, at the offset the client says it starts at. """
+    status = _partial_status(upload_id)
+    data_path, _ = _partial_paths(upload_id)
+    content_range = request.headers.get("Content-Range")
+    if content_range:
+        match = _CONTENT_RANGE_RE.fullmatch(content_range.strip())
+        if not match: return jsonify(error="Malformed Content-Range header."), 400
+        start = int(match.group(1))
+    else:
+        start = request.headers.get("Upload-Offset", type=int)
+        if start is None: return jsonify(error="Content-Range or Upload-Offset header required."), 400
+    limit = status["size"] if status["size"] is not None else app.config['RESUMABLE_UPLOAD_MAX_SIZE']
+    chunk_size = app.config['CAS_CHUNK_SIZE']
+    started = time.perf_counter()
+    with open(data_path, "ab") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)  # one writer per upload, across threads and worker processes
+        offset = received = fh.tell()
+        if start != offset: return jsonify(error="Chunk does not start at the current offset.", offset=offset), 409
+        while True:
+            chunk = request.stream.read(chunk_size)
+            if not chunk: break
+            if offset + len(chunk) > limit: return jsonify(error="Upload exceeds its declared size.", offset=offset), 413
+            fh.write(chunk)
+            offset += len(chunk)
+    record_upload("chunk", offset - received, time.perf_counter() - started)
+    return jsonify(upload_id=upload_id, offset=offset, size=status["size"])
+
+@app.route("/api/uploads/<upload_id>/complete", methods=["POST"])
+def api_upload_complete(upload_id):
+    """ Moves a fully received upload into the content store. Returns its reference for /api/models. """
+    status = _partial_status(upload_id)
+    data_path, meta_path = _partial_paths(upload_id)
+    if status["size"] is not None and status["offset"] != status["size"]:
+        return jsonify(error=f"Upload incomplete: {status['offset']} of {status['size']} bytes received.", offset=status["offset"]), 409
+    digest, size, deduplicated = content_store.put_file(data_path)
+    UPLOAD_FILES.inc(source="chunk", deduplicated=str(deduplicated).lower())
+    data_path.unlink(missing_ok=True)
+    meta_path.unlink(missing_ok=True)
+    return jsonify(ref=make_ref(digest, status["filename"]), sha256=digest, size=size, deduplicated=deduplicated)
+
+
+# --- SBML Ingestion ---
+# Tables filled from uploaded SBML models. metabolic_reactions gains a link back to gapfill_models.
+INGEST_SCHEMA = [
+    """ALTER TABLE metabolic_reactions
+         ADD COLUMN IF NOT EXISTS gapfill_model_id INT NULL,
+         ADD COLUMN IF NOT EXISTS reversible TINYINT(1) NULL,
+         ADD INDEX IF NOT EXISTS idx_metabolic_reactions_model (gapfill_model_id)""",
+    """CREATE TABLE IF NOT EXISTS model_metabolites (
+         id INT AUTO_INCREMENT PRIMARY KEY,
+         gapfill_model_id INT NOT NULL,
+         metabolite_id VARCHAR(255) NOT NULL,
+         metabolite_name VARCHAR(512) NULL,
+         compartment VARCHAR(64) NULL,
+         charge INT NULL,
+         formula VARCHAR(255) NULL,
+         INDEX idx_model_metabolites_model (gapfill_model_id, metabolite_id)
+       )""",
+    """CREATE TABLE IF NOT EXISTS reaction_stoichiometry (
+         id INT AUTO_INCREMENT PRIMARY KEY,
+         gapfill_model_id INT NOT NULL,
+         reaction_id VARCHAR(255) NOT NULL,
+         metabolite_id VARCHAR(255) NOT NULL,
+         coefficient DOUBLE NOT NULL,
+         INDEX idx_reaction_stoichiometry_model (gapfill_model_id, reaction_id),
+         INDEX idx_reaction_stoichiometry_metabolite (metabolite_id)
+       )""",
+]
+
+class SBMLParseError(ValueError):
+    """ Raised when an uploaded model is not well-formed SBML. """
+
+def _local(tag):
+    """ Strips the '{namespace}' prefix ElementTree puts on tags and attribute names. """
+    return tag.rsplit("}", 1)[-1]
+
+def _local_attrs(elem):
+    return {_local(k): v for k, v in elem.attrib.items()}
+
+_NOTES_CHARGE_RE = re.compile(r"CHARGE:\s*(-?\d+)")
+
+def _species_charge(elem, attrs):
+    """ Charge of an SBML species from fbc:charge/charge, falling back to COBRA-style notes. """
+    charge = attrs.get("charge")
+    if charge is None:
+        match = _NOTES_CHARGE_RE.search("".join(elem.itertext()))
+        charge = match.group(1) if match else None
+    return int(float(charge)) if charge not in (None, "") else None
+
+def iter_sbml(source):
+    """
+    Streams species and reactions out of an SBML document with iterparse.
+
+    Yields ("species", dict) and ("reaction", dict) tuples. Each element is detached
+    from its parent once handled, so memory use stays flat regardless of model size.
+    Handles SBML levels 2 and 3 (charge from fbc:charge, the charge attribute, or
+    COBRA-style "CHARGE:" notes).
+    """
+    stack = []
+    try:
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                continue
+            stack.pop()
+            tag = _local(elem.tag)
+            if tag == "species":
+                attrs = _local_attrs(elem)
+                try: charge = _species_charge(elem, attrs)
+                except (ValueError, OverflowError) as e: raise SBMLParseError(f"Invalid charge on species '{attrs.get('id')}': {e}") from e
+                yield "species", {
+                    "id": attrs.get("id"),
+                    "name": attrs.get("name"),
+                    "compartment": attrs.get("compartment"),
+                    "charge": charge,
+                    "formula": attrs.get("chemicalFormula"),
+                }
+            elif tag == "reaction":
+                attrs = _local_attrs(elem)
+                stoichiometry = []
+                for group in elem:
+                    group_tag = _local(group.tag)
+                    if group_tag not in ("listOfReactants", "listOfProducts"): continue
+                    sign = -1.0 if group_tag == "listOfReactants" else 1.0
+                    for ref in group:
+                        ref_attrs = _local_attrs(ref)
+                        if not ref_attrs.get("species"): continue
+                        try: coefficient = float(ref_attrs.get("stoichiometry", 1))
+                        except ValueError as e: raise SBMLParseError(f"Invalid stoichiometry for '{ref_attrs['species']}' in reaction '{attrs.get('id')}': {e}") from e
+                        stoichiometry.append((ref_attrs["species"], sign * coefficient))
+                yield "reaction", {
+                    "id": attrs.get("id"),
+                    "name": attrs.get("name"),
+                    "reversible": attrs.get("reversible", "true").lower() == "true",
+                    "stoichiometry": stoichiometry,
+                }
+            else:
+                continue
+            elem.clear()
+            if stack: stack[-1].remove(elem)
+    except ET.ParseError as e:
+        raise SBMLParseError(f"Invalid SBML/XML: {e}") from e
+
+def reaction_equation(stoichiometry, reversible):
+    """ Renders stoichiometry as 'a + 2 b <=> c'. """
+    def side(terms): return " + ".join(f"{abs(c):g} {m}" if abs(c) != 1 else m for m, c in terms)
+    arrow = "<=>" if reversible else "-->"
+    return f"{side([t for t in stoichiometry if t[1] < 0])} {arrow} {side([t for t in stoichiometry if t[1] > 0])}".strip()
+
+def ingest_sbml(cur, gapfill_model_id, source, organism_id=None):
+    """
+    Parses an SBML model and bulk-inserts its reactions, metabolites and stoichiometry.
+
+    Runs inside the caller's transaction; rows are flushed with executemany() every
+    INGEST_BATCH_SIZE rows. Returns a dict with the number of rows written per table.
+    The tables come from schema migration 2: DDL here would implicitly commit the caller's
+    transaction, so callers run ensure_schema_migrated() before opening it.
+    """
+    batch_size = app.config['INGEST_BATCH_SIZE']
+    sql = {
+        "metabolites": "INSERT INTO model_metabolites (gapfill_model_id, metabolite_id, metabolite_name, compartment, charge, formula) VALUES (?, ?, ?, ?, ?, ?)",
+        "reactions": "INSERT INTO metabolic_reactions (gapfill_model_id, organism_id, reaction_id, reaction_name, metabolites, reversible, flux_value) VALUES (?, ?, ?, ?, ?, ?, NULL)",
+        "stoichiometry": "INSERT INTO reaction_stoichiometry (gapfill_model_id, reaction_id, metabolite_id, coefficient) VALUES (?, ?, ?, ?)",
+    }
+    pending = {key: [] for key in sql}
+    counts = dict.fromkeys(sql, 0)
+
+    def flush(key):
+        if pending[key]:
+            cur.executemany(sql[key], pending[key])
+            counts[key] += len(pending[key])
+            pending[key] = []
+
+    for kind, item in iter_sbml(source):
+        if kind == "species":
+            pending["metabolites"].append((gapfill_model_id, item["id"], item["name"], item["compartment"], item["charge"], item["formula"]))
+        else:
+            pending["reactions"].append((gapfill_model_id, organism_id, item["id"], item["name"], reaction_equation(item["stoichiometry"], item["reversible"]), int(item["reversible"])))
+            pending["stoichiometry"].extend((gapfill_model_id, item["id"], met, coef) for met, coef in item["stoichiometry"])
+        for key in sql:
+            if len(pending[key]) >= batch_size: flush(key)
+    for key in sql: flush(key)
+    app.logger.info(f"Indexed SBML for model {gapfill_model_id}: {counts}")
+    return counts
+
+@app.cli.command("index-sbml")
+@click.option("--model-id", type=int, default=None, help="Only (re)index this gapfill_models id.")
+def index_sbml_command(model_id):
+    """ Backfills reaction/metabolite tables for XML models uploaded before server-side indexing existed. """
+    ensure_schema_migrated()
+    cur = get_db_cursor()
+    query = "SELECT id, Species_Name, file_link FROM gapfill_models WHERE file_link LIKE ?"
+    params = ["%.xml"]  # matches content references too, since they end in the original file name
+    if model_id is not None:
+        query += " AND id = ?"; params.append(model_id)
+    else:
+        query += " AND id NOT IN (SELECT DISTINCT gapfill_model_id FROM model_metabolites)"
+    cur.execute(query, tuple(params))
+    pending = dict_rows(cur)
+    for row in pending:
+        try:
+            cur.execute("DELETE FROM model_metabolites WHERE gapfill_model_id = ?", (row["id"],))
+            cur.execute("DELETE FROM metabolic_reactions WHERE gapfill_model_id = ?", (row["id"],))
+            cur.execute("DELETE FROM reaction_stoichiometry WHERE gapfill_model_id = ?", (row["id"],))
+            with open_stored_file(row["file_link"]) as source:
+                counts = ingest_sbml(cur, row["id"], source, row["Species_Name"])
+            get_db_conn().commit()
+            click.echo(f"model {row['id']}: {counts}")
+        except (OSError, ValueError, mariadb.Error) as e:
+            get_db_conn().rollback()
+            click.echo(f"model {row['id']}: FAILED ({e})", err=True)
+    query_cache.invalidate("metabolic_reactions")
+    cur.close()
+
+
+# --- Background Jobs ---
+JOBS_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS upload_jobs (
+         id CHAR(32) PRIMARY KEY,
+         kind VARCHAR(32) NOT NULL,
+         status VARCHAR(16) NOT NULL,
+         progress TINYINT NOT NULL DEFAULT 0,
+         message VARCHAR(255) NULL,
+         attempts INT NOT NULL DEFAULT 0,
+         max_attempts INT NOT NULL DEFAULT 3,
+         cancel_requested TINYINT(1) NOT NULL DEFAULT 0,
+         payload LONGTEXT NOT NULL,
+         created_files LONGTEXT NULL,
+         result LONGTEXT NULL,
+         error TEXT NULL,
+         created_at DATETIME NOT NULL,
+         updated_at DATETIME NOT NULL,
+         INDEX idx_upload_jobs_status (status, updated_at)
+       )""",
+]
+# Which process runs a job, and when it last said so: recovery only takes over jobs whose heartbeat stopped.
+JOBS_LEASE_SCHEMA = [
+    """ALTER TABLE upload_jobs
+         ADD COLUMN IF NOT EXISTS owner VARCHAR(64) NULL,
+         ADD COLUMN IF NOT EXISTS heartbeat_at DATETIME NULL""",
+]
+JOBS_SCHEMA_VERSION = 6  # the MIGRATIONS version that completes upload_jobs (3 creates it, 6 adds the lease columns)
+_jobs_schema_ready = False
+JOB_HANDLERS = {}
+JOB_FINAL_STATES = ("succeeded", "failed", "cancelled")
+
+def check_jobs_schema(cur):
+    """ Once per process, fails with a clear error unless the migrations upload_jobs needs have been applied. """
+    global _jobs_schema_ready
+    if _jobs_schema_ready: return
+    try:
+        cur.execute("SELECT MAX(version) FROM schema_migrations")
+        version = cur.fetchone()[0] or 0
+    except mariadb.ProgrammingError:
+        version = 0  # schema_migrations does not exist yet
+    if version < JOBS_SCHEMA_VERSION:
+        raise mariadb.ProgrammingError(f"The job table needs schema migration {JOBS_SCHEMA_VERSION} (database is at {version}); run `flask --app app migrate`.")
+    _jobs_schema_ready = True
+
+def job_handler(kind):
+    """ Registers a function as the handler for jobs of `kind`. """
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+class JobCancelled(Exception):
+    """ Raised inside a handler when cancellation was requested. """
+
+class JobFailed(Exception):
+    """ A permanent job failure; `status_code` mirrors what the synchronous API would have returned. """
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class Job:
+    """ Handle passed to job handlers for reporting progress, honouring cancellation and tracking created files. """
+
+    def __init__(self, queue, row):
+        self.queue = queue
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.attempts = row["attempts"]
+        self.payload = json.loads(row["payload"])
+        self.created_files = json.loads(row["created_files"] or "[]")
+        self.partial = json.loads(row["result"]) if row.get("result") else None  # recorded by an earlier attempt
+
+    def progress(self, percent, message=None):
+        self.queue._update(self.id, progress=int(percent), message=message)
+
+    def check_cancelled(self):
+        row = self.queue._fetch(self.id, "cancel_requested")
+        if row and row["cancel_requested"]: raise JobCancelled()
+
+    def record(self, partial):
+        """ Stores what the handler has committed so far: the result of a cancelled or failed run, and what a retry resumes from. """
+        self.partial = partial
+        self.queue._update(self.id, result=json.dumps(partial, default=str))
+
+    def will_create(self, path):
+        """ Records `path` in the job row *before* it is written, so a crash can never orphan it. """
+        if str(path) in self.created_files: return
+        self.created_files.append(str(path))
+        self.queue._update(self.id, created_files=json.dumps(self.created_files))
+
+class JobQueue:
+    """
+    Persistent background job queue.
+
+    Jobs live in the upload_jobs table and run on a local thread pool. Bookkeeping uses
+    its own short transactions on a separate pooled connection, so a handler's work is
+    committed (or rolled back) independently of its progress reports. Workers claim a
+    job with a conditional UPDATE, which keeps several processes from running it twice,
+    and record themselves as its owner; a heartbeat thread refreshes heartbeat_at of the
+    jobs this process runs, so recover() elsewhere can tell a live job from a crashed one.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._running = set()
+        self._heartbeat = None
+        self._stopping = threading.Event()
+
+    @property
+    def owner(self):
+        return f"{socket.gethostname()[:50]}:{os.getpid()}"
+
+    def shutdown(self):
+        """ Waits for running jobs; queued ones stay 'queued' in the table and are recovered by the next worker. """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            heartbeat, self._heartbeat = self._heartbeat, None
+        if executor is not None: executor.shutdown(wait=True, cancel_futures=True)
+        if heartbeat is not None:
+            self._stopping.set()
+            heartbeat.join()
+            self._stopping = threading.Event()
+
+    def _send_heartbeats(self):
+        stopping = self._stopping
+        while not stopping.wait(app.config['JOB_HEARTBEAT_INTERVAL']):
+            running = list(self._running)
+            if not running: continue
+            try:
+                self._execute(f"UPDATE upload_jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running' AND id IN ({', '.join('?' * len(running))})",
+                              (datetime.now(), self.owner, *running))
+            except mariadb.Error as e:
+                app.logger.warning(f"Could not record job heartbeat: {e}")
+
+    # -- bookkeeping on a dedicated connection --
+    def _execute(self, sql, params=(), fetch=False):
+        entry = get_db_pool().acquire()
+        discard = False
+        try:
+            cur = InstrumentedCursor(entry.conn.cursor())
+            check_jobs_schema(cur)
+            cur.execute(sql, tuple(params))
+            rows = dict_rows(cur) if fetch else cur.rowcount
+            entry.conn.commit()
+            cur.close()
+            return rows
+        except (mariadb.InterfaceError, mariadb.OperationalError):
+            discard = True
+            raise
+        finally:
+            get_db_pool().release(entry, discard=discard)
+
+    def _fetch(self, job_id, columns="*"):
+        rows = self._execute(f"SELECT {columns} FROM upload_jobs WHERE id = ?", (job_id,), fetch=True)
+        return rows[0] if rows else None
+
+    def _update(self, job_id, where_status=None, **fields):
+        fields["updated_at"] = datetime.now()
+        sql = f"UPDATE upload_jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?"
+        params = list(fields.values()) + [job_id]
+        if where_status:
+            sql += f" AND status IN ({', '.join('?' * len(where_status))})"
+            params.extend(where_status)
+        return self._execute(sql, params)
+
+    # -- public API --
+    def submit(self, kind, payload, job_id=None, max_attempts=None):
+        """ Persists a job and schedules it. Returns the job id. """
+        if kind not in JOB_HANDLERS: raise ValueError(f"No handler registered for job kind '{kind}'.")
+        job_id = job_id or uuid.uuid4().hex
+        now = datetime.now()
+        self._execute(
+            "INSERT INTO upload_jobs (id, kind, status, progress, attempts, max_attempts, payload, created_at, updated_at) VALUES (?, ?, 'queued', 0, 0, ?, ?, ?, ?)",
+            (job_id, kind, max_attempts or app.config['JOB_MAX_ATTEMPTS'], json.dumps(payload), now, now),
+        )
+        self._schedule(job_id)
+        return job_id
+
+    def get(self, job_id):
+        row = self._fetch(job_id, "id, kind, status, progress, message, attempts, max_attempts, cancel_requested, result, error, created_at, updated_at")
+        if row is None: return None
+        row["result"] = json.loads(row["result"]) if row["result"] else None
+        row["cancel_requested"] = bool(row["cancel_requested"])
+        return row
+
+    def cancel(self, job_id):
+        """ Cancels a queued job immediately, or asks a running one to stop at its next checkpoint. """
+        if self._update(job_id, where_status=("queued",), status="cancelled", cancel_requested=1, message="Cancelled before start."):
+            self._cleanup(job_id)
+        else:
+            self._update(job_id, where_status=("running",), cancel_requested=1)
+        return self.get(job_id)
+
+    def recover(self):
+        """ Requeues jobs that were queued, or running when their worker died, and cleans up orphaned staging dirs. """
+        cutoff = datetime.fromtimestamp(time.time() - app.config['JOB_STALE_AFTER'])
+        stale = "COALESCE(heartbeat_at, updated_at) < ?"  # rows from before heartbeats only have updated_at
+        rows = self._execute(
+            f"SELECT id, status, attempts, max_attempts FROM upload_jobs WHERE status = 'queued' OR (status = 'running' AND {stale})",
+            (cutoff,), fetch=True,
+        )
+        for row in rows:
+            if row["status"] == "running":
+                exhausted = row["attempts"] >= row["max_attempts"]
+                # Conditional on the heartbeat still being stale, so only one process takes the job over.
+                if not self._execute(
+                    f"UPDATE upload_jobs SET status = ?, owner = NULL, message = ?, updated_at = ? WHERE id = ? AND status = 'running' AND {stale}",
+                    ("failed" if exhausted else "queued", "Worker stopped while processing the job." if exhausted else "Requeued after worker restart.", datetime.now(), row["id"], cutoff),
+                ): continue
+                if exhausted:
+                    self._cleanup(row["id"])
+                    self._finish(row["id"], "failed", error="Worker stopped while processing the job.")
+                    continue
+            self._schedule(row["id"])
+        if STAGING_FOLDER.is_dir():
+            grace = time.time() - app.config['JOB_STAGING_GRACE']
+            for staged in STAGING_FOLDER.iterdir():
+                # Requests stage a job's input before inserting its row; CLI imports own their "cli-" dirs.
+                if not re.fullmatch(r"[0-9a-f]{32}", staged.name) or staged.stat().st_mtime > grace: continue
+                job = self._fetch(staged.name, "status")
+                if job is None or job["status"] in JOB_FINAL_STATES:
+                    shutil.rmtree(staged, ignore_errors=True)
+        if rows: app.logger.info(f"Recovered {len(rows)} unfinished job(s).")
+
+    # -- execution --
+    def _schedule(self, job_id, delay=0.0):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job-worker")
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._send_heartbeats, name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+        if delay > 0:
+            timer = threading.Timer(delay, self._schedule, args=(job_id,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        with app.app_context():
+            try:
+                self._run_claimed(job_id)
+            except Exception as e:
+                app.logger.error(f"Job {job_id}: bookkeeping failed: {e}", exc_info=True)
+
+    def _run_claimed(self, job_id):
+        row = self._fetch(job_id)
+        if row is None or row["status"] != "queued": return
+        if row["cancel_requested"]:
+            self._finish(job_id, "cancelled", message="Cancelled before start.")
+            return
+        if not self._update(job_id, where_status=("queued",), status="running", attempts=row["attempts"] + 1, message="Started.", owner=self.owner, heartbeat_at=datetime.now()):
+            return  # another worker claimed it
+        self._running.add(job_id)
+        try:
+            self._run_handler(job_id, row)
+        finally:
+            self._running.discard(job_id)
+
+    def _run_handler(self, job_id, row):
+        job = Job(self, self._fetch(job_id))
+        app.logger.info(f"Job {job_id} ({job.kind}) started, attempt {job.attempts}/{row['max_attempts']}.")
+        try:
+            result = JOB_HANDLERS[job.kind](job)
+        except JobCancelled:
+            release_db_conn(discard=False)
+            self._cleanup(job_id)
+            self._finish(job_id, "cancelled", message="Cancelled.", result=job.partial)
+        except JobFailed as e:
+            release_db_conn(discard=False)
+            self._cleanup(job_id)
+            self._finish(job_id, "failed", error=str(e), result={**(job.partial or {}), "status_code": e.status_code})
+        except (mariadb.InterfaceError, mariadb.OperationalError) as e:
+            release_db_conn(discard=True)
+            if job.attempts < row["max_attempts"]:
+                # Files already moved into place stay recorded in created_files and are reused by the retry.
+                delay = app.config['JOB_RETRY_DELAY'] * 2 ** (job.attempts - 1)
+                app.logger.warning(f"Job {job_id} hit a transient DB error, retrying in {delay:.0f}s: {e}")
+                self._update(job_id, status="queued", message=f"Retrying after error: {e}")
+                self._schedule(job_id, delay=delay)
+            else:
+                self._cleanup(job_id)
+                self._finish(job_id, "failed", error=f"Database connection error: {e}", result={**(job.partial or {}), "status_code": 503})
+        except Exception as e:
+            app.logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            release_db_conn(discard=False)
+            self._cleanup(job_id)
+            self._finish(job_id, "failed", error=str(e) or type(e).__name__, result={**(job.partial or {}), "status_code": 500})
+        else:
+            shutil.rmtree(STAGING_FOLDER / job_id, ignore_errors=True)
+            self._finish(job_id, "succeeded", result=result, message="Done.")
+
+    def _finish(self, job_id, status, result=None, error=None, message=None):
+        progress = 100 if status == "succeeded" else None
+        fields = dict(status=status, result=json.dumps(result, default=str) if result is not None else None, error=error, message=message or error)
+        if progress is not None: fields["progress"] = progress
+        self._update(job_id, **fields)
+        app.logger.info(f"Job {job_id} {status}." + (f" Error: {error}" if error else ""))
+
+    def _cleanup(self, job_id):
+        """ Deletes the files a job created outside its staging dir, and the staging dir itself. """
+        row = self._fetch(job_id, "created_files")
+        for path in json.loads((row or {}).get("created_files") or "[]"):
+            try:
+                Path(path).unlink(missing_ok=True)
+                app.logger.info(f"Cleaned up file: {path}")
+            except OSError as e:
+                app.logger.error(f"Could not delete file '{path}' during cleanup: {e}", exc_info=True)
+        if row: self._update(job_id, created_files=None)
+        shutil.rmtree(STAGING_FOLDER / job_id, ignore_errors=True)
+
+job_queue = JobQueue(workers=app.config['JOB_WORKERS'])
+
+def start_job_queue():
+    """ Recovers unfinished jobs from a previous run. """
+    try:
+        with app.app_context(): job_queue.recover()
+    except mariadb.Error as e:
+        app.logger.error(f"Could not recover background jobs: {e}", exc_info=True)
+
+
+# --- Request Timing ---
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        HTTP_LATENCY.observe(elapsed, endpoint=endpoint, method=request.method)
+        if elapsed >= app.config['SLOW_REQUEST_SECONDS']: app.logger.warning(f"Slow request ({elapsed:.3f}s): {request.method} {request.path} -> {response.status_code}")
+    return response
+
+@app.after_request
+def remember_last_write(response):
+    """ Tells a client that just changed data when it did, so its next reads include the change (see read_since()). """
+    wrote_at = g.pop("db_wrote_at", None)
+    if wrote_at is not None and app.config['DB_REPLICAS']:
+        response.headers["X-Last-Write"] = f"{wrote_at:.3f}"
+        response.set_cookie(LAST_WRITE_COOKIE, f"{wrote_at:.3f}", max_age=int(app.config['DB_READ_YOUR_WRITES']), httponly=True, samesite="Lax")
+    return response
+
+@app.teardown_request
+def record_failed_request(exception=None):
+    # after_request is skipped when a view raises; count those as 500s here.
+    started = g.pop("request_started", None)
+    if started is not None:
+        endpoint = request.endpoint or "unmatched"
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=500)
+        HTTP_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+
+# --- Teardown Function ---
+# (Keep existing teardown)
+@app.teardown_appcontext
+def close_db_connection(exception=None):
+    if exception: app.logger.error(f"App teardown with exception: {exception}", exc_info=True)
+    # Connections that saw an interface/operational error are not trusted back into the pool.
+    release_db_conn(discard=isinstance(exception, (mariadb.InterfaceError, mariadb.OperationalError)))
+
+# --- Health check ---
+# (Keep existing ping)
+@app.route("/ping")
+def ping(): return "pong", 200
+
+@app.route("/api/db/pool")
+def api_db_pool_stats():
+    """ Connection pool metrics: in-use count, wait times and reconnects, plus each read replica's pool and lag. """
+    replicas = get_db_replicas()
+    return jsonify(dict(get_db_pool().stats(), replicas=replicas.stats(), replica_primary_fallbacks=replicas.primary_fallbacks))
+
+@metrics.collector
+def collect_component_stats():
+    replicas = get_db_replicas()
+    pools = [get_db_pool().stats(), *replicas.stats()]
+    for key, kind in (("open", "gauge"), ("idle", "gauge"), ("in_use", "gauge"), ("checkouts", "counter"), ("timeouts", "counter"), ("reconnects", "counter"), ("connect_errors", "counter"), ("wait_time_total_s", "counter")):
+        name = "db_pool_wait_seconds_total" if key == "wait_time_total_s" else f"db_pool_{key}" + ("_total" if kind == "counter" else "")
+        yield name, kind, f"Connection pool {key.replace('_', ' ')}.", [({"pool": pool["name"]}, pool[key]) for pool in pools]
+    if replicas.replicas:
+        yield "db_replica_lag_seconds", "gauge", "Replication lag at the last check (-1: not replicating or unreachable).", [({"pool": r["name"]}, -1 if r["lag_s"] is None else r["lag_s"]) for r in pools[1:]]
+        yield "db_replica_reads_total", "counter", "Requests whose read-only queries went to the replica.", [({"pool": r["name"]}, r["reads"]) for r in pools[1:]]
+        yield "db_replica_primary_fallbacks_total", "counter", "Read-only requests sent to the primary because no replica was usable.", [({}, replicas.primary_fallbacks)]
+    cache = query_cache.stats()
+    for key in ("hits", "misses", "evictions", "invalidations"): yield f"query_cache_{key}_total", "counter", f"Query result cache {key}.", [({}, cache[key])]
+    yield "query_cache_entries", "gauge", "Entries in the local query result cache.", [({}, cache["entries"])]
+    yield "search_index_models", "gauge", "Models in the in-process search index.", [({}, search_index.stats()["models"])]
+    yield "reaction_index_results", "gauge", "gap_filling_results rows in the in-process reaction index.", [({}, reaction_index.stats()["results"])]
+    yield "reaction_sets_models", "gauge", "Models with an in-memory reaction set for comparisons.", [({"table": name}, index.stats()["models"]) for name, index in reaction_sets.items()]
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """ Prometheus text exposition of request, query, upload, pool and cache metrics for this process. """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/debug/profile")
+def debug_profile():
+    """
+    Samples every thread's stack for ?seconds=N (default 10) while real traffic runs.
+    Returns collapsed stacks ('a;b;c count', for flamegraph.pl/speedscope) or, with
+    ?format=json, the functions with the most samples. Only enabled with PROFILER_ENABLED.
+    """
+    if not app.config['PROFILER_ENABLED']: abort(404)
+    seconds = max(0.1, min(request.args.get("seconds", 10.0, type=float), app.config['PROFILER_MAX_SECONDS']))
+    try:
+        stacks, rounds = profiler.profile(seconds)
+    except RuntimeError as e:
+        return jsonify(error=str(e)), 409
+    if request.args.get("format") != "json":
+        return Response("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()), mimetype="text/plain")
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for frame in set(frames): total[frame] += count
+    top = request.args.get("top", 25, type=int)
+    return jsonify(seconds=seconds, rounds=rounds, samples=sum(stacks.values()),
+                   self_time=[{"frame": f, "samples": n} for f, n in own.most_common(top)],
+                   cumulative=[{"frame": f, "samples": n} for f, n in total.most_common(top)])
+
+# --- Web UI Routes ---
+
+# --- SQL Demo page ---
+@app.route("/demo")
+def demo_queries():
+    metabolic_reactions, gapfill_reactions, experiments = [], [], []
+    try:
+        # Metabolic Reactions
+        metabolic_reactions = cached_query("SELECT reaction_id, reaction_name, metabolites, flux_value FROM metabolic_reactions WHERE organism_id = 'Ecoli_K12'", tables=("metabolic_reactions",))
+
+        # Gap-Filling Reactions
+        gapfill_reactions = cached_query("SELECT model_id, reaction_id, reaction_name, source_database FROM gap_filling_results WHERE model_id = 'Model_123'", tables=("gap_filling_results",))
+
+        # Experimental Conditions
+        experiments = cached_query("SELECT experiment_id, media_composition, temperature, growth_outcome FROM experimental_conditions WHERE experiment_id = 'Exp_20250321'", tables=("experimental_conditions",))
+
+    except Exception as e:
+        app.logger.error(f"Error executing demo queries: {e}", exc_info=True)
+
+    return render_template(
+        "demo_queries.html",
+        metabolic_reactions=metabolic_reactions,
+        gapfill_reactions=gapfill_reactions,
+        experiments=experiments,
+        current_year=datetime.now().year
+    )
+
+
+
+# --- Page Caching ---
+# Rendered pages and results tables are kept in fragment_cache under a version key, and pages
+# carry an ETag built from the same version, so a browser revalidating gets a 304 without any
+# rendering. Results are versioned by the model ids shown plus the gapfill_models generation.
+fragment_cache = LocalCacheBackend(app.config['FRAGMENT_CACHE_MAX_ENTRIES'])
+_template_version = None
+
+def template_version():
+    """ Fingerprint of the template files, so a deploy (or an edit in debug mode) changes every page ETag. """
+    global _template_version
+    if _template_version is None or app.jinja_env.auto_reload:
+        digest = hashlib.sha1()
+        for path in sorted(Path(app.root_path, app.template_folder).glob("*.html")):
+            stat = path.stat()
+            digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        _template_version = digest.hexdigest()[:16]
+    return _template_version
+
+def load_models(ids):
+    """ gapfill_models rows for `ids`, in that order. """
+    if not ids: return []
+    cur = get_db_cursor(readonly=True)
+    try:
+        return fetch_models_by_ids(cur, ids)
+    finally:
+        try: cur.close()
+        except mariadb.Error as e: app.logger.error(f"Error closing cursor in load_models(): {e}", exc_info=True)
+
+def results_fragment(ids, load_rows, term=None):
+    """ Rendered results table for the models `ids`; load_rows() is only called when it is not cached. """
+    # Only the empty-result message mentions the search term.
+    key = ("results", request.script_root, tuple(ids), query_cache.generation("gapfill_models"), None if ids else term)
+    html = fragment_cache.get(key)
+    if html is None:
+        html = Markup(render_template("_search_results.html", search_results=load_rows(), media_search=term))
+        fragment_cache.set(key, html, app.config['QUERY_CACHE_TTL'])
+    return html
+
+def conditional_page(version, render, ttl=None):
+    """ HTML response for render(), cached and revalidated by an ETag derived from `version`. """
+    etag = hashlib.sha1(repr((template_version(), request.script_root, version)).encode()).hexdigest()[:20]
+    response = app.response_class(mimetype="text/html")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    if not request.if_none_match.contains_weak(etag):
+        body = fragment_cache.get(("page", etag))
+        if body is None:
+            body = render()
+            fragment_cache.set(("page", etag), body, ttl or app.config['PAGE_CACHE_TTL'])
+        response.set_data(body)
+    return response.make_conditional(request)
+
+def static_page(template):
+    """ An informational page without per-request data; only the footer year changes. """
+    year = datetime.now().year
+    return conditional_page((template, year), lambda: render_template(template, current_year=year))
+
+
+#Linked Databases such as KEGG 
+@app.route('/linked_databases')
+def linked_databases():
+    """Renders the Linked Databases page."""
+    app.logger.debug("Rendering Linked Databases page")
+    return static_page('linked_databases.html')
+
+#Intro page, brand spanking new
+@app.route('/intro')
+def intro():
+    """Renders the Introduction page."""
+    app.logger.debug("Rendering Introduction page")
+    return static_page('intro.html')
+
+# KEEP Existing route for main page (index/search/upload)
+@app.route("/")
+def index():
+    """ Renders the main page, showing the latest 5 models (revalidated by ETag). """
+    error_message = None
+    try:
+        app.logger.debug(f"Request received for index route '/'")
+        models = cached_query("SELECT * FROM gapfill_models ORDER BY id DESC LIMIT 5")
+        app.logger.debug(f"Retrieved {len(models)} models for index display.")
+    except (mariadb.Error, mariadb.InterfaceError, mariadb.OperationalError) as db_e:
+        app.logger.error(f"Database error retrieving models for index: {db_e}", exc_info=True)
+        error_message = "Database connection or query error retrieving models. Please try again later."
+    except Exception as e:
+        app.logger.error(f"Unexpected error in index(): {e}", exc_info=True)
+        error_message = "An unexpected server error occurred while retrieving models."
+
+    year = datetime.now().year
+    if error_message:
+        return render_template("index.html", results_html=results_fragment([], list), media_search=None,
+                               current_year=year, error_message=error_message)
+    ids = [row["id"] for row in models]
+    return conditional_page(
+        ("index", tuple(ids), query_cache.generation("gapfill_models"), year),
+        lambda: render_template(
+            "index.html",
+            results_html=results_fragment(ids, lambda: models),
+            media_search=None, # Indicate no search was performed
+            current_year=year,
+            error_message=None
+        ),
+        ttl=app.config['QUERY_CACHE_TTL'])
+
+
+# KEEP Existing search route
+@app.route("/search", methods=["POST"])
+def search():
+    """
+    Handles searching models via the search index. Renders index.html, or only the results table
+    with ?format=fragment (used by the page's AJAX search), or the matching rows with ?format=json.
+    """
+    term = request.form.get("media_search", "").strip()
+    growth_filter = request.form.get("growth_filter", "all")
+    response_format = request.args.get("format", "html")
+    shown, total, models, results_html = [], 0, [], None
+    error_message, status = None, 200
+    app.logger.debug(f"Handling search request for term: '{term}'")
+    try:
+        search_index.sync()
+        shown, total = search_index.query(term, growth_filter, limit=app.config['SEARCH_MAX_RESULTS'])
+        if response_format == "json": models = load_models(shown)
+        else: results_html = results_fragment(shown, functools.partial(load_models, shown), term)
+        app.logger.debug(f"Found {total} models matching search term '{term}' and filter '{growth_filter}' (showing {len(shown)}).")
+    except ValueError as ve:
+        error_message, status = str(ve), 400
+    except (mariadb.Error, mariadb.InterfaceError, mariadb.OperationalError) as db_e:
+        app.logger.error(f"Database error during search for '{term}': {db_e}", exc_info=True)
+        error_message, status = f"Database error during search for '{term}'. Please try again later.", 503
+    except Exception as e:
+        app.logger.error(f"Unexpected error in search(): {e}", exc_info=True)
+        error_message, status = f"Search failed for '{term}' due to a server error.", 500
+
+    if response_format in ("json", "fragment"):
+        if error_message: return jsonify(error=error_message), status
+        if response_format == "json":
+            return jsonify(query=term, growth_filter=growth_filter, total=total, results=models)
+        return results_html
+    return render_template(
+        "index.html", # Still render index.html for search results
+        results_html=results_html or results_fragment([], list, term),
+        media_search=term, # Pass the search term back
+        growth_filter=growth_filter,
+        current_year=datetime.now().year,
+        error_message=error_message
+    )
+
+@app.route("/api/cache/stats")
+def api_cache_stats():
+    """ Query result cache hit/miss/eviction counters. """
+    return jsonify(dict(query_cache.stats(), fragment_entries=len(fragment_cache)))
+
+@app.route("/api/search/stats")
+def api_search_stats():
+    """ Size of the in-process search index. """
+    return jsonify(search_index.stats())
+
+# --- ADD New Routes ---
+
+@app.route('/about')
+def about():
+    """Renders the About page."""
+    app.logger.debug("Rendering About page")
+    return static_page('about.html')
+
+@app.route('/help')
+def help_page():
+    """Renders the Help page."""
+    app.logger.debug("Rendering Help page")
+    return static_page('help.html')
+
+# Optional: Add a /files route similar to teammate's, but maybe query DB?
+# @app.route('/files')
+# def files():
+#     """Lists all available models from database (example)."""
+#     all_models = []
+#     error_message = None
+#     cur = None
+#     try:
+#         app.logger.info("Fetching all models for /files page")
+#         cur = get_db_cursor()
+#         # Fetch necessary columns, including paths/filenames
+#         cur.execute("SELECT id, file_name, file_link, growth_file, biomass_file_5mM, biomass_file_20mM FROM gapfill_models ORDER BY id DESC")
+#         all_models = dict_rows(cur)
+#     except Exception as e:
+#         app.logger.error(f"Error fetching models for /files page: {e}", exc_info=True)
+#         error_message = "Could not retrieve file list."
+#     finally:
 #         if cur:
 #              try: cur.close()
 #              except mariadb.Error as e: app.logger.error(f"Error closing cursor in files(): {e}", exc_info=True)
@@ -314,25 +2487,116 @@ def help_page():
 #     # return render_template('files.html', models=all_models, error_message=error_message, current_year=datetime.now().year)
 #     pass # Placeholder if not implementing now
 
-# --- KEEP Existing File Download Route ---
+# --- KEEP Existing File Download Route ---
+def gzip_uncompressed_size(path):
+    """ Original size of a gzip file from its ISIZE trailer (exact for objects under 4 GiB). """
+    with open(path, "rb") as fh:
+        fh.seek(-4, os.SEEK_END)
+        return int.from_bytes(fh.read(4), "little")
+
+def cached_encoding(source_open, key, encoding):
+    """
+    Returns the path of a precomputed `encoding` ('gzip' or 'zstd') copy of a file, creating
+    it on first request under .cache/encoded/<key>. `source_open()` yields the original bytes.
+    """
+    suffix = {"gzip": ".gz", "zstd": ".zst"}[encoding]
+    path = ENCODED_CACHE_FOLDER / f"{key}{suffix}"
+    if path.is_file(): return path
+    ENCODED_CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with source_open() as src, open(tmp, "wb") as raw:
+            if encoding == "gzip":
+                with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as out: shutil.copyfileobj(src, out, app.config['CAS_CHUNK_SIZE'])
+            else:
+                zstandard.ZstdCompressor(level=10).copy_stream(src, raw)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return path
+
+def negotiate_encoding(available):
+    """ Picks the best of `available` encodings the client accepts (zstd > gzip > identity). """
+    accepted = request.accept_encodings
+    for encoding in ("zstd", "gzip"):
+        if encoding in available and accepted[encoding] > 0: return encoding
+    return None
+
+def send_stored(value, download_name):
+    """
+    Sends a stored file with validators, Range support and Content-Encoding negotiation.
+
+    ETags are the content hash for store objects (file mtime/size for legacy files) with an
+    encoding suffix, so If-None-Match/If-Modified-Since revalidation returns 304 and Range/
+    If-Range resume works against whichever representation was negotiated. Precompressed
+    representations are served straight from disk: gzip store objects as-is, everything
+    else from a lazily built .cache/encoded copy.
+    """
+    ref = parse_ref(value)
+    if ref:
+        path, stored_encoding = content_store.locate(ref[0])
+        if path is None: raise FileNotFoundError(value)
+        base_etag, cache_key, immutable = ref[0], ref[0], True
+        size = gzip_uncompressed_size(path) if stored_encoding == "gzip" else path.stat().st_size
+        open_identity = (lambda: gzip.open(path, "rb")) if stored_encoding == "gzip" else (lambda: open(path, "rb"))
+    else:
+        path = resolve_upload_path(value)
+        if not path.is_file(): raise (IsADirectoryError(value) if path.is_dir() else FileNotFoundError(value))
+        stat = path.stat()
+        stored_encoding, size, immutable = None, stat.st_size, False
+        base_etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        cache_key = hashlib.sha1(f"{path}|{base_etag}".encode()).hexdigest()
+        open_identity = lambda: open(path, "rb")
+
+    available = set()
+    if size >= app.config['DOWNLOAD_COMPRESS_MIN_SIZE']:
+        available.add("gzip")
+        if zstandard is not None: available.add("zstd")
+    encoding = negotiate_encoding(available)
+    if encoding is None:
+        fileobj, length = open_identity(), size
+    elif encoding == "gzip" and stored_encoding == "gzip":
+        fileobj, length = open(path, "rb"), path.stat().st_size
+    else:
+        encoded = cached_encoding(open_identity, cache_key, encoding)
+        fileobj, length = open(encoded, "rb"), encoded.stat().st_size
+
+    response = Response(wrap_file(request.environ, fileobj, buffer_size=app.config['CAS_CHUNK_SIZE']), mimetype="application/octet-stream", direct_passthrough=True)
+    response.headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+    response.headers["Vary"] = "Accept-Encoding"
+    if encoding: response.headers["Content-Encoding"] = encoding
+    response.content_length = length
+    response.set_etag(base_etag + (f"-{encoding}" if encoding else ""))
+    response.last_modified = datetime.fromtimestamp(path.stat().st_mtime)
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        if not app.config['DOWNLOAD_LEGACY_MAX_AGE']: response.cache_control.no_cache = True
+        response.cache_control.max_age = app.config['DOWNLOAD_LEGACY_MAX_AGE']
+    # Handles If-None-Match/If-Modified-Since (304), If-Match (412), Range/If-Range (206/416).
+    return response.make_conditional(request, accept_ranges=True, complete_length=length)
+
 @app.route("/download/<path:filepath>")
 def download(filepath):
-    """ Serves files from UPLOAD_FOLDER, handling subdirectories securely. """
-    # (Keep existing download function code)
-    app.logger.info(f"Download request received for path: '{filepath}'")
+    """ Serves files from UPLOAD_FOLDER or the content store, handling subdirectories securely. """
+    app.logger.debug(f"Download request received for path: '{filepath}'")
     normalized_path = os.path.normpath(filepath)
-    if '..' in normalized_path.split(os.sep) or normalized_path.startswith((os.sep, '/')):
+    if '..' in normalized_path.split(os.sep) or normalized_path.startswith((os.sep, '/')) or any(part.startswith('.') for part in normalized_path.split(os.sep)):
          app.logger.warning(f"Download rejected for potentially unsafe path: {filepath} (normalized: {normalized_path})")
          abort(400, "Invalid file path.")
-    app.logger.info(f"Attempting download via send_from_directory for path: '{filepath}' relative to '{UPLOAD_FOLDER}'")
     try:
-        return send_from_directory( directory=str(UPLOAD_FOLDER), path=filepath, as_attachment=True )
+        ref = parse_ref(filepath)
+        return send_stored(filepath, ref[1] if ref else Path(filepath).name)
     except (FileNotFoundError, NotFound) as e:
-         app.logger.warning(f"File not found via send_from_directory for path: '{filepath}' within {UPLOAD_FOLDER}. Error: {e}")
+         app.logger.warning(f"File not found for download path: '{filepath}' within {UPLOAD_FOLDER}. Error: {e}")
          abort(404, "File not found.")
-    except BadRequest as e:
+    except (BadRequest, ValueError) as e:
         app.logger.error(f"Bad Request during file download attempt for '{filepath}': {e}", exc_info=True)
         abort(400, "Invalid request.")
+    except HTTPException:
+        raise  # 416 Range Not Satisfiable from make_conditional
     except Exception as e:
          app.logger.error(f"Error sending file for path '{filepath}': {e}", exc_info=True)
          if isinstance(e, PermissionError): error_msg, http_status = "Could not send file due to server permission error.", 500
@@ -340,19 +2604,107 @@ def download(filepath):
          else: error_msg, http_status = "Could not send file due to an internal server error.", 500
          abort(http_status, description=error_msg)
 
+class _ZipStream(io.RawIOBase):
+    """ Write-only, unseekable sink that lets ZipFile stream an archive chunk by chunk. """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+# Archive folder per gapfill_models file column.
+BUNDLE_COLUMNS = {"file_link": "model", "growth_file": "growth", "biomass_file_5mM": "biomass_5mM", "biomass_file_20mM": "biomass_20mM"}
+
+@app.route("/download/model/<int:model_id>.zip")
+def download_model_bundle(model_id):
+    """ Streams a zip of a model file plus its growth and biomass files without buffering the archive. """
+    try:
+        rows = cached_query(f"SELECT id, {', '.join(BUNDLE_COLUMNS)} FROM gapfill_models WHERE id = ?", (model_id,))
+    except mariadb.Error as db_e:
+        app.logger.error(f"Database error preparing bundle for model {model_id}: {db_e}", exc_info=True)
+        abort(500, "Database error.")
+    if not rows: abort(404, "Model not found.")
+    members = []
+    for column, folder in BUNDLE_COLUMNS.items():
+        value = rows[0].get(column)
+        if not value: continue
+        ref = parse_ref(value)
+        members.append((value, f"model_{model_id}/{folder}/{ref[1] if ref else Path(value).name}"))
+
+    def generate():
+        sink = _ZipStream()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            for value, arcname in members:
+                try:
+                    src = open_stored_file(value)
+                except (OSError, ValueError) as e:
+                    app.logger.warning(f"Skipping missing bundle member '{value}' for model {model_id}: {e}")
+                    continue
+                with src, zf.open(arcname, "w", force_zip64=True) as dest:
+                    while True:
+                        chunk = src.read(app.config['CAS_CHUNK_SIZE'])
+                        if not chunk: break
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data: yield data
+        yield sink.drain()
+
+    response = Response(stream_with_context(generate()), mimetype="application/zip")
+    response.headers["Content-Disposition"] = f'attachment; filename="model_{model_id}.zip"'
+    return response
+
 
 # --- KEEP Existing JSON API Routes ---
 @app.route("/api/models", methods=["GET"])
 def api_list_models():
-    """ API endpoint to list all models in JSON format. """
-    # (Keep existing api_list_models function code)
+    """
+    API endpoint to list models in JSON format, newest first.
+
+    Query parameters:
+      after_id  keyset cursor; only models with id < after_id are returned
+      limit     page size (default API_PAGE_SIZE, capped at API_MAX_PAGE_SIZE)
+      fields    comma-separated column projection, e.g. fields=id,file_name,growth_media
+      stream    'ndjson' or 'json' streams every matching row (limit is ignored) from a
+                server-side cursor instead of returning one page
+    The next page cursor is returned in the X-Next-After-Id and Link headers.
+    """
+    try:
+        fields = parse_fields_param(request.args.get("fields"))
+        after_id = request.args.get("after_id", type=int)
+        limit = request.args.get("limit", app.config['API_PAGE_SIZE'], type=int)
+        stream_mode = request.args.get("stream")
+        if limit is None or limit < 1: raise BadRequest("limit must be a positive integer.")
+        if stream_mode not in (None, "ndjson", "json"): raise BadRequest("stream must be 'ndjson' or 'json'.")
+    except BadRequest as e:
+        return jsonify(error=e.description), 400
+    limit = min(limit, app.config['API_MAX_PAGE_SIZE'])
+
+    query = f"SELECT {', '.join(fields)} FROM gapfill_models"
+    params = []
+    if after_id is not None:
+        query += " WHERE id < ?"
+        params.append(after_id)
+    query += " ORDER BY id DESC"
+
+    if stream_mode:
+        return stream_models(query, params, stream_mode)
+
     models = []
     cur = None
     try:
-        cur = get_db_cursor()
-        cur.execute("SELECT * FROM gapfill_models ORDER BY id DESC")
-        models = dict_rows(cur)
-        return jsonify(models)
+        cur = get_db_cursor(readonly=True)
+        cur.execute(query + " LIMIT ?", tuple(params + [limit]))
+        return keyset_response(dict_rows(cur), limit)
     except (mariadb.Error, mariadb.InterfaceError, mariadb.OperationalError) as db_e:
         app.logger.error(f"API DB error in api_list_models(): {db_e}", exc_info=True)
         return jsonify(error=f"Database error: Failed to retrieve models."), 500
@@ -364,140 +2716,1708 @@ def api_list_models():
             try: cur.close()
             except mariadb.Error as e: app.logger.error(f"Error closing cursor in api_list_models(): {e}", exc_info=True)
 
+def stream_models(query, params, stream_mode):
+    """
+    Streams query results as NDJSON or a chunked JSON array from an unbuffered (server-side) cursor.
+    A DB error mid-stream ends the output with a final `{"error": ...}` record (the last array element
+    in JSON mode, so the body stays valid JSON); model rows never carry an "error" key.
+    """
+    try:
+        cur = get_db_cursor(readonly=True, buffered=False)
+        cur.execute(query, tuple(params))
+    except (mariadb.Error, mariadb.InterfaceError, mariadb.OperationalError) as db_e:
+        app.logger.error(f"API DB error starting model stream: {db_e}", exc_info=True)
+        return jsonify(error=f"Database error: Failed to retrieve models."), 500
+
+    dumps = app.json.dumps
+    def generate():
+        count = 0
+        try:
+            if stream_mode == "json": yield "["
+            for row in iter_dict_rows(cur):
+                if stream_mode == "ndjson": yield dumps(row) + "\n"
+                else: yield ("," if count else "") + dumps(row)
+                count += 1
+            if stream_mode == "json": yield "]"
+        except mariadb.Error as db_e:
+            # Headers are already sent, so the failure has to be reported in-band.
+            app.logger.error(f"API DB error after streaming {count} models: {db_e}", exc_info=True)
+            trailer = dumps({"error": "Database error: model stream aborted.", "streamed": count})
+            if stream_mode == "ndjson": yield trailer + "\n"
+            else: yield ("," if count else "") + trailer + "]"
+        finally:
+            try: cur.close()
+            except mariadb.Error as e: app.logger.error(f"Error closing streaming cursor: {e}", exc_info=True)
+            app.logger.debug(f"Streamed {count} models ({stream_mode}).")
+
+    mimetype = "application/x-ndjson" if stream_mode == "ndjson" else "application/json"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+OPTIONAL_UPLOADS = {
+    'growth_file_upload': {'db_column': 'growth_file'},
+    'biomass_5mM_upload': {'db_column': 'biomass_file_5mM'},
+    'biomass_20mM_upload': {'db_column': 'biomass_file_20mM'},
+}
+UPLOAD_FORM_FIELDS = ["growth_media", "gapfill_algorithm", "annotation_tool", "growth_data"]
+
+def receive_upload(input_name):
+    """
+    Stores the file posted as `input_name`, or accepts `<input_name>_ref` naming a file
+    already in the store (e.g. from a resumable upload). Returns its reference or None.
+    """
+    file_storage = request.files.get(input_name)
+    if file_storage and file_storage.filename: return store_upload(file_storage)
+    ref = request.form.get(f"{input_name}_ref")
+    if ref:
+        parsed = parse_ref(ref)
+        if not parsed or not content_store.exists(parsed[0]): raise ValueError(f"'{input_name}_ref' does not name a stored upload.")
+        filename = secure_filename(parsed[1])
+        if not filename: raise ValueError(f"Invalid filename in '{input_name}_ref'.")
+        return make_ref(parsed[0], filename)
+    return None
+
 @app.route("/api/models", methods=["POST"])
 def api_create_model():
-    """ API endpoint to upload model file (XML/TSV) and optional associated TSV files. """
-    # (Keep existing api_create_model function code from previous step)
-    saved_files_paths = [] # Track Path objects of saved files for cleanup
-    main_file_dest = None
-    try:
-        if "modelUpload" not in request.files: return jsonify(error="No main model file part ('modelUpload') provided."), 400
-        main_file = request.files["modelUpload"]
-        if not main_file or not main_file.filename: return jsonify(error="No main model file selected or filename missing."), 400
-        main_filename = secure_filename(main_file.filename)
-        if not main_filename: return jsonify(error="Invalid main model filename (became empty after securing)."), 400
-        main_ext = Path(main_filename).suffix.lower()
+    """
+    API endpoint to upload model file (XML/TSV) and optional associated TSV files.
+
+    Files are streamed into the content store (deduplicated by SHA-256), then a background
+    job inserts the row and indexes the model. Responds 202 with the job id; poll
+    /api/jobs/<id> for progress and the new model id. Files too large for one request can
+    be sent through /api/uploads first and referenced as '<field>_ref'.
+    """
+    try:
+        main_name = request.files["modelUpload"].filename if "modelUpload" in request.files else request.form.get("modelUpload_ref")
+        if not main_name: return jsonify(error="No main model file part ('modelUpload') provided."), 400
+        main_ext = Path(main_name).suffix.lower()
         if main_ext not in ALLOWED_EXTENSIONS: return jsonify(error=f"Invalid main file type '{main_ext}'. Only {', '.join(ALLOWED_EXTENSIONS)} allowed."), 400
+        for input_name in OPTIONAL_UPLOADS:
+            opt_name = request.files[input_name].filename if input_name in request.files else request.form.get(f"{input_name}_ref")
+            if opt_name and not opt_name.lower().endswith('.tsv'): return jsonify(error=f"Optional file '{opt_name}' for {input_name} must be a .tsv file."), 400
 
-        if main_ext == ".xml": main_file_subdir = 'xml_files'
-        elif main_ext == ".tsv": main_file_subdir = 'main_tsv_files'
-        else: main_file_subdir = None
+        main_ref = receive_upload("modelUpload")
+        payload = {"main": main_ref, "optional": {}, "form": {fld: request.form.get(fld) for fld in UPLOAD_FORM_FIELDS}}
+        for input_name, config in OPTIONAL_UPLOADS.items():
+            opt_ref = receive_upload(input_name)
+            if opt_ref: payload["optional"][config['db_column']] = opt_ref
+            else: app.logger.debug(f"No file provided for optional input: {input_name}")
 
-        if main_file_subdir:
-            main_file_relative_path = (Path(main_file_subdir) / main_filename).as_posix()
-            main_file_dest = UPLOAD_FOLDER / main_file_subdir / main_filename
-            (UPLOAD_FOLDER / main_file_subdir).mkdir(parents=True, exist_ok=True)
-            app.logger.info(f"Determined subdirectory for main file: {main_file_subdir}")
-        else:
-            main_file_relative_path = main_filename
-            main_file_dest = UPLOAD_FOLDER / main_filename
-            app.logger.info("Saving main file to uploads root.")
-        app.logger.info(f"Main file destination: {main_file_dest}, Relative path for DB: {main_file_relative_path}")
+        job_id = job_queue.submit("model_upload", payload)
+        main_filename = parse_ref(main_ref)[1]
+        app.logger.info(f"Queued upload job {job_id} for '{main_filename}'.")
+        return jsonify(job_id=job_id, file_name=main_filename, status="queued", status_url=url_for("api_job_status", job_id=job_id), message="Upload received; processing in background."), 202
+    except ValueError as ve:
+        return jsonify(error=str(ve)), 400
+    except Exception as e:
+        app.logger.error(f"Error receiving upload request: {e}", exc_info=True)
+        if isinstance(e, (mariadb.InterfaceError, mariadb.OperationalError)): return jsonify(error=f"Database connection error: {e}"), 503
+        if isinstance(e, mariadb.Error): return jsonify(error=f"Database operation failed: {e}"), 500
+        if isinstance(e, OSError): return jsonify(error=f"Failed to save uploaded file: {e}"), 500
+        return jsonify(error="An unexpected internal server error occurred during upload."), 500
+
+def post_commit(func, *args):
+    """ Runs a step that follows a committed write (search index, caches, derived files); failures are logged, not raised. """
+    try: func(*args)
+    except Exception as e: app.logger.error(f"{func.__name__} failed after commit: {e}", exc_info=True)
+
+@job_handler("model_upload")
+def process_model_upload(job):
+    """ Inserts the gapfill_models row for a stored upload and indexes the model. """
+    payload = job.payload
+    main_filename = parse_ref(payload["main"])[1]
+    meta = build_gapfill_meta(main_filename, payload["main"], payload["form"], payload["optional"])
+    job.check_cancelled()
+
+    ensure_schema_migrated()  # on its own connection: DDL would commit the transaction below half-way
+    cur = get_db_cursor()
+    try:
+        duplicate_id = find_duplicate_model(cur, meta)
+        if duplicate_id: raise JobFailed(f"An identical model (same file and metadata) already exists as ID {duplicate_id}. Upload cancelled.", 409)
+        new_id = insert_gapfill_row(cur, meta)
+        ingest_counts = None
+        if main_filename.lower().endswith(".xml"):
+            job.progress(40, "Indexing SBML model.")
+            with open_stored_file(payload["main"]) as source:
+                ingest_counts = ingest_sbml(cur, new_id, source, meta.get("Species_Name"))
+        job.check_cancelled()
+        get_db_conn().commit()
+    except mariadb.IntegrityError as e:
+        raise JobFailed(str(e), 400)
+    except SBMLParseError as e:
+        raise JobFailed(str(e), 400)
+    finally:
+        try: cur.close()
+        except mariadb.Error as e: app.logger.error(f"Error closing cursor: {e}", exc_info=True)
+    # The model is committed: from here on a failure must not turn the job (and the client's upload) into a failure.
+    post_commit(search_index.add_document, new_id, meta)
+    post_commit(query_cache.invalidate, "gapfill_models", "metabolic_reactions")
+    if ingest_counts: post_commit(refresh_reaction_sets)
+    post_commit(convert_growth_files, meta)
+    app.logger.info(f"Successfully inserted DB record ID {new_id} referencing file '{main_filename}'.")
+    return {"id": new_id, "file_name": main_filename, "file_link": meta["file_link"], "indexed": ingest_counts}
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def api_job_status(job_id):
+    """ Reports a background job's status, progress and result. """
+    try:
+        job = job_queue.get(job_id)
+    except mariadb.Error as db_e:
+        app.logger.error(f"API DB error in api_job_status(): {db_e}", exc_info=True)
+        return jsonify(error="Database error: Failed to retrieve job."), 500
+    if job is None: return jsonify(error=f"Job '{job_id}' not found."), 404
+    if job["status"] == "succeeded": note_write()  # the job's rows are on the primary; replicas may still be catching up
+    return jsonify(job)
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def api_job_cancel(job_id):
+    """ Cancels a queued job, or asks a running job to stop and clean up. """
+    try:
+        job = job_queue.cancel(job_id)
+    except mariadb.Error as db_e:
+        app.logger.error(f"API DB error in api_job_cancel(): {db_e}", exc_info=True)
+        return jsonify(error="Database error: Failed to cancel job."), 500
+    if job is None: return jsonify(error=f"Job '{job_id}' not found."), 404
+    return jsonify(job)
+
+# --- Reaction Query API ---
+REACTION_COLUMNS = ("id", "gapfill_model_id", "organism_id", "reaction_id", "reaction_name", "metabolites", "reversible", "flux_value")
+GAPFILL_RESULT_COLUMNS = ("id", "model_id", "reaction_id", "reaction_name", "source_database")
+# Composite indexes behind the filters below. InnoDB appends the primary key to every
+# secondary index, so equality filters also serve the `id < after_id ORDER BY id DESC` keyset.
+# Applied by migration 4, never from a request.
+REACTION_QUERY_SCHEMA = [
+    """ALTER TABLE metabolic_reactions
+         ADD INDEX IF NOT EXISTS idx_metabolic_reactions_organism (organism_id, reaction_id),
+         ADD INDEX IF NOT EXISTS idx_metabolic_reactions_reaction (reaction_id, gapfill_model_id),
+         ADD INDEX IF NOT EXISTS idx_metabolic_reactions_flux (flux_value)""",
+    """ALTER TABLE gap_filling_results
+         ADD INDEX IF NOT EXISTS idx_gap_filling_results_model (model_id, reaction_id),
+         ADD INDEX IF NOT EXISTS idx_gap_filling_results_reaction (reaction_id, model_id),
+         ADD INDEX IF NOT EXISTS idx_gap_filling_results_source (source_database, reaction_id)""",
+    """ALTER TABLE reaction_stoichiometry
+         ADD INDEX IF NOT EXISTS idx_reaction_stoichiometry_metabolite_reaction (metabolite_id, reaction_id, gapfill_model_id)""",
+]
+
+def keyset_response(rows, limit):
+    """ JSON list of rows ordered by id DESC, with the next-page cursor in X-Next-After-Id and Link headers. """
+    response = jsonify(rows)
+    if len(rows) == limit:
+        next_after_id = rows[-1]["id"]
+        response.headers["X-Next-After-Id"] = str(next_after_id)
+        next_args = request.args.to_dict()
+        next_args.update(after_id=next_after_id, limit=limit)
+        response.headers["Link"] = f'<{url_for(request.endpoint, _external=True, **(request.view_args or {}), **next_args)}>; rel="next"'
+    return response
+
+def parse_page_args():
+    """ Returns (after_id, limit) from the query string. Raises BadRequest on bad values. """
+    after_id = request.args.get("after_id", type=int)
+    limit = request.args.get("limit", app.config['API_PAGE_SIZE'], type=int)
+    if limit is None or limit < 1: raise BadRequest("limit must be a positive integer.")
+    return after_id, min(limit, app.config['API_MAX_PAGE_SIZE'])
+
+def number_arg(name, kind=float):
+    """ Optional numeric query parameter; unlike request.args.get(type=...) a malformed value is an error, not ignored. """
+    raw = request.args.get(name)
+    if raw in (None, ""): return None
+    try:
+        return kind(raw)
+    except ValueError:
+        raise BadRequest(f"{name} must be a number.")
+
+def run_filtered_page(table, fields, filters, after_id, limit, tables):
+    """ Runs `SELECT fields FROM table WHERE filters` as one keyset page through the query cache. """
+    clauses, params = [f[0] for f in filters], [p for f in filters for p in f[1:]]
+    if after_id is not None:
+        clauses.append(f"{table}.id < ?")
+        params.append(after_id)
+    query = f"SELECT {', '.join(f'{table}.{c}' for c in fields)} FROM {table}"
+    if clauses: query += " WHERE " + " AND ".join(clauses)
+    query += f" ORDER BY {table}.id DESC LIMIT ?"
+    return cached_query(query, params + [limit], tables=tables)
+
+@app.route("/api/reactions", methods=["GET"])
+def api_reactions():
+    """
+    Lists metabolic_reactions rows, newest first.
+
+    Query parameters (all optional, combined with AND):
+      organism            organism_id
+      model               gapfill_models id the reactions were indexed from
+      reaction            reaction_id
+      metabolite          metabolite id taking part in the reaction (SBML-indexed models)
+      flux_min, flux_max  inclusive flux_value range
+      fields, after_id, limit  as for /api/models
+    """
+    try:
+        fields = parse_fields_param(request.args.get("fields"), allowed=REACTION_COLUMNS)
+        after_id, limit = parse_page_args()
+        filters = []
+        if request.args.get("organism"): filters.append(("metabolic_reactions.organism_id = ?", request.args["organism"]))
+        model = number_arg("model", int)
+        if model is not None: filters.append(("metabolic_reactions.gapfill_model_id = ?", model))
+        if request.args.get("reaction"): filters.append(("metabolic_reactions.reaction_id = ?", request.args["reaction"]))
+        if request.args.get("metabolite"):
+            filters.append(("EXISTS (SELECT 1 FROM reaction_stoichiometry s WHERE s.metabolite_id = ? AND s.reaction_id = metabolic_reactions.reaction_id"
+                            " AND s.gapfill_model_id = metabolic_reactions.gapfill_model_id)", request.args["metabolite"]))
+        flux_min, flux_max = number_arg("flux_min"), number_arg("flux_max")
+        if flux_min is not None: filters.append(("metabolic_reactions.flux_value >= ?", flux_min))
+        if flux_max is not None: filters.append(("metabolic_reactions.flux_value <= ?", flux_max))
+    except BadRequest as e:
+        return jsonify(error=e.description), 400
+    try:
+        rows = run_filtered_page("metabolic_reactions", fields, filters, after_id, limit, tables=("metabolic_reactions", "reaction_stoichiometry"))
+    except mariadb.Error as db_e:
+        app.logger.error(f"API DB error in api_reactions(): {db_e}", exc_info=True)
+        return jsonify(error="Database error: Failed to retrieve reactions."), 500
+    return keyset_response(rows, limit)
+
+@app.route("/api/gapfill-results", methods=["GET"])
+def api_gapfill_results():
+    """
+    Lists gap_filling_results rows, newest first.
+
+    Query parameters (all optional, combined with AND):
+      model       model_id
+      reaction    reaction_id
+      source      source_database
+      metabolite  metabolite id taking part in the reaction in any SBML-indexed model
+      fields, after_id, limit  as for /api/models
+    """
+    try:
+        fields = parse_fields_param(request.args.get("fields"), allowed=GAPFILL_RESULT_COLUMNS)
+        after_id, limit = parse_page_args()
+        filters = []
+        if request.args.get("model"): filters.append(("gap_filling_results.model_id = ?", request.args["model"]))
+        if request.args.get("reaction"): filters.append(("gap_filling_results.reaction_id = ?", request.args["reaction"]))
+        if request.args.get("source"): filters.append(("gap_filling_results.source_database = ?", request.args["source"]))
+        if request.args.get("metabolite"):
+            filters.append(("EXISTS (SELECT 1 FROM reaction_stoichiometry s WHERE s.metabolite_id = ? AND s.reaction_id = gap_filling_results.reaction_id)", request.args["metabolite"]))
+    except BadRequest as e:
+        return jsonify(error=e.description), 400
+    try:
+        rows = run_filtered_page("gap_filling_results", fields, filters, after_id, limit, tables=("gap_filling_results", "reaction_stoichiometry"))
+    except mariadb.Error as db_e:
+        app.logger.error(f"API DB error in api_gapfill_results(): {db_e}", exc_info=True)
+        return jsonify(error="Database error: Failed to retrieve gap-filling results."), 500
+    return keyset_response(rows, limit)
+
+
+class ReactionModelIndex:
+    """
+    Precomputed reaction_id -> gap-filling models lookup over gap_filling_results.
+
+    Model ids and source databases are interned to small integers and every reaction keeps
+    a packed array of (model << 16 | source) postings, about 8 bytes per result row, so
+    "which models gap-filled X" is answered without touching the database. It is kept
+    current like SearchIndex: `id > max_id` syncs plus periodic full rebuilds into a fresh
+    index that is swapped in, so lookups never wait for the database.
+    """
+    _STATE = ("_postings", "_models", "_model_ids", "_sources", "_source_ids", "rows", "max_id")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}
+        self._models, self._model_ids = [], {}
+        self._sources, self._source_ids = [], {}
+        self.rows = 0
+        self.max_id = 0
+        self.loaded_at = None
+        self.synced_at = 0.0
+
+    @staticmethod
+    def _intern(value, values, ids):
+        index = ids.get(value)
+        if index is None:
+            index = ids[value] = len(values)
+            values.append(value)
+        return index
 
-        if main_file_dest.exists(): return jsonify(error=f"Main file '{main_filename}' already exists at '{main_file_relative_path}'. Upload cancelled."), 409
+    def add(self, row_id, model_id, reaction_id, source):
+        """ Indexes one gap_filling_results row. """
+        with self._lock:
+            self.max_id = max(self.max_id, row_id)
+            if model_id is None or reaction_id is None: return
+            postings = self._postings.get(reaction_id)
+            if postings is None: postings = self._postings[reaction_id] = array("Q")
+            postings.append(self._intern(model_id, self._models, self._model_ids) << 16 | self._intern(source, self._sources, self._source_ids))
+            self.rows += 1
 
+    def sync(self, force_rebuild=False):
+        """ Loads new rows from the database; does a full rebuild on first use or when the rebuild interval passed. """
+        def due():
+            rebuild = force_rebuild or self.loaded_at is None or now - self.loaded_at > app.config['REACTION_INDEX_REBUILD_INTERVAL']
+            return rebuild, rebuild or now - self.synced_at >= app.config['REACTION_INDEX_SYNC_INTERVAL']
+
+        now = time.monotonic()
+        if not due()[1]: return
+        if not self._sync_lock.acquire(blocking=self.loaded_at is None or force_rebuild): return
         try:
-            main_file.save(str(main_file_dest))
-            saved_files_paths.append(main_file_dest)
-            app.logger.info(f"Main file '{main_filename}' saved successfully to {main_file_dest}")
-        except Exception as save_e: raise IOError(f"Failed to save main model file: {save_e}")
-
-        optional_files_config = { 'growth_file_upload': {'subdir': 'growth_file', 'db_column': 'growth_file'}, 'biomass_5mM_upload': {'subdir': '5mM', 'db_column': 'biomass_file_5mM'}, 'biomass_20mM_upload':{'subdir': '20mM', 'db_column': 'biomass_file_20mM'} }
-        optional_file_paths_for_db = { v['db_column']: None for v in optional_files_config.values() }
-        app.logger.debug(f"Processing optional files. Initial paths: {optional_file_paths_for_db}")
-        for input_name, config in optional_files_config.items():
-             if input_name in request.files and request.files[input_name].filename:
-                 opt_file = request.files[input_name]; opt_filename = secure_filename(opt_file.filename)
-                 app.logger.debug(f"Found optional file for {input_name}: '{opt_filename}'")
-                 if not opt_filename: continue
-                 if not opt_filename.lower().endswith('.tsv'): app.logger.warning(f"Optional file '{opt_filename}' for {input_name} is not .tsv. Skipping."); continue
-                 subdir_name = config['subdir']; subdir_path = UPLOAD_FOLDER / subdir_name; opt_dest = subdir_path / opt_filename
-                 app.logger.debug(f"Optional file destination target: {opt_dest}")
-                 if opt_dest.exists():
-                     app.logger.warning(f"Optional file '{opt_filename}' already exists in {subdir_name}. Using existing path.")
-                     relative_path = (Path(subdir_name) / opt_filename).as_posix()
-                     optional_file_paths_for_db[config['db_column']] = relative_path
-                     app.logger.debug(f"Set DB path for {config['db_column']} to existing: {relative_path}")
-                     continue
-                 try:
-                     app.logger.debug(f"Ensuring subdirectory exists: {subdir_path}")
-                     subdir_path.mkdir(parents=True, exist_ok=True)
-                     app.logger.debug(f"Attempting to save optional file to: {opt_dest}")
-                     opt_file.save(str(opt_dest)); saved_files_paths.append(opt_dest)
-                     app.logger.info(f"Optional file '{opt_filename}' saved to {opt_dest}")
-                     relative_path = (Path(subdir_name) / opt_filename).as_posix()
-                     optional_file_paths_for_db[config['db_column']] = relative_path
-                     app.logger.debug(f"Set DB path for {config['db_column']} to new: {relative_path}")
-                 except Exception as save_e: app.logger.error(f"Error saving optional file {opt_filename} to {opt_dest}: {save_e}", exc_info=True)
-             else: app.logger.debug(f"No file provided or empty filename for optional input: {input_name}")
-
-        form_field_keys = [ "growth_media", "gapfill_algorithm", "annotation_tool", "growth_data" ]
-        form_data = {fld: request.form.get(fld) for fld in form_field_keys}
-        app.logger.debug(f"Collected form metadata: {form_data}")
-
-        meta = {
-            "Species_Name": "P.simiae",
-            "growth_media": form_data.get("growth_media"),
-            "gapfill_algorithm": form_data.get("gapfill_algorithm"),
-            "annotation_tool": form_data.get("annotation_tool"),
-            "file_name": main_filename,
-            "file_link": main_file_relative_path,
-            "growth_data": form_data.get("growth_data"),
-            "growth_file": optional_file_paths_for_db.get('growth_file'),
-            "biomass_file_5mM": optional_file_paths_for_db.get('biomass_file_5mM'),
-            "biomass_file_20mM": optional_file_paths_for_db.get('biomass_file_20mM'),
-            "Biomass_RCH1": None,
-        }
-        app.logger.debug(f"Complete meta dictionary prepared for DB insert: {meta}")
+            rebuild, needed = due()
+            if not needed: return
+            if not rebuild:
+                added = self._load()
+                if added: app.logger.info(f"Reaction index picked up {added} new results.")
+                self.synced_at = now
+                return
+            fresh = ReactionModelIndex()
+            fresh._load()
+            with self._lock:
+                for name in self._STATE: setattr(self, name, getattr(fresh, name))
+                self.loaded_at = self.synced_at = now
+            app.logger.info(f"Reaction index rebuilt with {self.rows} results over {len(self._postings)} reactions.")
+        finally:
+            self._sync_lock.release()
 
-        cur = None; conn_local = None
+    def _load(self):
+        """ Adds the rows above max_id from the database, taking the lock once per fetched batch. Returns how many. """
+        before = self.rows
+        cur = get_db_cursor(readonly=True, buffered=False)
         try:
-            app.logger.info("Attempting to insert record into database.")
-            cur = get_db_cursor(); conn_local = conn
-            new_id = insert_gapfill_row(cur, meta)
-            conn_local.commit()
-            app.logger.info(f"Successfully inserted DB record ID {new_id} referencing file '{main_filename}'.")
-            response_meta = { "id": new_id, "file_name": meta.get("file_name"), "message": "Upload successful." }
-            return jsonify(response_meta), 201
-        except (mariadb.Error, mariadb.IntegrityError) as db_e:
-            app.logger.error(f"DB error on insert/commit: {db_e}", exc_info=True)
-            if conn_local:
-                 try: conn_local.rollback()
-                 except mariadb.Error as rb_e: app.logger.error(f"Rollback failed: {rb_e}")
-            raise db_e
+            cur.execute("SELECT id, model_id, reaction_id, source_database FROM gap_filling_results WHERE id > ? ORDER BY id", (self.max_id,))
+            while True:
+                batch = cur.fetchmany(app.config['STREAM_FETCH_SIZE'])
+                if not batch: break
+                with self._lock:
+                    for row in batch: self.add(*row)
+        finally:
+            cur.close()
+        return self.rows - before
 
-    except Exception as e:
-        app.logger.error(f"Error processing upload request in outer try-except: {e}", exc_info=True)
-        if conn:
+    def models_for(self, reaction_id, source=None):
+        """ Returns [(model_id, [source databases])] for every model that gap-filled `reaction_id`, sorted by model_id. """
+        with self._lock:
+            postings = self._postings.get(reaction_id)
+            wanted = self._source_ids.get(source, -1) if source is not None else None
+            if not postings or wanted == -1: return []
+            found = {}
+            for packed in postings:
+                source_index = packed & 0xFFFF
+                if wanted is None or source_index == wanted: found.setdefault(packed >> 16, set()).add(source_index)
+            models, sources = self._models, self._sources
+        return sorted((models[m], [sources[s] for s in sorted(found_sources)]) for m, found_sources in found.items())
+
+    def stats(self):
+        with self._lock:
+            return {"results": self.rows, "reactions": len(self._postings), "models": len(self._models), "max_id": self.max_id}
+
+reaction_index = ReactionModelIndex()
+
+@app.route("/api/reactions/<reaction_id>/models", methods=["GET"])
+def api_reaction_models(reaction_id):
+    """
+    Which models gap-filled `reaction_id`, from the in-process reaction index.
+
+    Query parameters: source (only results from this source_database), after (model_id
+    cursor: models sorting after it) and limit. Returns the total count across all pages.
+    """
+    try:
+        _, limit = parse_page_args()
+    except BadRequest as e:
+        return jsonify(error=e.description), 400
+    try:
+        reaction_index.sync()
+    except mariadb.Error as db_e:
+        app.logger.error(f"API DB error in api_reaction_models(): {db_e}", exc_info=True)
+        return jsonify(error="Database error: Failed to load the reaction index."), 500
+    models = reaction_index.models_for(reaction_id, request.args.get("source") or None)
+    after = request.args.get("after")
+    start = bisect.bisect_right(models, after, key=lambda item: item[0]) if after is not None else 0
+    page = models[start:start + limit]
+    response = jsonify(reaction_id=reaction_id, total=len(models),
+                       models=[{"model_id": model_id, "sources": sources} for model_id, sources in page])
+    if start + limit < len(models):
+        next_args = request.args.to_dict()
+        next_args.update(after=page[-1][0], limit=limit)
+        response.headers["Link"] = f'<{url_for("api_reaction_models", reaction_id=reaction_id, _external=True, **next_args)}>; rel="next"'
+    return response
+
+# --- Model Comparison ---
+# Metadata columns models can be grouped and filtered by, with their short query-parameter names.
+COMPARE_FIELDS = {"algorithm": "gapfill_algorithm", "tool": "annotation_tool", "media": "growth_media", "species": "Species_Name"}
+
+def _bitset(positions):
+    """ Builds an int with the given bit positions set (one pass, instead of an int copy per bit). """
+    buf = bytearray(max(positions) // 8 + 1)
+    for pos in positions: buf[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buf, "little")
+
+def load_model_meta(model_ids):
+    """ COMPARE_FIELDS columns of gapfill_models rows, by id. """
+    cur = get_db_cursor(readonly=True)
+    try:
+        rows = fetch_models_by_ids(cur, sorted(model_ids))
+    finally:
+        cur.close()
+    return {row["id"]: {column: row[column] for column in COMPARE_FIELDS.values()} for row in rows}
+
+class ReactionSetIndex:
+    """
+    In-memory reaction set of every model in `table`, for comparisons that never touch the database.
+
+    Reaction ids are interned to bit positions and each model's set is one Python int used
+    as a bitset, so intersections, differences and unions are single C-level bitwise
+    operations and set sizes are int.bit_count(). Kept current like SearchIndex: `id > max_id`
+    syncs (forced right after an upload is indexed) plus periodic full rebuilds, which also
+    drop reactions removed by re-indexing. The database is read outside the lock and each
+    sync's result is applied in one step, so a failed sync leaves the index unchanged.
+    """
+    _STATE = ("_sets", "_meta", "_reactions", "_reaction_bits", "max_id")
+
+    def __init__(self, table, model_column, load_meta=None):
+        self.table = table
+        self.model_column = model_column
+        self._load_meta = load_meta
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._sets = {}
+        self._meta = {}
+        self._reactions, self._reaction_bits = [], {}
+        self.max_id = 0
+        self.loaded_at = None
+        self.synced_at = 0.0
+
+    def sync(self, force_rebuild=False, force=False):
+        """ Loads new rows; `force` skips the sync interval, a full rebuild happens on first use or when the rebuild interval passed. """
+        def due():
+            rebuild = force_rebuild or self.loaded_at is None or now - self.loaded_at > app.config['COMPARE_REBUILD_INTERVAL']
+            return rebuild, rebuild or force or now - self.synced_at >= app.config['COMPARE_SYNC_INTERVAL']
+
+        now = time.monotonic()
+        if not due()[1]: return
+        # A forced sync must see the caller's own commit, so it waits for a running one instead of skipping.
+        if not self._sync_lock.acquire(blocking=self.loaded_at is None or force_rebuild or force): return
+        try:
+            rebuild, needed = due()
+            if not needed: return
+            if not rebuild:
+                changed = self._load()
+                if changed: app.logger.info(f"Reaction sets picked up {changed} new/updated models from {self.table}.")
+                self.synced_at = now
+                return
+            fresh = ReactionSetIndex(self.table, self.model_column, self._load_meta)
+            fresh._load()
+            with self._lock:
+                for name in self._STATE: setattr(self, name, getattr(fresh, name))
+                self.loaded_at = self.synced_at = now
+            app.logger.info(f"Reaction sets of {len(self._sets)} models ({len(self._reactions)} reactions) rebuilt from {self.table}.")
+        finally:
+            self._sync_lock.release()
+
+    def _load(self):
+        """ Reads the rows above max_id and their models' metadata, then applies them under the lock. Returns how many models changed. """
+        # Only the thread holding _sync_lock adds reactions, so the current ones can be read without the lock.
+        reaction_bits, next_bit = self._reaction_bits, len(self._reactions)
+        new_reactions, new_bits, positions, max_id = [], {}, {}, self.max_id
+        cur = get_db_cursor(readonly=True, buffered=False)
+        try:
+            cur.execute(f"SELECT id, {self.model_column}, reaction_id FROM {self.table} WHERE id > ? AND {self.model_column} IS NOT NULL ORDER BY id", (self.max_id,))
+            while True:
+                batch = cur.fetchmany(app.config['STREAM_FETCH_SIZE'])
+                if not batch: break
+                for _, model_id, reaction_id in batch:
+                    bit = reaction_bits.get(reaction_id)
+                    if bit is None: bit = new_bits.get(reaction_id)
+                    if bit is None:
+                        bit = new_bits[reaction_id] = next_bit + len(new_reactions)
+                        new_reactions.append(reaction_id)
+                    positions.setdefault(model_id, []).append(bit)
+                max_id = batch[-1][0]
+        finally:
+            cur.close()
+        new_models = [model_id for model_id in positions if model_id not in self._meta]
+        meta = self._load_meta(new_models) if new_models and self._load_meta else {}
+        bitsets = {model_id: _bitset(bits) for model_id, bits in positions.items()}
+        with self._lock:
+            self._reactions.extend(new_reactions)
+            self._reaction_bits.update(new_bits)
+            for model_id, bits in bitsets.items(): self._sets[model_id] = self._sets.get(model_id, 0) | bits
+            for model_id in new_models: self._meta[model_id] = meta.get(model_id, {})
+            self.max_id = max_id
+        return len(positions)
+
+    def select(self, model_ids=None, filters=None):
+        """ Model ids in the index, restricted to `model_ids` and to models whose metadata equals `filters` (case-insensitive). """
+        filters = {column: str(value).lower() for column, value in (filters or {}).items()}
+        with self._lock:
+            candidates = [m for m in model_ids if m in self._sets] if model_ids is not None else sorted(self._sets)
+            return [m for m in candidates if all(str(self._meta[m].get(column) or "").lower() == value for column, value in filters.items())]
+
+    def members(self, bits, limit=None):
+        """ Sorted reaction ids of a bitset, at most `limit` of them. """
+        data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+        reactions = self._reactions
+        found = [reactions[i * 8 + j] for i, byte in enumerate(data) if byte for j in range(8) if byte >> j & 1]
+        found.sort()
+        return found if limit is None else found[:limit]
+
+    def compare(self, model_ids, list_limit=0):
+        """
+        N-way comparison: per-model size and reactions found in no other selected model, the
+        reactions common to all, the union size and the pairwise Jaccard similarity matrix.
+        Reaction ids are listed (up to `list_limit` per set) only when list_limit > 0.
+        """
+        with self._lock:
+            sets = [self._sets[m] for m in model_ids]
+            meta = [self._meta[m] for m in model_ids]
+        sizes = [bits.bit_count() for bits in sets]
+        # prefix[i] / suffix[i] are the unions of the sets before / from i: "all others" is one OR per model.
+        prefix, suffix = [0], [0] * (len(sets) + 1)
+        for bits in sets: prefix.append(prefix[-1] | bits)
+        for i in range(len(sets) - 1, -1, -1): suffix[i] = suffix[i + 1] | sets[i]
+        common = functools.reduce(lambda a, b: a & b, sets) if sets else 0
+        matrix = [[1.0] * len(sets) for _ in sets]
+        for i in range(len(sets)):
+            for j in range(i + 1, len(sets)):
+                shared = (sets[i] & sets[j]).bit_count()
+                union = sizes[i] + sizes[j] - shared
+                matrix[i][j] = matrix[j][i] = round(shared / union, 4) if union else 1.0
+        models = []
+        for i, model_id in enumerate(model_ids):
+            unique = sets[i] & ~(prefix[i] | suffix[i + 1])
+            entry = {"model_id": model_id, **meta[i], "reactions": sizes[i], "unique": unique.bit_count()}
+            if list_limit: entry["unique_reactions"] = self.members(unique, list_limit)
+            models.append(entry)
+        result = {"models": models, "common": common.bit_count(), "union": prefix[-1].bit_count(), "jaccard": matrix}
+        if list_limit: result["common_reactions"] = self.members(common, list_limit)
+        return result
+
+    def unique_to_group(self, model_ids, column, value, mode="any"):
+        """
+        Splits `model_ids` into the models whose `column` equals `value` and the rest, and returns
+        (group ids, bitset of reactions in the group but in none of the rest). mode 'any' takes
+        reactions found in at least one group model, 'all' only those found in every group model.
+        """
+        value = str(value).lower()
+        with self._lock:
+            group = [m for m in model_ids if str(self._meta[m].get(column) or "").lower() == value]
+            in_group = set(group)
+            others = functools.reduce(lambda a, b: a | b, (self._sets[m] for m in model_ids if m not in in_group), 0)
+            group_sets = [self._sets[m] for m in group]
+        if not group_sets: return group, 0
+        combine = (lambda a, b: a & b) if mode == "all" else (lambda a, b: a | b)
+        return group, functools.reduce(combine, group_sets) & ~others
+
+    def stats(self):
+        with self._lock:
+            return {"table": self.table, "models": len(self._sets), "reactions": len(self._reactions), "max_id": self.max_id}
+
+# Models uploaded through the app, with their gapfill_models metadata; and the externally loaded gap_filling_results.
+reaction_sets = {
+    "metabolic_reactions": ReactionSetIndex("metabolic_reactions", "gapfill_model_id", load_model_meta),
+    "gap_filling_results": ReactionSetIndex("gap_filling_results", "model_id"),
+}
+
+def refresh_reaction_sets():
+    """ Adds just-indexed models to this process's reaction sets; other workers pick them up within COMPARE_SYNC_INTERVAL. """
+    index = reaction_sets["metabolic_reactions"]
+    if index.loaded_at is None: return  # built on first use anyway
+    try: index.sync(force=True)
+    except mariadb.Error as e: app.logger.warning(f"Reaction sets not refreshed after indexing: {e}")
+
+def parse_compare_selection():
+    """ Returns (index, model_ids) for the ?table=, ?models= and metadata filter parameters. Raises BadRequest. """
+    index = reaction_sets.get(request.args.get("table", "metabolic_reactions"))
+    if index is None: raise BadRequest(f"table must be one of: {', '.join(reaction_sets)}.")
+    requested = None
+    if request.args.get("models"):
+        requested = [m.strip() for m in request.args["models"].split(",") if m.strip()]
+        if index.model_column == "gapfill_model_id":
+            try: requested = [int(m) for m in requested]
+            except ValueError: raise BadRequest("models must be a comma-separated list of model ids.")
+    filters = {column: request.args[name] for name, column in COMPARE_FIELDS.items() if request.args.get(name)}
+    if filters and index.model_column != "gapfill_model_id": raise BadRequest("Metadata filters only apply to table=metabolic_reactions.")
+    index.sync()
+    model_ids = index.select(requested, filters)
+    if requested is not None:
+        missing = [m for m in requested if m not in set(model_ids)]
+        if missing and not filters: raise NotFound(f"No indexed reactions for model(s): {', '.join(map(str, missing))}.")
+    return index, model_ids
+
+@app.route("/api/compare", methods=["GET"])
+def api_compare_models():
+    """
+    Compares the reaction sets of several models.
+
+    Models are picked with ?models=1,2,3 and/or the metadata filters algorithm, tool, media
+    and species (e.g. ?media=glucose compares every glucose model). ?table=gap_filling_results
+    compares gap-filling result sets by model_id instead. ?reactions=N lists up to N reaction
+    ids per unique/common set. At most COMPARE_MAX_MODELS models per request.
+    """
+    try:
+        index, model_ids = parse_compare_selection()
+        list_limit = min(max(request.args.get("reactions", 0, type=int) or 0, 0), app.config['COMPARE_MAX_REACTIONS'])
+    except HTTPException as e:
+        return jsonify(error=e.description), e.code
+    except mariadb.Error as db_e:
+        app.logger.error(f"API DB error in api_compare_models(): {db_e}", exc_info=True)
+        return jsonify(error="Database error: Failed to load reaction sets."), 500
+    if len(model_ids) < 2: return jsonify(error=f"Need at least two models with indexed reactions to compare, found {len(model_ids)}."), 400
+    if len(model_ids) > app.config['COMPARE_MAX_MODELS']:
+        return jsonify(error=f"{len(model_ids)} models selected; narrow the selection to at most {app.config['COMPARE_MAX_MODELS']}."), 400
+    return jsonify(table=index.table, **index.compare(model_ids, list_limit))
+
+@app.route("/api/compare/unique", methods=["GET"])
+def api_compare_unique():
+    """
+    Reactions unique to one group of models, e.g. ?by=algorithm&value=gapseq: reactions in
+    gapseq models that no model with another algorithm has. The compared models are selected
+    as for /api/compare (e.g. add &media=glucose to hold the media fixed). ?mode=all only keeps
+    reactions every group model has; ?limit caps the listed reaction ids.
+    """
+    try:
+        column = COMPARE_FIELDS.get(request.args.get("by", ""))
+        if column is None: raise BadRequest(f"by must be one of: {', '.join(COMPARE_FIELDS)}.")
+        if not request.args.get("value"): raise BadRequest("value is required.")
+        mode = request.args.get("mode", "any")
+        if mode not in ("any", "all"): raise BadRequest("mode must be 'any' or 'all'.")
+        if request.args.get("table", "metabolic_reactions") != "metabolic_reactions": raise BadRequest("Grouping needs model metadata, which only table=metabolic_reactions has.")
+        _, limit = parse_page_args()
+        index, model_ids = parse_compare_selection()
+    except HTTPException as e:
+        return jsonify(error=e.description), e.code
+    except mariadb.Error as db_e:
+        app.logger.error(f"API DB error in api_compare_unique(): {db_e}", exc_info=True)
+        return jsonify(error="Database error: Failed to load reaction sets."), 500
+    group, unique = index.unique_to_group(model_ids, column, request.args["value"], mode)
+    if not group: return jsonify(error=f"No indexed model has {request.args['by']} '{request.args['value']}' among the {len(model_ids)} selected."), 404
+    return jsonify(by=column, value=request.args["value"], mode=mode, group_models=group, other_models=len(model_ids) - len(group),
+                   count=unique.bit_count(), reactions=index.members(unique, limit))
+
+# --- Bulk Import ---
+# Manifest columns: file (required, path of the main model inside the archive/directory),
+# growth_media, gapfill_algorithm, annotation_tool, growth_data, Species_Name, and optional
+# growth_file / biomass_file_5mM / biomass_file_20mM paths.
+BULK_OPTIONAL_COLUMNS = [cfg['db_column'] for cfg in OPTIONAL_UPLOADS.values()]
+
+def read_manifest(path):
+    """ Loads a CSV/TSV or JSON manifest into a list of dicts. """
+    path = Path(path)
+    if path.suffix.lower() == ".json":
+        with open(path, encoding="utf-8") as fh: data = json.load(fh)
+        if isinstance(data, dict): data = data.get("models", [])
+        if not isinstance(data, list) or not all(isinstance(r, dict) for r in data):
+            raise ValueError("JSON manifest must be a list of objects (or {\"models\": [...]}).")
+        return data
+    delimiter = "\t" if path.suffix.lower() == ".tsv" else ","
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        return [{k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k} for row in csv.DictReader(fh, delimiter=delimiter)]
+
+def extract_archive(archive_path, dest):
+    """ Extracts a zip or tar archive into `dest`, refusing members that would land outside it. """
+    dest = Path(dest).resolve()
+    dest.mkdir(parents=True, exist_ok=True)
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as zf:
+            for member in zf.namelist():
+                if not (dest / member).resolve().is_relative_to(dest): raise ValueError(f"Unsafe path in archive: {member}")
+            zf.extractall(dest)
+    elif tarfile.is_tarfile(archive_path):
+        with tarfile.open(archive_path) as tf:
+            tf.extractall(dest, filter="data")
+    else:
+        raise ValueError("Archive must be a .zip or .tar(.gz) file.")
+
+def validate_manifest(rows, source_dir, skip=()):
+    """
+    Checks every manifest row and stages its files in the content store before any row is inserted.
+
+    Returns (plans, errors): a plan per valid row holding its gapfill_models values, and
+    {"row", "file", "error"} entries for the rejected ones. Rows numbered in `skip` (already
+    imported) are left out. Objects staged for rejected rows are left for gc-objects.
+    """
+    source_dir = Path(source_dir).resolve()
+    plans, errors, seen = [], [], set()
+    staged = {}  # source path -> digest, so a TSV shared by many rows is hashed once
+
+    def stage(rel):
+        src = (source_dir / rel).resolve()
+        if not src.is_relative_to(source_dir): raise ValueError(f"'{rel}' points outside the import directory.")
+        if not src.is_file(): raise ValueError(f"File '{rel}' not found.")
+        filename = secure_filename(src.name)
+        if not filename: raise ValueError(f"Invalid filename '{rel}'.")
+        if src not in staged:
+            started = time.perf_counter()
+            staged[src], size, deduplicated = content_store.put_file(src)
+            record_upload("bulk", size, time.perf_counter() - started, deduplicated)
+        return make_ref(staged[src], filename)
+
+    cur = get_db_cursor()
+    try:
+        for index, row in enumerate(rows, start=1):
+            if index in skip: continue
             try:
-                if not getattr(conn, '_closed', True): conn.rollback()
-            except mariadb.Error as rb_e: app.logger.error(f"Outer rollback failed: {rb_e}")
-        app.logger.warning(f"Initiating file cleanup due to error: {e}")
-        app.logger.debug(f"Files to potentially clean up: {saved_files_paths}")
-        for file_path_obj in saved_files_paths:
+                rel = (row.get("file") or "").strip()
+                if not rel: raise ValueError("Missing 'file' column.")
+                main_ext = Path(rel).suffix.lower()
+                if main_ext not in ALLOWED_EXTENSIONS: raise ValueError(f"Invalid main file type '{main_ext}'. Only {', '.join(ALLOWED_EXTENSIONS)} allowed.")
+                optional_refs = {}
+                for column in BULK_OPTIONAL_COLUMNS:
+                    opt_rel = (row.get(column) or "").strip()
+                    if not opt_rel: continue
+                    if not opt_rel.lower().endswith(".tsv"): raise ValueError(f"{column} '{opt_rel}' is not a .tsv file.")
+                    optional_refs[column] = stage(opt_rel)
+                main_ref = stage(rel)
+                meta = build_gapfill_meta(parse_ref(main_ref)[1], main_ref, row, optional_refs, species_name=row.get("Species_Name"))
+                key = (main_ref, meta["growth_media"], meta["gapfill_algorithm"], meta["annotation_tool"], meta["growth_data"])
+                if key in seen: raise ValueError("Duplicate of an earlier manifest row (same file and metadata).")
+                duplicate_id = find_duplicate_model(cur, meta)
+                if duplicate_id: raise ValueError(f"An identical model (same file and metadata) already exists as ID {duplicate_id}.")
+                seen.add(key)
+                plans.append({"row": index, "meta": meta})
+            except (ValueError, OSError) as e:
+                errors.append({"row": index, "file": row.get("file"), "error": str(e)})
+    finally:
+        try: cur.close()
+        except mariadb.Error: pass
+    return plans, errors
+
+def bulk_import(plans, batch_size, progress=None, on_commit=None):
+    """
+    Inserts validated manifest rows in batches with multi-row INSERTs, one commit per batch.
+
+    A batch that fails as a whole is replayed row by row so only the offending rows are
+    reported. `on_commit(plans)` is called right after each commit with the plans (now
+    carrying their model "id") it made permanent, and `progress(done, total)` after each
+    batch. Returns (inserted, errors).
+    """
+    inserted, errors = [], []
+    ensure_schema_migrated()  # before any batch transaction opens
+    conn = get_db_conn()
+    cur = get_db_cursor()
+
+    def write(batch):
+        ids = insert_gapfill_rows(cur, [plan["meta"] for plan in batch])
+        for plan, model_id in zip(batch, ids):
+            plan["id"] = model_id
+            if plan["meta"]["file_name"].lower().endswith(".xml"):
+                with open_stored_file(plan["meta"]["file_link"]) as source:
+                    plan["indexed"] = ingest_sbml(cur, model_id, source, plan["meta"]["Species_Name"])
+
+    try:
+        for start in range(0, len(plans), batch_size):
+            batch, batch_inserted = plans[start:start + batch_size], []
             try:
-                file_path = Path(file_path_obj)
-                if file_path.is_file(): file_path.unlink(); app.logger.info(f"Cleaned up file: {file_path}")
-                elif file_path.exists(): app.logger.warning(f"Cleanup skipped: Path exists but is not a file: {file_path}")
-            except Exception as del_e: app.logger.error(f"Could not delete file '{file_path_obj}' during cleanup: {del_e}", exc_info=True)
-
-        status_code = 500; error_message = "An unexpected internal server error occurred during upload."
-        if isinstance(e, mariadb.IntegrityError): error_message, status_code = str(e), 400
-        elif isinstance(e, mariadb.Error): error_message = f"Database operation failed: {e}"
-        elif isinstance(e, IOError): error_message = str(e)
-        elif isinstance(e, FileExistsError): error_message, status_code = str(e), 409
-        elif isinstance(e, mariadb.OperationalError): error_message, status_code = f"Database connection error: {e}", 503
-        return jsonify(error=error_message), status_code
+                write(batch)
+                conn.commit()
+                batch_inserted.extend(batch)
+                if on_commit: on_commit(batch)
+            except (mariadb.Error, SBMLParseError, OSError) as batch_e:
+                conn.rollback()
+                if isinstance(batch_e, (mariadb.InterfaceError, mariadb.OperationalError)): raise
+                app.logger.warning(f"Bulk batch starting at row {batch[0]['row']} failed ({batch_e}); retrying row by row.")
+                for plan in batch:
+                    try:
+                        write([plan])
+                        conn.commit()
+                        batch_inserted.append(plan)
+                        if on_commit: on_commit([plan])
+                    except (mariadb.IntegrityError, mariadb.ProgrammingError, mariadb.DataError, SBMLParseError, OSError) as row_e:
+                        conn.rollback()
+                        errors.append({"row": plan["row"], "file": plan["meta"]["file_name"], "error": str(row_e)})
+            inserted.extend(batch_inserted)
+            for plan in batch_inserted:
+                if plan.get("id") is not None:
+                    post_commit(search_index.add_document, plan["id"], plan["meta"])
+                    post_commit(convert_growth_files, plan["meta"])
+            if progress: progress(min(start + batch_size, len(plans)), len(plans))
     finally:
-        if 'cur' in locals() and cur and not getattr(cur, 'closed', True):
-             try: cur.close()
-             except mariadb.Error as e: app.logger.error(f"Error closing cursor: {e}", exc_info=True)
+        try: cur.close()
+        except mariadb.Error: pass
+        if inserted:
+            post_commit(query_cache.invalidate, "gapfill_models", "metabolic_reactions")
+            post_commit(refresh_reaction_sets)
+    return inserted, errors
+
+def bulk_report(total, inserted, errors):
+    return {
+        "total": total,
+        "inserted": len(inserted),
+        "failed": len(errors),
+        "ids": [plan["id"] for plan in inserted],
+        "errors": sorted(errors, key=lambda err: err["row"]),
+    }
+
+@app.route("/api/models/bulk", methods=["POST"])
+def api_bulk_import():
+    """
+    Bulk model import: a 'manifest' file (CSV/TSV/JSON) plus an 'archive' (zip/tar) holding
+    the files it references. Archives larger than one request allows are sent through
+    /api/uploads first and referenced as 'archive_ref'. Responds 202 with a job id; the job
+    result lists per-row errors.
+    """
+    manifest = request.files.get("manifest")
+    archive = request.files.get("archive")
+    archive_ref = request.form.get("archive_ref")
+    if not manifest or not manifest.filename: return jsonify(error="No 'manifest' file provided."), 400
+    if archive_ref:
+        parsed = parse_ref(archive_ref)
+        if not parsed or not content_store.exists(parsed[0]): return jsonify(error="'archive_ref' does not name a stored upload."), 400
+    elif not archive or not archive.filename: return jsonify(error="No 'archive' file or 'archive_ref' provided."), 400
+    manifest_ext = Path(manifest.filename).suffix.lower()
+    if manifest_ext not in (".csv", ".tsv", ".json"): return jsonify(error="Manifest must be .csv, .tsv or .json."), 400
+    batch_size = request.form.get("batch_size", app.config['BULK_BATCH_SIZE'], type=int)
+    if not batch_size or batch_size < 1: return jsonify(error="batch_size must be a positive integer."), 400
+
+    job_id = uuid.uuid4().hex
+    staging_dir = STAGING_FOLDER / job_id
+    try:
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        manifest.save(str(staging_dir / f"manifest{manifest_ext}"))
+        payload = {"manifest": f"manifest{manifest_ext}", "batch_size": batch_size}
+        if archive_ref: payload["archive"] = archive_ref
+        else: archive.save(str(staging_dir / "archive"))
+        job_queue.submit("bulk_import", payload, job_id=job_id)
+    except Exception as e:
+        app.logger.error(f"Error staging bulk import: {e}", exc_info=True)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return jsonify(error=f"Could not queue bulk import: {e}"), 500
+    return jsonify(job_id=job_id, status="queued", status_url=url_for("api_job_status", job_id=job_id)), 202
+
+def bulk_archive_path(job, staging_dir):
+    """ Path of a bulk job's archive: the posted file, or the stored 'archive_ref' object (decompressed into staging if gzipped). """
+    ref = parse_ref(job.payload.get("archive"))
+    if not ref: return staging_dir / "archive"
+    path, encoding = content_store.locate(ref[0])
+    if path is None: raise FileNotFoundError(f"Stored archive {ref[0]} no longer exists.")
+    if encoding is None: return path
+    with content_store.open(ref[0]) as src, open(staging_dir / "archive", "wb") as dst: shutil.copyfileobj(src, dst, app.config['CAS_CHUNK_SIZE'])
+    return staging_dir / "archive"
+
+@job_handler("bulk_import")
+def process_bulk_import(job):
+    """ Extracts the archive, validates the manifest and imports the valid rows in batches. """
+    staging_dir = STAGING_FOLDER / job.id
+    files_dir = staging_dir / "files"
+    try:
+        rows = read_manifest(staging_dir / job.payload["manifest"])
+        if not files_dir.exists(): extract_archive(bulk_archive_path(job, staging_dir), files_dir)
+    except (ValueError, OSError, csv.Error, tarfile.TarError, zipfile.BadZipFile) as e:
+        raise JobFailed(f"Could not read bulk import input: {e}", 400)
+    # Batches committed before a cancellation or failure stay imported. Each one is recorded in the
+    # job's result as it commits, so the caller sees what was inserted and a retry skips those rows.
+    batches = (job.partial or {}).get("batches", [])
+    done = {row: model_id for batch in batches for row, model_id in zip(batch["rows"], batch["ids"])}
+    resumed = [{"row": row, "id": model_id} for row, model_id in done.items()]
+    plans, errors = validate_manifest(rows, files_dir, skip=done)
+    job.progress(5, f"{len(plans) + len(resumed)} of {len(rows)} rows valid" + (f", {len(resumed)} imported by an earlier attempt." if resumed else "."))
+    job.check_cancelled()
+    def committed(batch):
+        batches.append({"rows": [plan["row"] for plan in batch], "ids": [plan["id"] for plan in batch]})
+        job.record({"batches": batches})
+    def report(done, total):
+        job.progress(5 + 95 * done // max(total, 1), f"Imported {done}/{total} valid rows.")
+        job.check_cancelled()
+    inserted, import_errors = bulk_import(plans, job.payload["batch_size"], progress=report, on_commit=committed)
+    return bulk_report(len(rows), resumed + inserted, errors + import_errors)
+
+@app.cli.command("import-models")
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option("--files", "files_path", type=click.Path(exists=True), required=True, help="Directory or zip/tar archive holding the referenced files.")
+@click.option("--batch-size", type=int, default=None, help="Rows per INSERT batch/commit (default BULK_BATCH_SIZE).")
+@click.option("--dry-run", is_flag=True, help="Only validate the manifest.")
+def import_models_command(manifest, files_path, batch_size, dry_run):
+    """ Bulk-imports models listed in MANIFEST (CSV/TSV/JSON) from a directory or archive of files. """
+    rows = read_manifest(manifest)
+    extracted = None
+    if Path(files_path).is_file():
+        extracted = STAGING_FOLDER / f"cli-{uuid.uuid4().hex}"
+        extract_archive(files_path, extracted)
+        files_path = extracted
+    try:
+        plans, errors = validate_manifest(rows, files_path)
+        click.echo(f"{len(plans)} of {len(rows)} manifest rows valid.")
+        if not dry_run:
+            progress = lambda done, total: click.echo(f"  imported {done}/{total}")
+            inserted, import_errors = bulk_import(plans, batch_size or app.config['BULK_BATCH_SIZE'], progress=progress)
+            errors += import_errors
+        else:
+            inserted = []
+        report = bulk_report(len(rows), inserted, errors)
+        click.echo(json.dumps(report, indent=2))
+    finally:
+        if extracted: shutil.rmtree(extracted, ignore_errors=True)
+
+
+# --- Charge Analytics ---
+CHARGE_ANALYTICS_VERSION = 1  # bump when the summary layout changes; old cache files are then ignored
+CHARGE_RECORD_TAGS = ("metabolite", "DATA_RECORD")  # generic XML records with <name> and <charge> children
+CHARGE_FILE_EXTENSIONS = {".xml", ".csv", ".tsv"}
+
+def _parse_charge(value):
+    try: charge = float(value)
+    except (TypeError, ValueError): return None
+    return charge if charge == charge else None  # NaN
+
+def iter_charge_records(stream, kind):
+    """
+    Streams (name, charge) pairs out of a binary file. `kind` "xml" reads SBML species and
+    <metabolite>/<DATA_RECORD> elements with iterparse; anything else is read as a CSV/TSV
+    table with 'name' and 'charge' columns.
+    """
+    if kind == "xml":
+        stack = []
+        try:
+            for event, elem in ET.iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    stack.append(elem)
+                    continue
+                stack.pop()
+                tag = _local(elem.tag)
+                if tag == "species":
+                    attrs = _local_attrs(elem)
+                    yield attrs.get("name") or attrs.get("id"), _species_charge(elem, attrs)
+                elif tag in CHARGE_RECORD_TAGS:
+                    fields = {_local(child.tag): (child.text or "").strip() for child in elem}
+                    yield fields.get("name"), _parse_charge(fields.get("charge"))
+                else:
+                    continue
+                elem.clear()
+                if stack: stack[-1].remove(elem)
+        except ET.ParseError as e:
+            raise SBMLParseError(f"Invalid SBML/XML: {e}") from e
+        return
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="replace", newline="")
+    header = text.readline()
+    delimiter = "\t" if "\t" in header else ","
+    columns = [c.strip().lower() for c in next(csv.reader([header], delimiter=delimiter), [])]
+    if "name" not in columns or "charge" not in columns: raise ValueError("Table must include 'name' and 'charge' columns.")
+    name_idx, charge_idx = columns.index("name"), columns.index("charge")
+    for row in csv.reader(text, delimiter=delimiter):
+        if len(row) > max(name_idx, charge_idx): yield row[name_idx].strip(), _parse_charge(row[charge_idx])
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 6)
+
+def summarize_charges(records, top_n):
+    """
+    Aggregates (name, charge) pairs into summary statistics, a histogram of charge values
+    and the `top_n` metabolites by |charge|. Charges are collected into a packed float64
+    array and reduced with NumPy when it is installed (pure-Python fallback otherwise).
+    """
+    names, charges, missing = [], array("d"), 0
+    for name, charge in records:
+        if not name or charge is None:
+            missing += 1
+            continue
+        names.append(name)
+        charges.append(charge)
+    if not charges: raise ValueError("No metabolites with both a name and a charge were found.")
+    k = min(top_n, len(charges))
+    if numpy is not None:
+        values = numpy.frombuffer(charges, dtype=numpy.float64)
+        levels, counts = numpy.unique(values, return_counts=True)
+        magnitude = numpy.abs(values)
+        top = numpy.empty(0, dtype=numpy.intp)
+        if k:
+            # k-th largest |charge| by partial selection; ties at the cut keep file order.
+            threshold = numpy.partition(magnitude, magnitude.size - k)[magnitude.size - k]
+            above = numpy.flatnonzero(magnitude > threshold)
+            top = numpy.concatenate((above, numpy.flatnonzero(magnitude == threshold)[:k - above.size]))
+        top = top[numpy.lexsort((top, -magnitude[top]))].tolist()  # |charge| desc, then file order
+        stats = dict(min=values.min(), max=values.max(), mean=values.mean(), std=values.std(), median=numpy.median(values), net_charge=values.sum(),
+                     positive=int((values > 0).sum()), negative=int((values < 0).sum()))
+        histogram = zip(levels.tolist(), counts.tolist())
+    else:
+        top = heapq.nsmallest(k, range(len(charges)), key=lambda i: (-abs(charges[i]), i))
+        stats = dict(min=min(charges), max=max(charges), mean=statistics.fmean(charges), std=statistics.pstdev(charges), median=statistics.median(charges), net_charge=sum(charges),
+                     positive=sum(1 for c in charges if c > 0), negative=sum(1 for c in charges if c < 0))
+        histogram = sorted(Counter(charges).items())
+    summary = {"count": len(charges), "missing": missing}
+    summary.update({key: value if key in ("positive", "negative") else _number(value) for key, value in stats.items()})
+    summary["neutral"] = summary["count"] - summary["positive"] - summary["negative"]
+    summary["histogram"] = [{"charge": _number(level), "count": int(count)} for level, count in histogram]
+    summary["top"] = [{"name": names[i], "charge": _number(charges[i])} for i in top]
+    return summary
+
+charge_memo = LocalCacheBackend(max_entries=app.config['CHARGE_MEMO_ENTRIES'])
+
+def stored_file_key(value):
+    """ (key, file name) of a stored file: its SHA-256, or a hash of path/mtime/size for legacy files. Raises FileNotFoundError. """
+    ref = parse_ref(value)
+    if ref:
+        if not content_store.exists(ref[0]): raise FileNotFoundError(value)
+        return ref[0], ref[1]
+    path = resolve_upload_path(value)
+    stat = path.stat()
+    return hashlib.sha1(f"{path}|{stat.st_mtime_ns:x}-{stat.st_size:x}".encode()).hexdigest(), path.name
+
+def charge_analytics(value):
+    """
+    Returns (cache_key, summary) for a stored file (content reference or legacy path).
+
+    Summaries are keyed by the file's SHA-256 (mtime/size for legacy files), kept in an
+    in-process LRU and persisted as JSON under .cache/analytics, so each file is parsed once.
+    """
+    key, filename = stored_file_key(value)
+    key = f"{key}-v{CHARGE_ANALYTICS_VERSION}"
+    summary = charge_memo.get(key)
+    if summary is not None: return key, summary
+    cache_path = ANALYTICS_CACHE_FOLDER / f"{key}.json"
+    try: summary = json.loads(cache_path.read_text())
+    except (OSError, ValueError): summary = None
+    if summary is None:
+        started = time.perf_counter()
+        kind = "xml" if Path(filename).suffix.lower() == ".xml" else "table"
+        with open_stored_file(value) as stream: summary = summarize_charges(iter_charge_records(stream, kind), app.config['CHARGE_TOP_MAX'])
+        ANALYTICS_CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_name(f"{cache_path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_text(json.dumps(summary))
+        os.replace(tmp, cache_path)
+        app.logger.info(f"Computed charge summary for '{filename}' ({summary['count']} metabolites) in {time.perf_counter() - started:.2f}s")
+    charge_memo.set(key, summary, 86400)
+    return key, summary
+
+def charge_response(value, **extra):
+    """ JSON charge summary for `value`, trimmed to ?top=N and revalidated by ETag. """
+    top = max(0, min(request.args.get("top", app.config['CHARGE_TOP_DEFAULT'], type=int), app.config['CHARGE_TOP_MAX']))
+    try:
+        key, summary = charge_analytics(value)
+    except FileNotFoundError:
+        return jsonify(error="File not found."), 404
+    except ValueError as e:  # includes SBMLParseError
+        return jsonify(error=str(e)), 400
+    response = jsonify(dict(summary, top=summary["top"][:top], **extra))
+    response.set_etag(f"{key}-{top}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route("/api/models/<int:model_id>/charges")
+def api_model_charges(model_id):
+    """ Charge distribution of a stored model: summary statistics, histogram and top-N by |charge|. """
+    try:
+        rows = cached_query("SELECT id, file_name, file_link FROM gapfill_models WHERE id = ?", (model_id,))
+    except mariadb.Error as db_e:
+        app.logger.error(f"Database error loading model {model_id} for charge analytics: {db_e}", exc_info=True)
+        return jsonify(error="Database error."), 500
+    if not rows or not rows[0]["file_link"]: return jsonify(error="Model not found."), 404
+    return charge_response(rows[0]["file_link"], model_id=model_id, file_name=rows[0]["file_name"])
+
+@app.route("/api/charges", methods=["POST"])
+def api_file_charges():
+    """
+    Charge distribution of an uploaded SBML/XML or name/charge CSV/TSV file ('dataFile', or
+    'dataFile_ref' from /api/uploads). The file goes into the content store, so repeat
+    requests for the same content are answered from the cache.
+    """
+    # Checked before anything is stored, so rejected uploads never reach the content store.
+    name = request.files["dataFile"].filename if "dataFile" in request.files else request.form.get("dataFile_ref")
+    if not name: return jsonify(error="No file provided ('dataFile')."), 400
+    if Path(name).suffix.lower() not in CHARGE_FILE_EXTENSIONS:
+        return jsonify(error=f"Unsupported file type. Use one of {', '.join(sorted(CHARGE_FILE_EXTENSIONS))}."), 400
+    try:
+        ref = receive_upload("dataFile")
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if not ref: return jsonify(error="No file provided ('dataFile')."), 400
+    return charge_response(ref, ref=ref, file_name=parse_ref(ref)[1])
+
+
+# --- Growth Data Store ---
+# Growth and biomass TSVs are parsed once into a columnar file per stored object:
+#   b"GCOL" | uint32 header length | JSON header | column blocks (8-byte aligned)
+# Numeric columns are little-endian float64 (NaN for blanks), text columns int32 codes
+# (-1 for blanks) into a dictionary kept in the header. A column is read (or memory-mapped
+# with NumPy) on its own, so an aggregation only touches the bytes of the columns it uses.
+COLUMNAR_VERSION = 1
+COLUMNAR_MAGIC = b"GCOL"
+GROWTH_FILE_COLUMNS = {"growth": "growth_file", "biomass_5mM": "biomass_file_5mM", "biomass_20mM": "biomass_file_20mM"}
+GROWTH_REDUCTIONS = ("mean", "min", "max", "last", "sum")
+
+def _little_endian(values):
+    if sys.byteorder != "little": values.byteswap()
+    return values
+
+def parse_table_columns(stream):
+    """ Reads a TSV/CSV table into typed columns: [(name, "f8", array('d')) or (name, "dict", array('i') codes, labels)], row count. """
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="replace", newline="")
+    header = text.readline()
+    delimiter = "\t" if "\t" in header or "," not in header else ","
+    names = [c.strip() or f"column_{i + 1}" for i, c in enumerate(next(csv.reader([header], delimiter=delimiter), []))]
+    if not names: raise ValueError("Table has no header row.")
+    cells = [[] for _ in names]
+    for row in csv.reader(text, delimiter=delimiter):
+        if not any(cell.strip() for cell in row): continue
+        for i, column in enumerate(cells): column.append(row[i].strip() if i < len(row) else "")
+    columns = []
+    for name, raw in zip(names, cells):
+        try:
+            columns.append((name, "f8", array("d", (float(v) if v else math.nan for v in raw))))
+        except ValueError:
+            labels = sorted({v for v in raw if v})
+            codes = {label: i for i, label in enumerate(labels)}
+            columns.append((name, "dict", array("i", (codes[v] if v else -1 for v in raw)), labels))
+    return columns, len(cells[0])
+
+def write_columnar(path, columns, rows):
+    """ Writes parsed columns in the GCOL layout (atomically). """
+    header, blocks, offset = {"version": COLUMNAR_VERSION, "rows": rows, "columns": []}, [], 0
+    for name, kind, values, *labels in columns:
+        data = _little_endian(array(values.typecode, values)).tobytes()
+        entry = {"name": name, "type": kind, "offset": offset, "nbytes": len(data)}
+        if labels: entry["labels"] = labels[0]
+        header["columns"].append(entry)
+        blocks.append(data + b"\0" * (-len(data) % 8))
+        offset += len(blocks[-1])
+    encoded = json.dumps(header).encode()
+    encoded += b" " * (-(8 + len(encoded)) % 8)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(COLUMNAR_MAGIC + len(encoded).to_bytes(4, "little") + encoded)
+        for block in blocks: fh.write(block)
+    os.replace(tmp, path)
+
+class ColumnarTable:
+    """ Read access to one GCOL file: the header is parsed on open, column data only on read(). """
+
+    def __init__(self, path):
+        with open(path, "rb") as fh:
+            magic, length = fh.read(4), int.from_bytes(fh.read(4), "little")
+            if magic != COLUMNAR_MAGIC: raise ValueError(f"Not a columnar table: {path}")
+            self.header = json.loads(fh.read(length))
+        self.path = path
+        self.rows = self.header["rows"]
+        self.data_start = 8 + length
+        self.columns = {column["name"]: column for column in self.header["columns"]}
+
+    def numeric_columns(self):
+        return [name for name, column in self.columns.items() if column["type"] == "f8"]
+
+    def read(self, name):
+        """ One column: float64 values (a read-only memory map with NumPy, else an array('d')), or labels for text columns. """
+        column = self.columns[name]
+        if column["type"] == "f8" and numpy is not None:
+            if not self.rows: return numpy.empty(0)
+            return numpy.memmap(self.path, dtype="<f8", mode="r", offset=self.data_start + column["offset"], shape=(self.rows,))
+        with open(self.path, "rb") as fh:
+            fh.seek(self.data_start + column["offset"])
+            values = array("d" if column["type"] == "f8" else "i")
+            values.frombytes(fh.read(column["nbytes"]))
+        values = _little_endian(values)
+        return values if column["type"] == "f8" else [column["labels"][code] if code >= 0 else None for code in values]
+
+def growth_table(value):
+    """ Returns (key, ColumnarTable) for a stored TSV, converting it on first use. Raises FileNotFoundError/ValueError. """
+    key, filename = stored_file_key(value)
+    key = f"{key}-v{COLUMNAR_VERSION}"
+    path = COLUMNAR_FOLDER / f"{key}.gcol"
+    try:
+        return key, ColumnarTable(path)
+    except FileNotFoundError:
+        pass
+    started = time.perf_counter()
+    with open_stored_file(value) as stream: columns, rows = parse_table_columns(stream)
+    write_columnar(path, columns, rows)
+    app.logger.info(f"Converted '{filename}' to columnar ({rows} rows x {len(columns)} columns) in {time.perf_counter() - started:.3f}s")
+    return key, ColumnarTable(path)
+
+def convert_growth_files(meta):
+    """ Parses a model's growth/biomass TSVs into the columnar store at ingest. Failures are logged: the raw TSV stays authoritative. """
+    for column in GROWTH_FILE_COLUMNS.values():
+        if not meta.get(column): continue
+        try: growth_table(meta[column])
+        except (OSError, ValueError) as e: app.logger.warning(f"Could not convert {column} '{meta[column]}' to columnar: {e}")
+
+def reduce_values(values, how):
+    """ NaN-skipping reduction of a float column; None if it has no values. """
+    if numpy is not None:
+        data = numpy.asarray(values)
+        data = data[~numpy.isnan(data)]
+        if not data.size: return None
+        return float(data[-1] if how == "last" else getattr(data, how)())
+    data = [v for v in values if v == v]
+    if not data: return None
+    return data[-1] if how == "last" else {"mean": statistics.fmean, "min": min, "max": max, "sum": math.fsum}[how](data)
+
+def describe_values(values):
+    """ count/mean/std/min/median/max of a list of floats. """
+    if numpy is not None:
+        data = numpy.asarray(values, dtype=numpy.float64)
+        stats = dict(mean=data.mean(), std=data.std(), min=data.min(), median=numpy.median(data), max=data.max())
+    else:
+        stats = dict(mean=statistics.fmean(values), std=statistics.pstdev(values), min=min(values), median=statistics.median(values), max=max(values))
+    return {"count": len(values), **{key: round(float(value), 6) for key, value in stats.items()}}
+
+def describe_groups(keys, values):
+    """
+    describe_values() per distinct key. With NumPy all groups are reduced in one pass: one
+    sort by (group, value), then reduceat over the group boundaries; medians, minima and
+    maxima are read off the sorted runs.
+    """
+    if numpy is None:
+        groups = {}
+        for key, value in zip(keys, values): groups.setdefault(key, []).append(value)
+        return {key: describe_values(group) for key, group in groups.items()}
+    labels, codes = {}, []
+    for key in keys: codes.append(labels.setdefault(key, len(labels)))
+    codes, data = numpy.asarray(codes), numpy.asarray(values, dtype=numpy.float64)
+    order = numpy.lexsort((data, codes))
+    codes, data = codes[order], data[order]
+    starts = numpy.flatnonzero(numpy.r_[True, codes[1:] != codes[:-1]])
+    counts = numpy.diff(numpy.r_[starts, data.size])
+    means = numpy.add.reduceat(data, starts) / counts
+    stds = numpy.sqrt(numpy.add.reduceat((data - numpy.repeat(means, counts)) ** 2, starts) / counts)
+    medians = (data[starts + (counts - 1) // 2] + data[starts + counts // 2]) / 2
+    columns = zip(codes[starts].tolist(), counts.tolist(), means.tolist(), stds.tolist(), data[starts].tolist(), medians.tolist(), data[starts + counts - 1].tolist())
+    keys_by_code = list(labels)
+    return {keys_by_code[code]: {"count": count, "mean": round(mean, 6), "std": round(std, 6), "min": round(low, 6), "median": round(median, 6), "max": round(high, 6)}
+            for code, count, mean, std, low, median, high in columns}
+
+growth_memo = LocalCacheBackend(max_entries=app.config['GROWTH_MEMO_ENTRIES'])
+
+def growth_file_value(value, column, how):
+    """ Reduction of one column of one stored TSV (the last numeric column if `column` is None), memoized per file. """
+    # Content references are immutable, so those are memoized by reference without touching the disk.
+    memo_key = (value if parse_ref(value) else stored_file_key(value)[0], column, how)
+    cached = growth_memo.get(memo_key)
+    if cached is not None: return cached[0]
+    _, table = growth_table(value)
+    name = column if column is not None else (table.numeric_columns() or [None])[-1]
+    result = reduce_values(table.read(name), how) if name in table.columns and table.columns[name]["type"] == "f8" else None
+    growth_memo.set(memo_key, (result,), 86400)
+    return result
+
+@app.route("/api/growth/aggregate", methods=["GET"])
+def api_growth_aggregate():
+    """
+    Cross-model aggregation over the growth/biomass tables.
+
+    Each model contributes one value: `reduce` (mean, min, max, last or sum; default max) of
+    `column` (default: the file's last numeric column) in its `file` (growth, biomass_5mM or
+    biomass_20mM). With `baseline` (another file) the value is file minus baseline, e.g.
+    ?file=biomass_20mM&baseline=biomass_5mM for 20 mM vs 5 mM deltas. Values are summarized
+    overall and, with ?by=media|algorithm|tool|species, per group. Models can be narrowed
+    with the same metadata filters as /api/compare; ?values=1 lists every model's value.
+    """
+    file_column = GROWTH_FILE_COLUMNS.get(request.args.get("file", "growth"))
+    baseline = request.args.get("baseline")
+    baseline_column = GROWTH_FILE_COLUMNS.get(baseline) if baseline else None
+    how = request.args.get("reduce", "max")
+    by = request.args.get("by")
+    if file_column is None or (baseline and baseline_column is None):
+        return jsonify(error=f"file and baseline must be one of: {', '.join(GROWTH_FILE_COLUMNS)}."), 400
+    if how not in GROWTH_REDUCTIONS: return jsonify(error=f"reduce must be one of: {', '.join(GROWTH_REDUCTIONS)}."), 400
+    if by and by not in COMPARE_FIELDS: return jsonify(error=f"by must be one of: {', '.join(COMPARE_FIELDS)}."), 400
+    column = request.args.get("column") or None
+
+    file_columns = [file_column] + ([baseline_column] if baseline_column else [])
+    query = f"SELECT {FULL_SCAN_OK} id, {', '.join(COMPARE_FIELDS.values())}, {', '.join(dict.fromkeys(file_columns))} FROM gapfill_models WHERE {' AND '.join(f'{c} IS NOT NULL' for c in file_columns)}"
+    params = []
+    for name, meta_column in COMPARE_FIELDS.items():
+        if request.args.get(name):
+            query += f" AND {meta_column} = ?"
+            params.append(request.args[name])
+    try:
+        rows = cached_query(query + " ORDER BY id", params)
+    except mariadb.Error as db_e:
+        app.logger.error(f"API DB error in api_growth_aggregate(): {db_e}", exc_info=True)
+        return jsonify(error="Database error: Failed to retrieve models."), 500
+
+    started = time.perf_counter()
+    values, skipped = [], 0
+    for row in rows:
+        try:
+            value = growth_file_value(row[file_column], column, how)
+            if value is not None and baseline_column:
+                base = growth_file_value(row[baseline_column], column, how)
+                value = value - base if base is not None else None
+        except (OSError, ValueError) as e:
+            app.logger.debug(f"Model {row['id']}: growth data unavailable: {e}")
+            value = None
+        if value is None: skipped += 1
+        else: values.append((row, value))
+    result = {"file": file_column, "baseline": baseline_column, "column": column, "reduce": how, "models": len(values), "skipped": skipped,
+              "overall": describe_values([v for _, v in values]) if values else None}
+    if by:
+        groups = describe_groups([row[COMPARE_FIELDS[by]] for row, _ in values], [value for _, value in values])
+        result["by"] = COMPARE_FIELDS[by]
+        result["groups"] = sorted(({"value": key, **stats} for key, stats in groups.items()), key=lambda g: (-g["count"], str(g["value"])))
+    if request.args.get("values") in ("1", "true"):
+        result["values"] = [{"model_id": row["id"], "value": round(value, 6)} for row, value in values]
+    result["scan_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return jsonify(result)
+
+@app.cli.command("index-growth")
+def index_growth_command():
+    """ Converts every model's growth/biomass TSVs to the columnar store (uploads do this at ingest). """
+    cur = get_db_cursor()
+    cur.execute(f"SELECT {FULL_SCAN_OK} id, {', '.join(GROWTH_FILE_COLUMNS.values())} FROM gapfill_models")
+    rows = dict_rows(cur)
+    cur.close()
+    for row in rows: convert_growth_files(row)
+    click.echo(f"Checked growth/biomass files of {len(rows)} model(s).")
+
 
 @app.route('/visualization')
 def functionality():
     return render_template('functionality.html', current_year=datetime.now().year)
 
+
+# --- Schema Migrations ---
+# The catalog tables as the app expects them. CREATE TABLE IF NOT EXISTS leaves an existing
+# (externally created) schema untouched, so migration 1 is a no-op baseline on live databases.
+BASE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS gapfill_models (
+         id INT AUTO_INCREMENT PRIMARY KEY,
+         Species_Name VARCHAR(255) NULL,
+         growth_media VARCHAR(255) NULL,
+         gapfill_algorithm VARCHAR(255) NULL,
+         annotation_tool VARCHAR(255) NULL,
+         file_name VARCHAR(255) NULL,
+         file_link VARCHAR(512) NULL,
+         growth_data VARCHAR(16) NULL,
+         growth_file VARCHAR(512) NULL,
+         biomass_file_5mM VARCHAR(512) NULL,
+         biomass_file_20mM VARCHAR(512) NULL,
+         Biomass_RCH1 VARCHAR(255) NULL
+       )""",
+    """CREATE TABLE IF NOT EXISTS metabolic_reactions (
+         id INT AUTO_INCREMENT PRIMARY KEY,
+         organism_id VARCHAR(64) NULL,
+         reaction_id VARCHAR(255) NULL,
+         reaction_name VARCHAR(512) NULL,
+         metabolites TEXT NULL,
+         flux_value DOUBLE NULL
+       )""",
+    """CREATE TABLE IF NOT EXISTS gap_filling_results (
+         id INT AUTO_INCREMENT PRIMARY KEY,
+         model_id VARCHAR(64) NULL,
+         reaction_id VARCHAR(255) NULL,
+         reaction_name VARCHAR(512) NULL,
+         source_database VARCHAR(64) NULL
+       )""",
+    """CREATE TABLE IF NOT EXISTS experimental_conditions (
+         id INT AUTO_INCREMENT PRIMARY KEY,
+         experiment_id VARCHAR(64) NULL,
+         media_composition TEXT NULL,
+         temperature DOUBLE NULL,
+         growth_outcome VARCHAR(64) NULL
+       )""",
+]
+# Indexes behind the gapfill_models lookups (duplicate check on file_link, media/growth filters)
+# and the experiment lookup on /demo. Prefix lengths keep the utf8mb4 keys within InnoDB's limit.
+CATALOG_INDEX_SCHEMA = [
+    """ALTER TABLE gapfill_models
+         ADD INDEX IF NOT EXISTS idx_gapfill_models_file (file_link(255)),
+         ADD INDEX IF NOT EXISTS idx_gapfill_models_media (growth_media(191)),
+         ADD INDEX IF NOT EXISTS idx_gapfill_models_growth (growth_data)""",
+    """ALTER TABLE experimental_conditions
+         ADD INDEX IF NOT EXISTS idx_experimental_conditions_experiment (experiment_id)""",
+]
+# Versioned schema changes, applied in order and recorded in schema_migrations. A released
+# migration is never edited (its checksum is compared on every run): append a new version.
+# MariaDB commits DDL implicitly, so every statement must be idempotent (IF NOT EXISTS) for a
+# migration interrupted half-way to be re-run safely.
+MIGRATIONS = [
+    (1, "catalog tables", BASE_SCHEMA),
+    (2, "SBML ingestion tables", INGEST_SCHEMA),
+    (3, "upload job table", JOBS_SCHEMA),
+    (4, "reaction query indexes", REACTION_QUERY_SCHEMA),
+    (5, "catalog filter indexes", CATALOG_INDEX_SCHEMA),
+    (6, "job owner and heartbeat", JOBS_LEASE_SCHEMA),
+]
+MIGRATIONS_TABLE = """CREATE TABLE IF NOT EXISTS schema_migrations (
+       version INT PRIMARY KEY,
+       name VARCHAR(255) NOT NULL,
+       checksum CHAR(40) NOT NULL,
+       applied_at DATETIME NOT NULL
+     )"""
+MIGRATION_LOCK = "gapfill_schema_migrations"
+_schema_migrated = False
+
+def migration_checksum(statements):
+    return hashlib.sha1("\n".join(" ".join(ddl.split()) for ddl in statements).encode()).hexdigest()
+
+def migrate(conn, target=None, dry_run=False):
+    """
+    Applies the pending MIGRATIONS up to version `target` (default: all) on `conn`.
+    Returns (schema version, [(version, name) applied or, with dry_run, pending]).
+    A named lock serializes processes starting at the same time.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(MIGRATIONS_TABLE)
+        cur.execute("SELECT GET_LOCK(?, ?)", (MIGRATION_LOCK, app.config['MIGRATION_LOCK_TIMEOUT']))
+        if cur.fetchone()[0] != 1: raise mariadb.OperationalError("Timed out waiting for another process to finish schema migrations.")
+        try:
+            cur.execute("SELECT version, checksum FROM schema_migrations")
+            applied = dict(cur.fetchall())
+            pending = []
+            for version, name, statements in MIGRATIONS:
+                if target is not None and version > target: break
+                checksum = migration_checksum(statements)
+                if version in applied:
+                    if applied[version] != checksum: app.logger.warning(f"Migration {version} ({name}) was edited after it was applied; it is not re-run. Add a new migration instead.")
+                    continue
+                pending.append((version, name))
+                if dry_run: continue
+                started = time.perf_counter()
+                for ddl in statements: cur.execute(ddl)
+                cur.execute("INSERT INTO schema_migrations (version, name, checksum, applied_at) VALUES (?, ?, ?, ?)",
+                            (version, name, checksum, datetime.now()))
+                conn.commit()
+                applied[version] = checksum
+                app.logger.info(f"Applied schema migration {version} ({name}) in {time.perf_counter() - started:.2f}s.")
+            return max(applied, default=0), pending
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(?)", (MIGRATION_LOCK,))
+            cur.fetchall()
+    finally:
+        cur.close()
+
+def run_migrations(target=None, dry_run=False):
+    """ migrate() on a dedicated connection, outside the pool and any app context. """
+    global _schema_migrated, _jobs_schema_ready
+    conn = connect_db()
+    try:
+        version, pending = migrate(conn, target, dry_run)
+    finally:
+        conn.close()
+    if target is None and not dry_run:
+        # Everything the job table needs is applied now: skip check_jobs_schema() from here on.
+        _schema_migrated = _jobs_schema_ready = True
+    return version, pending
+
+def ensure_schema_migrated():
+    """ AUTO_MIGRATE at process start; inherited by forked workers, so a generation migrates once. """
+    if _schema_migrated or not app.config['AUTO_MIGRATE']: return
+    try:
+        run_migrations()
+    except mariadb.Error as e:
+        app.logger.error(f"Schema migrations failed, continuing with the current schema: {e}", exc_info=True)
+
+# Read paths exercised by the query plan check: (method, path, form data). Values need not
+# exist; EXPLAIN only looks at the statements the views issue.
+QUERY_PLAN_PROBES = [
+    ("GET", "/", None),
+    ("POST", "/search", {"media_search": "glucose"}),
+    ("GET", "/demo", None),
+    ("GET", "/api/models", None),
+    ("GET", "/api/models?after_id=1000", None),
+    ("GET", "/download/model/1.zip", None),
+    ("GET", "/api/models/1/charges", None),
+    ("GET", f"/api/jobs/{'0' * 32}", None),
+    ("GET", "/api/reactions?organism=probe", None),
+    ("GET", "/api/reactions?model=1", None),
+    ("GET", "/api/reactions?reaction=probe", None),
+    ("GET", "/api/reactions?metabolite=probe", None),
+    ("GET", "/api/reactions?flux_min=0&flux_max=1", None),
+    ("GET", "/api/gapfill-results?model=probe", None),
+    ("GET", "/api/gapfill-results?reaction=probe", None),
+    ("GET", "/api/gapfill-results?source=probe", None),
+    ("GET", "/api/gapfill-results?metabolite=probe", None),
+    ("GET", "/api/growth/aggregate?media=probe", None),
+]
+
+def probe_queries(probes=QUERY_PLAN_PROBES):
+    """ Calls each probe's view directly (no request hooks, so no worker startup) with the query log on; returns the SELECTs issued. """
+    was_enabled = query_log.enabled
+    query_log.clear()
+    query_log.enabled = True
+    try:
+        for method, path, data in probes:
+            try:
+                with app.test_request_context(path, method=method, data=data):
+                    if request.routing_exception: raise request.routing_exception
+                    app.view_functions[request.endpoint](**request.view_args)
+            except HTTPException:
+                pass
+            except Exception as e:
+                app.logger.warning(f"Query plan probe {method} {path} failed: {e}")
+        return query_log.statements()
+    finally:
+        query_log.enabled = was_enabled
+
+def explain_statements(cur, statements):
+    """ EXPLAINs each (sql, params). Every report lists the plan's full table scans, split by whether an index was usable. """
+    reports = []
+    for sql, params in statements:
+        report = {"statement": statement_label(sql), "sql": sql, "allowed": FULL_SCAN_OK in sql, "scans": []}
+        try:
+            cur.execute(f"EXPLAIN {sql}", tuple(params))
+            report["plan"] = dict_rows(cur)
+        except mariadb.Error as e:
+            report["error"] = str(e)
+            reports.append(report)
+            continue
+        for step in report["plan"]:
+            table = step.get("table") or ""
+            if step.get("type") != "ALL" or table.startswith("<"): continue  # <derivedN>/<subqueryN> are temporary tables
+            report["scans"].append({"table": table, "rows": step.get("rows"), "possible_keys": step.get("possible_keys")})
+        reports.append(report)
+    return reports
+
+def plan_problems(reports, strict=False):
+    """ Reports that fail the check: EXPLAIN errors and full scans with no usable index (with strict, any full scan) not marked FULL_SCAN_OK. """
+    return [r for r in reports if "error" in r or (not r["allowed"] and any(strict or not scan["possible_keys"] for scan in r["scans"]))]
+
+def check_query_plans(strict=False):
+    """ Probes the read routes and EXPLAINs what they ran; logs and returns the failing reports. """
+    statements = probe_queries()
+    with app.app_context():
+        cur = get_db_cursor()
+        try: reports = explain_statements(cur, statements)
+        finally: cur.close()
+    problems = plan_problems(reports, strict)
+    for report in problems:
+        detail = report.get("error") or ", ".join(f"{scan['table']} (~{scan['rows']} rows)" for scan in report["scans"])
+        app.logger.warning(f"Query plan check: full table scan in {report['statement']}: {detail}. SQL: {report['sql'][:300]}")
+    app.logger.info(f"Query plan check: {len(reports)} statement(s) explained, {len(problems)} problem(s).")
+    return reports, problems
+
+@app.route("/api/db/query-plans")
+def api_query_plans():
+    """ EXPLAIN of every distinct SELECT recorded since startup (QUERY_LOG_ENABLED), with full scans flagged. """
+    if not query_log.enabled: return jsonify(error="Query logging is disabled (QUERY_LOG_ENABLED)."), 404
+    cur = get_db_cursor()
+    try:
+        reports = explain_statements(cur, query_log.statements())
+    finally:
+        cur.close()
+    problems = plan_problems(reports, strict=request.args.get("strict") in ("1", "true"))
+    return jsonify(statements=len(reports), problems=len(problems), reports=reports)
+
+@app.cli.command("migrate")
+@click.option("--to", "target", type=int, default=None, help="Stop at this schema version (default: the latest).")
+@click.option("--dry-run", is_flag=True, help="Only list the pending migrations.")
+def migrate_command(target, dry_run):
+    """ Applies pending schema migrations. """
+    version, pending = run_migrations(target, dry_run)
+    for number, name in pending: click.echo(f"{'pending' if dry_run else 'applied'}: {number} {name}")
+    click.echo(f"Schema version {version} (latest {MIGRATIONS[-1][0]}).")
+
+@app.cli.command("check-queries")
+@click.option("--strict", is_flag=True, help="Also fail on full scans the optimizer chose although an index was usable.")
+@click.option("--verbose", "-v", is_flag=True, help="Print every statement's plan.")
+def check_queries_command(strict, verbose):
+    """ Migrates, then EXPLAINs the statements behind the read routes; exits 1 on unexpected full table scans (for CI). """
+    run_migrations()
+    reports, problems = check_query_plans(strict)
+    for report in reports:
+        status = "FAIL" if report in problems else "ok"
+        scans = "" if not report["scans"] else " full scan: " + ", ".join(scan["table"] for scan in report["scans"]) + (" (allowed)" if report["allowed"] else "")
+        click.echo(f"{status:4} {report['statement']}{scans}{' ' + report['error'] if 'error' in report else ''}")
+        if verbose:
+            click.echo(f"     {report['sql']}")
+            for step in report.get("plan", []): click.echo(f"     {step}")
+    click.echo(f"{len(reports)} statement(s), {len(problems)} problem(s).")
+    if problems: sys.exit(1)
+
+
+# --- Process Lifecycle ---
+# Importing this module has no side effects (no DB connection, no folders, no threads), so a
+# launcher can import it once and fork workers from it: see serve.py. preload() runs in the
+# parent before forking; init_worker() runs in every process that serves requests, either
+# eagerly from the launcher / ASGI lifespan or lazily on the first request under any WSGI server.
+_worker_pid = None
+_worker_lock = threading.Lock()
+_inherited_pools = []
+
+def ensure_storage_folders():
+    for folder in (UPLOAD_FOLDER, OBJECTS_FOLDER, STAGING_FOLDER, PARTIAL_FOLDER): folder.mkdir(parents=True, exist_ok=True)
+
+def preload():
+    """ Migrates the schema and warms state workers share copy-on-write: compiled templates and the in-process indexes. Leaves no DB connection open. """
+    ensure_storage_folders()
+    ensure_schema_migrated()
+    for name in app.jinja_env.list_templates(): app.jinja_env.get_template(name)
+    if app.config['PRELOAD_INDEXES']:
+        for index in (search_index, reaction_index, *reaction_sets.values()):
+            try:
+                with app.app_context(): index.sync(force_rebuild=True)
+            except mariadb.Error as e:
+                app.logger.warning(f"{type(index).__name__} not preloaded, workers will build it on first use: {e}")
+    if app.config['QUERY_PLAN_CHECK_ON_STARTUP']:
+        try: check_query_plans()
+        except mariadb.Error as e: app.logger.warning(f"Query plan check skipped: {e}")
+    # Sockets opened here would be shared by every forked worker.
+    if db_pool is not None: db_pool.close_all()
+    if db_replicas is not None: db_replicas.close_all()
+    # Keep the preloaded objects out of the collector, so GC passes in workers don't dirty their pages.
+    gc.collect()
+    gc.freeze()
+
+def init_worker():
+    """ Per-process startup: storage folders, schema migrations, warm DB pool, recovery of unfinished jobs. Runs once per process. """
+    global _worker_pid
+    with _worker_lock:
+        if _worker_pid == os.getpid(): return
+        _worker_pid = os.getpid()
+    ensure_storage_folders()
+    ensure_schema_migrated()
+    init_db_pool()
+    start_job_queue()
+    app.logger.info(f"Worker {_worker_pid} ready.")
+
+def shutdown_worker():
+    """ Graceful per-process shutdown: lets running jobs finish, then closes idle DB connections. """
+    job_queue.shutdown()
+    if db_pool is not None: db_pool.close_all()
+    if db_replicas is not None: db_replicas.close_all()
+
+def _reset_after_fork():
+    # Runs in the child right after fork. Inherited connections are dropped but kept referenced:
+    # closing (or garbage-collecting) them would end the parent's sessions on the shared sockets.
+    global db_pool, db_replicas, _db_pool_lock, _worker_pid, _worker_lock
+    if db_pool is not None: _inherited_pools.append(db_pool)
+    if db_replicas is not None: _inherited_pools.append(db_replicas)
+    db_pool = db_replicas = None
+    _db_pool_lock = threading.Lock()
+    _worker_pid = None
+    _worker_lock = threading.Lock()
+    job_queue._executor = job_queue._heartbeat = None
+    job_queue._lock = threading.Lock()
+    job_queue._running = set()
+    job_queue._stopping = threading.Event()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+@app.before_request
+def ensure_worker_started():
+    if _worker_pid != os.getpid(): init_worker()
+
+def configure_components():
+    """ Rebuilds the module-level components that read app.config at import, so later overrides take effect. """
+    global UPLOAD_FOLDER, STAGING_FOLDER, OBJECTS_FOLDER, PARTIAL_FOLDER, ENCODED_CACHE_FOLDER, ANALYTICS_CACHE_FOLDER, COLUMNAR_FOLDER
+    global db_pool, db_replicas, query_cache, content_store, fragment_cache, charge_memo, growth_memo
+    UPLOAD_FOLDER = Path(app.config['UPLOAD_FOLDER']).resolve()
+    STAGING_FOLDER = UPLOAD_FOLDER / ".staging"
+    OBJECTS_FOLDER = UPLOAD_FOLDER / "objects"
+    PARTIAL_FOLDER = UPLOAD_FOLDER / ".partial"
+    ENCODED_CACHE_FOLDER = UPLOAD_FOLDER / ".cache" / "encoded"
+    ANALYTICS_CACHE_FOLDER = UPLOAD_FOLDER / ".cache" / "analytics"
+    COLUMNAR_FOLDER = UPLOAD_FOLDER / ".cache" / "columnar"
+    if db_pool is not None: db_pool.close_all()
+    if db_replicas is not None: db_replicas.close_all()
+    db_pool = db_replicas = None
+    query_log.max_statements, query_log.enabled = app.config['QUERY_LOG_MAX_STATEMENTS'], app.config['QUERY_LOG_ENABLED']
+    profiler.interval = app.config['PROFILER_INTERVAL']
+    query_cache = build_query_cache()
+    content_store = ContentStore(OBJECTS_FOLDER, compression=app.config['CAS_COMPRESSION'], chunk_size=app.config['CAS_CHUNK_SIZE'])
+    job_queue.workers = app.config['JOB_WORKERS']
+    fragment_cache = LocalCacheBackend(app.config['FRAGMENT_CACHE_MAX_ENTRIES'])
+    charge_memo = LocalCacheBackend(max_entries=app.config['CHARGE_MEMO_ENTRIES'])
+    growth_memo = LocalCacheBackend(max_entries=app.config['GROWTH_MEMO_ENTRIES'])
+
+def create_app(config=None):
+    """ Application factory for WSGI servers (e.g. `app:create_app()`): applies `config` overrides and preloads. """
+    if config: app.config.update(config)
+    configure_components()
+    preload()
+    return app
+
+
 # --- Run the App ---
 if __name__ == "__main__":
-    # Example: python app2.py (if file saved as app2.py)
+    # Development server only; for production use serve.py (pre-forked workers) or asgi.py.
+    init_worker()
     app.run(host="0.0.0.0", port=5001, debug=True) # Set debug=False for production
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""
+ASGI entry point: serves app.py from an asyncio event loop.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5001      (or: python asgi.py)
+
+Client I/O runs on the event loop, so slow uploaders and downloaders cost a coroutine
+each instead of a worker thread:
+
+- request bodies are received asynchronously (spooled to disk above ASGI_BODY_SPOOL_SIZE)
+  before the Flask view runs;
+- views, and with them every blocking mariadb call, run on a bounded executor
+  (ASGI_VIEW_THREADS), so at most that many requests touch the database at once;
+- response bodies (downloads, zip bundles, NDJSON streams) are pulled one chunk at a time
+  on the I/O executor and awaited out to the client, with transport backpressure;
+- chunked upload PUT/PATCH /api/uploads/<id> is handled natively: each received chunk is
+  written on the I/O executor without holding a thread while the client is sending.
+"""
+import sys
+import time
+import fcntl
+import asyncio
+import tempfile
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+
+import app as gapfill
+
+flask_app = gapfill.app
+view_executor = ThreadPoolExecutor(max_workers=flask_app.config['ASGI_VIEW_THREADS'], thread_name_prefix="asgi-view")
+io_executor = ThreadPoolExecutor(max_workers=flask_app.config['ASGI_IO_THREADS'], thread_name_prefix="asgi-io")
+
+
+async def _send_json(send, status, payload, headers=()):
+    body = flask_app.json.dumps(payload).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def build_environ(scope, body, content_length):
+    """ PEP 3333 environ for an ASGI HTTP scope, with `body` as wsgi.input. """
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "CONTENT_LENGTH": str(content_length),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name, value = raw_name.decode("latin1").upper().replace("-", "_"), raw_value.decode("latin1")
+        if name == "CONTENT_TYPE": environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class GapfillASGI:
+    """ ASGI application wrapping the Flask app (see module docstring). """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan": return await self.lifespan(receive, send)
+        if scope["type"] != "http": return
+        parts = scope["path"].strip("/").split("/")
+        if scope["method"] in ("PUT", "PATCH") and len(parts) == 3 and parts[:2] == ["api", "uploads"]:
+            return await self.upload_chunk(scope, receive, send, parts[2])
+        return await self.call_wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await asyncio.get_running_loop().run_in_executor(view_executor, gapfill.init_worker)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                view_executor.shutdown(wait=False, cancel_futures=True)
+                io_executor.shutdown(wait=False, cancel_futures=True)
+                gapfill.shutdown_worker()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def receive_body(self, scope, receive):
+        """ Reads the whole request body into a spooled temp file. Returns (file, size) or None if too large. """
+        loop = asyncio.get_running_loop()
+        limit = flask_app.config['MAX_CONTENT_LENGTH']
+        spool_size = flask_app.config['ASGI_BODY_SPOOL_SIZE']
+        declared = next((int(v) for k, v in scope.get("headers", []) if k == b"content-length" and v.isdigit()), None)
+        if limit and declared and declared > limit: return None
+        body, size = tempfile.SpooledTemporaryFile(max_size=spool_size), 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                body.close()
+                raise ClientDisconnected()
+            chunk = message.get("body", b"")
+            if chunk:
+                size += len(chunk)
+                if limit and size > limit:
+                    body.close()
+                    return None
+                # Once the spool has rolled over to disk, writes are file I/O: keep them off the loop.
+                if size > spool_size: await loop.run_in_executor(io_executor, body.write, chunk)
+                else: body.write(chunk)
+            if not message.get("more_body"): break
+        body.seek(0)
+        return body, size
+
+    async def call_wsgi(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        try:
+            received = await self.receive_body(scope, receive)
+        except ClientDisconnected:
+            return
+        if received is None:
+            return await _send_json(send, 413, {"error": "Request body too large."}, [(b"connection", b"close")])
+        body, size = received
+        environ = build_environ(scope, body, size)
+        # Every step of one request runs in the same contextvars.Context (never concurrently),
+        # so Flask's request/app context survives hopping between executor threads.
+        ctx = contextvars.copy_context()
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            response_start["status"] = int(status.split(" ", 1)[0])
+            response_start["headers"] = [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in headers]
+
+        def next_chunk(iterator):
+            for chunk in iterator:
+                if chunk: return chunk
+            return None
+
+        result, started = None, False
+        try:
+            result = await loop.run_in_executor(view_executor, ctx.run, self.wsgi_app, environ, start_response)
+            iterator = iter(result)
+            chunk = await loop.run_in_executor(view_executor, ctx.run, next_chunk, iterator)
+            await send({"type": "http.response.start", "status": response_start["status"], "headers": response_start["headers"]})
+            started = True
+            while chunk is not None:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await loop.run_in_executor(io_executor, ctx.run, next_chunk, iterator)
+            await send({"type": "http.response.body", "body": b""})
+        except OSError:
+            pass  # client went away mid-response
+        except Exception as e:
+            flask_app.logger.error(f"Error serving {scope['method']} {scope['path']} over ASGI: {e}", exc_info=True)
+            # Once headers are out the only option is to cut the response short.
+            if not started: await _send_json(send, 500, {"error": "Internal server error."})
+        finally:
+            if result is not None and hasattr(result, "close"):
+                await loop.run_in_executor(io_executor, ctx.run, result.close)
+            body.close()
+
+    async def upload_chunk(self, scope, receive, send, upload_id):
+        """ Async variant of app.api_upload_chunk: streams the body into the partial file chunk by chunk. """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        headers = {k.decode("latin1").lower(): v.decode("latin1") for k, v in scope.get("headers", [])}
+
+        def reply(status, payload):
+            gapfill.HTTP_REQUESTS.inc(endpoint="api_upload_chunk", method=scope["method"], status=status)
+            gapfill.HTTP_LATENCY.observe(time.perf_counter() - started, endpoint="api_upload_chunk", method=scope["method"])
+            return _send_json(send, status, payload)
+
+        def open_partial():
+            with flask_app.app_context():
+                try:
+                    status = gapfill._partial_status(upload_id)
+                    data_path, _ = gapfill._partial_paths(upload_id)
+                except HTTPException as e:
+                    error = e  # raised outside the context so teardown does not log it as a failure
+                else:
+                    error = None
+            if error: raise error
+            fh = open(data_path, "ab")
+            fcntl.flock(fh, fcntl.LOCK_EX)  # one writer per upload, across threads and worker processes
+            return status, fh
+
+        content_range = headers.get("content-range")
+        if content_range:
+            match = gapfill._CONTENT_RANGE_RE.fullmatch(content_range.strip())
+            if not match: return await reply(400, {"error": "Malformed Content-Range header."})
+            start = int(match.group(1))
+        elif headers.get("upload-offset", "").isdigit():
+            start = int(headers["upload-offset"])
+        else:
+            return await reply(400, {"error": "Content-Range or Upload-Offset header required."})
+        try:
+            status, fh = await loop.run_in_executor(io_executor, open_partial)
+        except HTTPException as e:
+            return await reply(e.code, {"error": e.description})
+        try:
+            offset = received = fh.tell()
+            if start != offset:
+                return await reply(409, {"error": "Chunk does not start at the current offset.", "offset": offset})
+            limit = status["size"] if status["size"] is not None else flask_app.config['RESUMABLE_UPLOAD_MAX_SIZE']
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect": break
+                chunk = message.get("body", b"")
+                if chunk:
+                    if offset + len(chunk) > limit:
+                        return await reply(413, {"error": "Upload exceeds its declared size.", "offset": offset})
+                    await loop.run_in_executor(io_executor, fh.write, chunk)
+                    offset += len(chunk)
+                if not message.get("more_body"): break
+        finally:
+            await loop.run_in_executor(io_executor, fh.close)
+        gapfill.record_upload("chunk", offset - received, time.perf_counter() - started)
+        return await reply(200, {"upload_id": upload_id, "offset": offset, "size": status["size"]})
+
+
+application = GapfillASGI(flask_app)
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("Serving asgi.py needs an ASGI server: pip install uvicorn (or run it under hypercorn).")
+    uvicorn.run(application, host="0.0.0.0", port=5001, lifespan="on", timeout_keep_alive=30)
@@ -0,0 +1,434 @@
+"""
+Load-testing and benchmark harness for the gap-fill model database.
+
+Seeds a database with synthetic gapfill_models / metabolic_reactions / gap_filling_results
+rows plus synthetic SBML and growth TSV files, drives a concurrent mixed workload (index,
+search, list, download, upload) and reports throughput, p50/p95/p99 latency and memory.
+Each run is saved as JSON under benchmarks/results/ so runs from different commits can be
+compared.
+
+    # in-process against an embedded SQLite stand-in (no MariaDB needed)
+    python benchmarks/loadtest.py run --models 100000 --concurrency 8 --duration 30
+
+    # in-process against MariaDB (use a scratch database: --seed-db inserts rows)
+    python benchmarks/loadtest.py run --db-config bench_db.json --seed-db --models 1000000
+
+    # read-only queries spread over replicas (JSON files with the connect() arguments that differ from --db-config)
+    python benchmarks/loadtest.py run --db-config bench_db.json --replica-config replica1.json --replica-config replica2.json
+
+    # over HTTP against a running server (seed its database/uploads first with `seed`)
+    python benchmarks/loadtest.py seed --db-config bench_db.json --uploads /srv/gapfill/uploads --models 100000
+    python benchmarks/loadtest.py run --url http://localhost:5001 --duration 60
+
+    # fail (exit 1) when p95 latency or throughput regresses by more than 10%
+    python benchmarks/loadtest.py compare benchmarks/results/OLD.json benchmarks/results/NEW.json --threshold 10
+"""
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import http.client
+from pathlib import Path
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlencode
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+sys.path[:0] = [str(REPO_DIR), str(BENCH_DIR)]
+
+DEFAULT_MIX = "index=10,search=35,list=30,download=20,upload=5"
+MEDIA = ["glucose", "acetate", "succinate", "glycerol", "lactate", "pyruvate", "citrate", "malate", "fructose", "xylose", "M9", "LB", "minimal", "rich", "anaerobic"]
+ALGORITHMS = ["gapfill", "fastgapfill", "gapseq", "meneco", "modelseed"]
+TOOLS = ["RASTtk", "Prokka", "PGAP", "DFAST", "eggNOG"]
+SPECIES = ["P.simiae", "E.coli", "B.subtilis", "P.putida", "S.meliloti", "C.glutamicum", "M.extorquens"]
+DATABASES = ["ModelSEED", "BiGG", "KEGG", "MetaCyc"]
+
+
+# --- Synthetic data ---
+def make_sbml(rng, species=150, reactions=250, tag=""):
+    """ A small SBML level 3 model with fbc charges; `tag` makes the content unique. """
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<sbml xmlns="http://www.sbml.org/sbml/level3/version1/core" xmlns:fbc="http://www.sbml.org/sbml/level3/version1/fbc/version2" level="3" version="1">',
+             f'<model id="bench_{tag}"><listOfSpecies>']
+    for i in range(species):
+        lines.append(f'<species id="M_{i}_c" name="metabolite {i}" compartment="c" fbc:charge="{rng.randint(-4, 3)}" fbc:chemicalFormula="C{rng.randint(1, 20)}H{rng.randint(1, 40)}O{rng.randint(0, 10)}"/>')
+    lines.append("</listOfSpecies><listOfReactions>")
+    for j in range(reactions):
+        a, b, c = rng.sample(range(species), 3)
+        lines.append(f'<reaction id="R_{j}" name="reaction {j}" reversible="{"true" if rng.random() < 0.4 else "false"}">'
+                     f'<listOfReactants><speciesReference species="M_{a}_c" stoichiometry="1"/><speciesReference species="M_{b}_c" stoichiometry="{rng.randint(1, 3)}"/></listOfReactants>'
+                     f'<listOfProducts><speciesReference species="M_{c}_c" stoichiometry="1"/></listOfProducts></reaction>')
+    lines.append("</listOfReactions></model></sbml>")
+    return "\n".join(lines).encode()
+
+def make_growth_tsv(rng, points=96):
+    rows = ["time_h\tod600"] + [f"{t * 0.5:.1f}\t{0.05 + rng.random() * t / points:.4f}" for t in range(points)]
+    return ("\n".join(rows) + "\n").encode()
+
+def synthetic_meta(rng, file_ref, growth_ref):
+    return {
+        "Species_Name": rng.choice(SPECIES),
+        "growth_media": " ".join(rng.sample(MEDIA, rng.randint(1, 3))),
+        "gapfill_algorithm": rng.choice(ALGORITHMS),
+        "annotation_tool": rng.choice(TOOLS),
+        "file_name": file_ref.rsplit("/", 1)[-1],
+        "file_link": file_ref,
+        "growth_data": rng.choice(["Growth", "No Growth"]),
+        "growth_file": growth_ref,
+    }
+
+
+# --- App loading ---
+def load_app(workdir, db_config=None, replicas=()):
+    """
+    Imports app.py against MariaDB (`db_config`) or the embedded stand-in, with uploads
+    redirected to `workdir/uploads` so benchmark files never land in the real store.
+    `replicas` become DB_REPLICAS (with the stand-in they share its database file).
+    """
+    if db_config is None:
+        import mariadb_standin
+        mariadb_standin.install(workdir / "bench.sqlite")
+    import app as gapfill
+    logging.getLogger().setLevel(logging.WARNING)
+    gapfill.app.logger.setLevel(logging.WARNING)
+    if db_config is not None:
+        gapfill.DB_CONFIG.update(db_config)
+        gapfill.get_db_pool().close_all()
+    if replicas:
+        gapfill.app.config['DB_REPLICAS'] = list(replicas)
+        gapfill.get_db_replicas().close_all()
+        gapfill.db_replicas = None
+    use_upload_folder(gapfill, workdir / "uploads")
+    return gapfill
+
+def use_upload_folder(gapfill, root):
+    root.mkdir(parents=True, exist_ok=True)
+    gapfill.app.config["UPLOAD_FOLDER"] = str(root)
+    gapfill.configure_components()
+
+def seed_database(gapfill, models, reactions, results, files, seed, batch_size=5000):
+    """ Inserts synthetic rows (and `files` distinct model/growth files they point at). Returns timings. """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    file_refs, growth_refs = [], []
+    for i in range(files):
+        digest = gapfill.content_store.put_stream(io.BytesIO(make_sbml(rng, tag=f"{seed}_{i}")))[0]
+        file_refs.append(gapfill.make_ref(digest, f"bench_model_{i}.xml"))
+        digest = gapfill.content_store.put_stream(io.BytesIO(make_growth_tsv(rng)))[0]
+        growth_refs.append(gapfill.make_ref(digest, f"bench_growth_{i}.tsv"))
+    conn = gapfill.connect_db()
+    cur = conn.cursor()
+    gapfill.migrate(conn)
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM gapfill_models")
+    first_id = cur.fetchone()[0] + 1
+    counts = {}
+
+    def insert(table, sql, total, make_row):
+        done = 0
+        while done < total:
+            batch = [make_row(done + k) for k in range(min(batch_size, total - done))]
+            cur.executemany(sql, batch)
+            conn.commit()
+            done += len(batch)
+        counts[table] = total
+
+    insert("gapfill_models", gapfill.INSERT_GAPFILL_SQL, models,
+           lambda i: gapfill.gapfill_values(synthetic_meta(rng, file_refs[i % files], growth_refs[i % files])))
+    insert("metabolic_reactions",
+           "INSERT INTO metabolic_reactions (gapfill_model_id, organism_id, reaction_id, reaction_name, metabolites, reversible, flux_value) VALUES (?, ?, ?, ?, ?, ?, ?)",
+           reactions, lambda i: (first_id + i % max(models, 1), f"org_{i % 97}", f"rxn{i:07d}", f"reaction {i}", f"cpd{i % 5000:05d} + cpd{(i * 7) % 5000:05d} <=> cpd{(i * 13) % 5000:05d}", rng.random() < 0.4, rng.uniform(-10, 10)))
+    insert("gap_filling_results",
+           "INSERT INTO gap_filling_results (model_id, reaction_id, reaction_name, source_database) VALUES (?, ?, ?, ?)",
+           results, lambda i: (f"Model_{first_id + i % max(models, 1)}", f"rxn{rng.randrange(reactions or 1):07d}", f"gap-filled reaction {i}", rng.choice(DATABASES)))
+    cur.close()
+    conn.close()
+    elapsed = time.perf_counter() - started
+    return {"rows": counts, "files": files, "seconds": round(elapsed, 3), "rows_per_second": round(sum(counts.values()) / elapsed, 1) if elapsed else None}
+
+
+# --- Clients ---
+class InProcessClient:
+    """ Drives the Flask app through its WSGI test client (no network, no server). """
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, form=None, files=None, headers=None):
+        data = dict(form or {})
+        for field, (filename, content) in (files or {}).items(): data[field] = (io.BytesIO(content), filename)
+        response = self.client.open(path, method=method, data=data or None, headers=headers or {})
+        body = response.get_data()
+        return response.status_code, len(body), body
+
+
+class HTTPClient:
+    """ Keep-alive HTTP/1.1 client for a running server; one per worker thread. """
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port, self.prefix = parts.hostname, parts.port or 80, parts.path.rstrip("/")
+        self.conn = None
+
+    def request(self, method, path, form=None, files=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if files:
+            boundary = uuid.uuid4().hex
+            chunks = []
+            for name, value in (form or {}).items():
+                chunks.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+            for name, (filename, content) in files.items():
+                chunks += [f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode(), content, b"\r\n"]
+            chunks.append(f"--{boundary}--\r\n".encode())
+            body, headers["Content-Type"] = b"".join(chunks), f"multipart/form-data; boundary={boundary}"
+        elif form is not None:
+            body, headers["Content-Type"] = urlencode(form).encode(), "application/x-www-form-urlencoded"
+        for attempt in (1, 2):
+            if self.conn is None: self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.conn.request(method, self.prefix + path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                return response.status, len(data), data
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2: raise
+
+
+# --- Workload ---
+class Workload:
+    """ The request mix. Each op returns the HTTP status it got. """
+
+    def __init__(self, mix, file_refs, max_id):
+        self.ops = [(name, weight) for name, weight in mix.items() if weight > 0]
+        self.file_refs, self.max_id = file_refs, max_id
+
+    def pick(self, rng):
+        return rng.choices([name for name, _ in self.ops], weights=[w for _, w in self.ops])[0]
+
+    def index(self, client, rng):
+        return client.request("GET", "/")[0]
+
+    def search(self, client, rng):
+        terms = " ".join(rng.sample(MEDIA, rng.choice((1, 1, 2))))
+        if rng.random() < 0.2: terms += f" algorithm:{rng.choice(ALGORITHMS)}"
+        return client.request("POST", "/search", form={"media_search": terms, "growth_filter": rng.choice(["all", "all", "growth", "no_growth"])})[0]
+
+    def list(self, client, rng):
+        params = {"limit": 100}
+        if self.max_id and rng.random() < 0.5: params["after_id"] = rng.randint(1, self.max_id)
+        return client.request("GET", "/api/models?" + urlencode(params))[0]
+
+    def download(self, client, rng):
+        if not self.file_refs: return 0
+        headers = {"Accept-Encoding": "gzip"} if rng.random() < 0.5 else {}
+        return client.request("GET", "/download/" + rng.choice(self.file_refs), headers=headers)[0]
+
+    def upload(self, client, rng):
+        form = {"growth_media": " ".join(rng.sample(MEDIA, 2)), "gapfill_algorithm": rng.choice(ALGORITHMS), "annotation_tool": rng.choice(TOOLS), "growth_data": rng.choice(["Growth", "No Growth"])}
+        files = {"modelUpload": (f"bench_upload_{uuid.uuid4().hex[:8]}.xml", make_sbml(rng, species=60, reactions=80, tag=uuid.uuid4().hex))}
+        return client.request("POST", "/api/models", form=form, files=files)[0]
+
+
+def discover_targets(client):
+    """ Model file references and the highest id, read through the public list API. """
+    status, _, body = client.request("GET", "/api/models?" + urlencode({"limit": 1000, "fields": "id,file_link"}))
+    if status != 200: return [], 0
+    rows = json.loads(body)
+    return sorted({r["file_link"] for r in rows if r.get("file_link")}), max((r["id"] for r in rows), default=0)
+
+def percentile(sorted_values, pct):
+    """ Nearest-rank percentile of an already sorted list. """
+    if not sorted_values: return None
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+def summarize(samples, elapsed):
+    latencies = sorted(s[1] for s in samples)
+    errors = sum(1 for s in samples if not s[2])
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "requests": len(samples), "errors": errors, "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)), "p95_ms": ms(percentile(latencies, 95)), "p99_ms": ms(percentile(latencies, 99)), "max_ms": ms(latencies[-1] if latencies else None),
+    }
+
+def run_workload(make_client, workload, concurrency, duration, max_requests, warmup, seed):
+    """ Runs `concurrency` threads of the mix for `duration` seconds (or `max_requests`). Returns (samples, elapsed). """
+    samples, lock = [], threading.Lock()
+    issued = iter(range(max_requests)) if max_requests else None
+    start_barrier = threading.Barrier(concurrency + 1)
+    stop_at = [0.0]
+
+    def worker(n):
+        rng, client, local = random.Random(seed * 1000 + n), make_client(), []
+        for _ in range(warmup): getattr(workload, workload.pick(rng))(client, rng)
+        start_barrier.wait()
+        while time.perf_counter() < stop_at[0]:
+            if issued is not None and next(issued, None) is None: break
+            op = workload.pick(rng)
+            started = time.perf_counter()
+            try: ok = 200 <= getattr(workload, op)(client, rng) < 400
+            except Exception: ok = False
+            local.append((op, time.perf_counter() - started, ok))
+        with lock: samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for t in threads: t.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    stop_at[0] = started + duration
+    for t in threads: t.join()
+    return samples, time.perf_counter() - started
+
+def parse_mix(raw):
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("index", "search", "list", "download", "upload"): raise SystemExit(f"Unknown operation in --mix: {name!r}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def git_commit():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return None
+
+def max_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # ru_maxrss is in KiB on Linux
+
+
+# --- Commands ---
+def cmd_seed(args):
+    workdir = Path(args.uploads).resolve().parent if args.uploads else Path(tempfile.mkdtemp(prefix="gapfill-bench-"))
+    gapfill = load_app(workdir, json.loads(Path(args.db_config).read_text()) if args.db_config else None)
+    if args.uploads: use_upload_folder(gapfill, Path(args.uploads).resolve())
+    print(json.dumps(seed_database(gapfill, args.models, args.reactions, args.results, args.files, args.seed), indent=2))
+
+def cmd_run(args):
+    mix = parse_mix(args.mix)
+    meta = {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": git_commit(), "python": platform.python_version(),
+            "host": platform.node(), "cpus": os.cpu_count(), "concurrency": args.concurrency, "duration_s": args.duration, "mix": mix, "seed": args.seed}
+    workdir = None
+    if args.url:
+        meta["target"] = args.url
+        make_client = lambda: HTTPClient(args.url)
+    else:
+        workdir = Path(tempfile.mkdtemp(prefix="gapfill-bench-"))
+        db_config = json.loads(Path(args.db_config).read_text()) if args.db_config else None
+        meta["target"] = "in-process/" + ("mariadb" if db_config else "sqlite-standin")
+        if args.tracemalloc: tracemalloc.start()
+        replicas = [json.loads(Path(path).read_text()) for path in args.replica_config]
+        meta["replicas"] = len(replicas)
+        gapfill = load_app(workdir, db_config, replicas)
+        if db_config is None or args.seed_db:
+            meta["seeding"] = seed_database(gapfill, args.models, args.reactions, args.results, args.files, args.seed)
+            print(f"Seeded {meta['seeding']['rows']} in {meta['seeding']['seconds']}s")
+        meta["rss_after_seed_mb"] = max_rss_mb()
+        make_client = lambda: InProcessClient(gapfill.app)
+    file_refs, max_id = discover_targets(make_client())
+    workload = Workload(mix, file_refs, max_id)
+    try:
+        samples, elapsed = run_workload(make_client, workload, args.concurrency, args.duration, args.requests, args.warmup, args.seed)
+    finally:
+        if workdir is not None:
+            gapfill.shutdown_worker()  # let upload jobs finish before their files go away
+            if not args.keep: shutil.rmtree(workdir, ignore_errors=True)
+    report = {"meta": meta, "elapsed_s": round(elapsed, 3), "total": summarize(samples, elapsed),
+              "operations": {op: summarize([s for s in samples if s[0] == op], elapsed) for op in mix if mix[op] > 0}}
+    report["memory"] = {"max_rss_mb": max_rss_mb() if not args.url else None}
+    if args.tracemalloc and tracemalloc.is_tracing(): report["memory"]["python_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+    print_report(report)
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{meta['commit'] or 'nogit'}.json"
+    out_path.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved {out_path}")
+    if args.baseline: return compare_reports(json.loads(Path(args.baseline).read_text()), report, args.threshold)
+    return 0
+
+def print_report(report):
+    print(f"\n{'operation':<10} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, stats in list(report["operations"].items()) + [("TOTAL", report["total"])]:
+        print(f"{name:<10} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps'] or 0:>9} " + " ".join(f"{stats[k] if stats[k] is not None else '-':>9}" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")))
+    print("memory:", report["memory"])
+
+def compare_reports(base, new, threshold):
+    """ Prints per-operation deltas; returns 1 when p95 latency or throughput regressed beyond `threshold` percent. """
+    regressions = []
+    print(f"\nvs {base['meta'].get('commit')} ({base['meta'].get('timestamp')}), threshold {threshold}%")
+    for name in sorted(set(base["operations"]) & set(new["operations"])) + ["TOTAL"]:
+        old_stats = base["total"] if name == "TOTAL" else base["operations"][name]
+        new_stats = new["total"] if name == "TOTAL" else new["operations"][name]
+        deltas = []
+        for key, higher_is_worse in (("p95_ms", True), ("throughput_rps", False)):
+            old, cur = old_stats.get(key), new_stats.get(key)
+            if not old or cur is None: continue
+            change = (cur - old) / old * 100
+            deltas.append(f"{key} {old} -> {cur} ({change:+.1f}%)")
+            if (change if higher_is_worse else -change) > threshold: regressions.append(f"{name} {key}")
+        print(f"  {name:<10} " + "; ".join(deltas))
+    if regressions: print("REGRESSIONS: " + ", ".join(regressions))
+    return 1 if regressions else 0
+
+def cmd_compare(args):
+    return compare_reports(json.loads(Path(args.base).read_text()), json.loads(Path(args.new).read_text()), args.threshold)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_seed_args(p):
+        p.add_argument("--models", type=int, default=1000, help="gapfill_models rows to insert")
+        p.add_argument("--reactions", type=int, default=10000, help="metabolic_reactions rows to insert")
+        p.add_argument("--results", type=int, default=5000, help="gap_filling_results rows to insert")
+        p.add_argument("--files", type=int, default=50, help="distinct synthetic SBML/TSV files the rows point at")
+        p.add_argument("--db-config", help="JSON file with mariadb.connect() arguments (default: embedded SQLite stand-in)")
+        p.add_argument("--seed", type=int, default=1, help="random seed (same seed, same data and request sequence)")
+
+    p = sub.add_parser("seed", help="insert synthetic rows and files into a database")
+    add_seed_args(p)
+    p.add_argument("--uploads", help="upload folder of the server under test (where synthetic files are stored)")
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser("run", help="run the mixed workload and report/save results")
+    add_seed_args(p)
+    p.add_argument("--url", help="benchmark a running server over HTTP instead of in-process")
+    p.add_argument("--seed-db", action="store_true", help="with --db-config, seed the database before running")
+    p.add_argument("--replica-config", action="append", default=[], help="JSON file with a read replica's connect() arguments (repeatable)")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--duration", type=float, default=20.0, help="seconds to run")
+    p.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = run for --duration)")
+    p.add_argument("--warmup", type=int, default=5, help="untimed requests per thread before measuring")
+    p.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    p.add_argument("--tracemalloc", action="store_true", help="also report the peak Python heap (slows the app down)")
+    p.add_argument("--out", default=str(RESULTS_DIR), help="directory for the JSON result")
+    p.add_argument("--baseline", help="earlier result JSON to compare against (exit 1 on regression)")
+    p.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    p.add_argument("--keep", action="store_true", help="keep the temporary database/uploads directory")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("compare", help="compare two saved results")
+    p.add_argument("base")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=10.0)
+    p.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Embedded stand-in for the `mariadb` connector, backed by SQLite, for benchmark runs on
+machines without a MariaDB server.
+
+It implements the subset of the connector API app.py uses (connect, cursor, execute,
+executemany, fetch*, commit/rollback, ping and the exception classes) and rewrites the
+MariaDB-only SQL the app issues (`<=>`, AUTO_INCREMENT, inline INDEX clauses,
+ADD COLUMN/INDEX IF NOT EXISTS, GET_LOCK, LAST_INSERT_ID()). EXPLAIN is answered from SQLite's query plan in
+MariaDB's column layout (table, type, possible_keys, key, ...), close enough for the app's
+full-scan check. SHOW SLAVE STATUS reports a replica REPLICATION_LAG seconds behind, so
+DB_REPLICAS entries pointing at the same file exercise the replica routing. Statements autocommit so concurrent connections never
+wait on each other's open transactions: use it to compare timings between commits, not
+to check transactional behaviour.
+
+Install it with `install(path)` before importing app.
+"""
+import re
+import sys
+import sqlite3
+import threading
+from datetime import datetime
+
+DATABASE_PATH = None
+
+
+class Error(Exception):
+    def __init__(self, msg="", errno=None):
+        super().__init__(msg)
+        self.errno = errno
+
+class Warning(Exception): pass
+class InterfaceError(Error): pass
+class DatabaseError(Error): pass
+class DataError(DatabaseError): pass
+class OperationalError(DatabaseError): pass
+class IntegrityError(DatabaseError): pass
+class InternalError(DatabaseError): pass
+class ProgrammingError(DatabaseError): pass
+class NotSupportedError(DatabaseError): pass
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+
+_ALTER_RE = re.compile(r"^\s*ALTER\s+TABLE\s+(\w+)\s+(.*)$", re.IGNORECASE | re.DOTALL)
+_ADD_COLUMN_RE = re.compile(r"ADD\s+COLUMN\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+(.+)", re.IGNORECASE | re.DOTALL)
+_INDEX_COLUMNS = r"\(((?:[^()]|\(\d+\))*)\)"  # column list, with optional prefix lengths: (a(255), b)
+_ADD_INDEX_RE = re.compile(r"ADD\s+(UNIQUE\s+)?INDEX\s+IF\s+NOT\s+EXISTS\s+(\w+)\s*" + _INDEX_COLUMNS, re.IGNORECASE)
+_INLINE_INDEX_RE = re.compile(r",\s*(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*" + _INDEX_COLUMNS, re.IGNORECASE)
+_CREATE_RE = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+_EXPLAIN_RE = re.compile(r"^\s*EXPLAIN\s+", re.IGNORECASE)
+_PLAN_RE = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?(?: USING (?:COVERING )?(?:INDEX (\w+)|(INTEGER PRIMARY KEY)))?")
+_ORDER_BY_ID_RE = re.compile(r"\bORDER\s+BY\s+(?:\w+\.)?id\b", re.IGNORECASE)
+_INSERT_RE = re.compile(r"^\s*INSERT\s", re.IGNORECASE)
+_SHOW_SLAVE_RE = re.compile(r"^\s*SHOW\s+(?:SLAVE|REPLICA)\s+STATUS\s*$", re.IGNORECASE)
+REPLICATION_LAG = 0  # Seconds_Behind_Master reported to the app; None: replication stopped
+EXPLAIN_COLUMNS = ("id", "select_type", "table", "type", "possible_keys", "key", "rows", "Extra")
+
+
+def _translate(sql):
+    sql = sql.replace("<=>", "IS")
+    sql = re.sub(r"@@(?:SESSION\.)?auto_increment_increment\b", "1", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", "INTEGER PRIMARY KEY AUTOINCREMENT", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bAUTO_INCREMENT\b", "", sql, flags=re.IGNORECASE)
+    return re.sub(r"\)\s*ENGINE\s*=\s*\w+.*$", ")", sql, flags=re.IGNORECASE | re.DOTALL)
+
+def _split_clauses(body):
+    """ Splits an ALTER TABLE body on top-level commas. """
+    clauses, depth, current = [], 0, []
+    for ch in body:
+        if ch == "(": depth += 1
+        elif ch == ")": depth -= 1
+        if ch == "," and depth == 0:
+            clauses.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if "".join(current).strip(): clauses.append("".join(current).strip())
+    return clauses
+
+def _index_sql(table, unique, name, columns):
+    columns = ", ".join(re.sub(r"\(\d+\)", "", c).strip() for c in columns.split(","))
+    return f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+
+
+class Cursor:
+    def __init__(self, connection):
+        self._conn = connection
+        self._cur = connection._db.cursor()
+        self._rows = None
+        self.lastrowid = None
+        self.rowcount = -1
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    def _run(self, fn, sql, *args):
+        try:
+            result = fn(sql, *args)
+        except sqlite3.IntegrityError as e:
+            message = str(e)
+            raise IntegrityError(message, errno=1048 if "NOT NULL" in message else 1062) from e
+        except sqlite3.OperationalError as e:
+            raise (OperationalError if "locked" in str(e) else ProgrammingError)(str(e)) from e
+        except sqlite3.Error as e:
+            raise DatabaseError(str(e)) from e
+        self.lastrowid, self.rowcount = self._cur.lastrowid, self._cur.rowcount
+        return result
+
+    def execute(self, sql, data=(), buffered=None):
+        if _EXPLAIN_RE.match(sql): return self._explain(_EXPLAIN_RE.sub("", sql, count=1), data)
+        statements = self._rewrite(sql)
+        for statement in statements[:-1]: self._run(self._cur.execute, statement)
+        self._run(self._cur.execute, statements[-1], tuple(data or ()))
+        if _INSERT_RE.match(sql) and self.rowcount > 0:
+            # MariaDB reports the first id a multi-row INSERT generated; SQLite the last.
+            self.lastrowid = self._conn.last_insert_id = self.lastrowid - self.rowcount + 1
+
+    def executemany(self, sql, seq):
+        self._run(self._cur.executemany, _translate(sql), [tuple(row) for row in seq])
+
+    def _rewrite(self, sql):
+        """ Returns the SQLite statements equivalent to one MariaDB statement. """
+        alter = _ALTER_RE.match(sql)
+        if alter:
+            table, statements = alter.group(1), []
+            existing = {row[1] for row in self._conn._db.execute(f"PRAGMA table_info({table})")}
+            for clause in _split_clauses(alter.group(2)):
+                column, index = _ADD_COLUMN_RE.match(clause), _ADD_INDEX_RE.match(clause)
+                if column and column.group(1) not in existing:
+                    statements.append(f"ALTER TABLE {table} ADD COLUMN {column.group(1)} {column.group(2)}")
+                elif index:
+                    statements.append(_index_sql(table, index.group(1), index.group(2), index.group(3)))
+                elif not column:
+                    statements.append(f"ALTER TABLE {table} {clause}")
+            return statements or ["SELECT 1"]
+        if _SHOW_SLAVE_RE.match(sql):
+            running = "'No'" if REPLICATION_LAG is None else "'Yes'"
+            lag = "NULL" if REPLICATION_LAG is None else float(REPLICATION_LAG)
+            return [f"SELECT {running} AS Slave_IO_Running, {running} AS Slave_SQL_Running, {lag} AS Seconds_Behind_Master"]
+        create = _CREATE_RE.match(sql)
+        if create:
+            indexes = [_index_sql(create.group(1), m.group(1), m.group(2), m.group(3)) for m in _INLINE_INDEX_RE.finditer(sql)]
+            return [_translate(_INLINE_INDEX_RE.sub("", sql))] + indexes
+        return [_translate(sql)]
+
+    def _explain(self, sql, data):
+        """ Maps SQLite's EXPLAIN QUERY PLAN onto MariaDB EXPLAIN rows and leaves them as the result set. """
+        plan = self._run(self._cur.execute, "EXPLAIN QUERY PLAN " + _translate(sql), tuple(data or ())).fetchall()
+        # A rowid-ordered SCAN has no temp b-tree step; MariaDB reports it as an index scan on PRIMARY.
+        ordered_scan = _ORDER_BY_ID_RE.search(sql) and not any("TEMP B-TREE" in step[-1] for step in plan)
+        rows = []
+        for step in plan:
+            match = _PLAN_RE.match(step[-1])
+            if not match: continue
+            verb, table, alias, index, primary = match.groups()
+            key = index or ("PRIMARY" if primary or (verb == "SCAN" and ordered_scan) else None)
+            kind = ("ref" if index else "range") if verb == "SEARCH" else ("index" if key else "ALL")
+            rows.append((len(rows) + 1, "SIMPLE", alias or table, kind, key, key, None, None))
+        if rows:
+            columns = ", ".join(f'column{i + 1} AS "{name}"' for i, name in enumerate(EXPLAIN_COLUMNS))
+            values = ", ".join(["(" + ", ".join("?" * len(EXPLAIN_COLUMNS)) + ")"] * len(rows))
+            self._run(self._cur.execute, f"SELECT {columns} FROM (VALUES {values})", [v for row in rows for v in row])
+        else:
+            self._run(self._cur.execute, "SELECT " + ", ".join(f'NULL AS "{name}"' for name in EXPLAIN_COLUMNS) + " WHERE 0")
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cur.fetchmany(size)
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def close(self):
+        self._cur.close()
+
+
+class Connection:
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        # Named locks only guard against other processes on a real server; one SQLite file needs none.
+        self._db.create_function("GET_LOCK", 2, lambda name, timeout: 1)
+        self._db.create_function("RELEASE_LOCK", 1, lambda name: 1)
+        self._db.create_function("LAST_INSERT_ID", 0, lambda: self.last_insert_id)
+        self.last_insert_id = 0
+        self._closed = False
+        self.autocommit = False
+
+    def cursor(self, **kwargs):
+        if self._closed: raise InterfaceError("Connection is closed.")
+        return Cursor(self)
+
+    def ping(self):
+        if self._closed: raise InterfaceError("Connection is closed.")
+
+    def commit(self): pass
+
+    def rollback(self): pass
+
+    def close(self):
+        self._closed = True
+        self._db.close()
+
+
+_lock = threading.Lock()
+
+def connect(**kwargs):
+    if DATABASE_PATH is None: raise OperationalError("mariadb_standin.install() has not been called.")
+    with _lock: return Connection(DATABASE_PATH)
+
+def install(path):
+    """ Points the stand-in at an SQLite file and registers it as the `mariadb` module. """
+    global DATABASE_PATH
+    DATABASE_PATH = str(path)
+    sys.modules["mariadb"] = sys.modules[__name__]
@@ -0,0 +1,213 @@
+"""
+Pre-forking production launcher for app.py (needs nothing beyond Flask/werkzeug).
+
+    python serve.py --bind 0.0.0.0:5001 [--workers N] [--threads N]
+
+Process tree: supervisor -> generation -> workers.
+
+- The supervisor binds the listening socket and never imports app.py, so every generation it
+  starts loads the code currently on disk.
+- A generation imports app.py, runs create_app() (compiled templates, search and reaction indexes, gc.freeze)
+  and forks the workers, which share that warm state copy-on-write. Each worker then runs
+  init_worker() (its own DB pool, job recovery) and serves requests on a bounded thread pool.
+  Workers that crash are forked again from the generation.
+- SIGHUP reloads gracefully: a new generation starts, and only once its workers are up does the
+  old generation stop accepting and finish its in-flight requests. A generation that fails to
+  start (e.g. a syntax error) is discarded and the old one keeps serving.
+- SIGTERM / SIGINT shut down gracefully, waiting up to --graceful-timeout for in-flight requests.
+
+Workers default to the CPUs this process may use (affinity and cgroup quota) and threads to
+GAPFILL_THREADS or 4; each worker's DB pool is sized to threads + JOB_WORKERS, so the MariaDB
+connection budget is workers * (threads + JOB_WORKERS). GAPFILL_* variables override app settings.
+"""
+import os
+import sys
+import math
+import time
+import select
+import signal
+import socket
+import logging
+import argparse
+import threading
+from pathlib import Path
+
+log = logging.getLogger("serve")
+SIGNALS = {signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD}
+
+
+def usable_cpus():
+    """ CPUs this process may run on: scheduler affinity, capped by a cgroup v2 CPU quota. """
+    count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max": count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def fork(target, *args):
+    """ Forks a child running target(*args) with default signal handling; returns its pid. """
+    pid = os.fork()
+    if pid: return pid
+    code = 1
+    try:
+        for sig in SIGNALS: signal.signal(sig, signal.SIG_DFL)
+        signal.pthread_sigmask(signal.SIG_SETMASK, set())
+        target(*args)
+        code = 0
+    except BaseException:
+        log.exception(f"{target.__name__} (pid {os.getpid()}) failed.")
+    finally:
+        logging.shutdown()
+        os._exit(code)
+
+
+# --- Worker ---
+def run_worker(listen_fd, args, gapfill):
+    # Imported here, not at module level: the supervisor must stay free of anything a reload should refresh.
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class RequestHandler(WSGIRequestHandler):
+        timeout = args.keep_alive  # idle keep-alive connections give their thread back after this
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """ werkzeug server handing connections to a fixed thread pool instead of a thread per connection. """
+        multithread = True
+
+        def __init__(self, *server_args, threads, **kwargs):
+            super().__init__(*server_args, **kwargs)
+            self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+            # A saturated worker stops accepting, so new connections go to the workers with free threads.
+            self.slots = threading.BoundedSemaphore(threads)
+
+        def process_request(self, request, client_address):
+            self.slots.acquire()
+            self.executor.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self.slots.release()
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the whole process group; the supervisor coordinates
+    gapfill.init_worker()
+    host, port = args.bind
+    server = PooledWSGIServer(host, port, gapfill.app, handler=RequestHandler, threads=args.threads, fd=listen_fd)
+    # shutdown() blocks until serve_forever() returns, so it must be called from another thread.
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    server.serve_forever()
+    server.socket.close()
+    server.executor.shutdown(wait=True)  # finish in-flight requests
+    gapfill.shutdown_worker()
+
+
+# --- Generation ---
+def run_generation(listen_fd, args, ready_fd):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import app as gapfill
+    gapfill.create_app({'DB_POOL_SIZE': args.threads + gapfill.app.config['JOB_WORKERS']})
+    workers, stopping = set(), []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(time.monotonic()))
+
+    for _ in range(args.workers): workers.add(fork(run_worker, listen_fd, args, gapfill))
+    os.write(ready_fd, b"ready")
+    os.close(ready_fd)
+    log.info(f"Generation {os.getpid()} serving with {args.workers} worker(s) x {args.threads} thread(s), "
+             f"up to {args.workers * gapfill.app.config['DB_POOL_SIZE']} DB connections.")
+
+    respawn_after, signalled = 0.0, False
+    while workers:
+        if stopping and not signalled:
+            for pid in workers: os.kill(pid, signal.SIGTERM)
+            signalled = True
+        if stopping and time.monotonic() - stopping[0] > args.graceful_timeout:
+            log.warning(f"Killing {len(workers)} worker(s) still busy after {args.graceful_timeout}s.")
+            for pid in workers: os.kill(pid, signal.SIGKILL)
+            stopping[0] = math.inf
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if not pid:
+            time.sleep(0.2)
+            continue
+        workers.discard(pid)
+        if stopping: continue
+        log.error(f"Worker {pid} exited unexpectedly (status {status}), starting a replacement.")
+        time.sleep(max(0.0, respawn_after - time.monotonic()))  # don't spin if workers die on startup
+        respawn_after = time.monotonic() + 1.0
+        workers.add(fork(run_worker, listen_fd, args, gapfill))
+
+
+# --- Supervisor ---
+def start_generation(sock, args):
+    """ Starts a generation and waits until its workers are up. Returns its pid, or None if it failed. """
+    ready_r, ready_w = os.pipe()
+    pid = fork(run_generation, sock.fileno(), args, ready_w)
+    os.close(ready_w)
+    readable, _, _ = select.select([ready_r], [], [], args.startup_timeout)
+    ready = bool(readable) and os.read(ready_r, 16) == b"ready"
+    os.close(ready_r)
+    if ready: return pid
+    log.error(f"Generation {pid} failed to start within {args.startup_timeout}s.")
+    try: os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError: pass
+    return None
+
+
+def parse_bind(value):
+    host, _, port = value.rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--bind", type=parse_bind, default=("0.0.0.0", 5001), help="host:port (default 0.0.0.0:5001)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("GAPFILL_WORKERS", 0)) or usable_cpus())
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("GAPFILL_THREADS", 4)), help="request threads per worker")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=float, default=5.0, help="seconds an idle keep-alive connection is held")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0, help="seconds in-flight requests get on shutdown/reload")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="seconds a new generation gets to preload")
+    args = parser.parse_args(argv)
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    sock = socket.create_server(args.bind, backlog=args.backlog)
+    sock.set_inheritable(True)
+    signal.pthread_sigmask(signal.SIG_BLOCK, SIGNALS)
+    current = start_generation(sock, args)
+    if current is None: return 1
+    log.info(f"Supervisor {os.getpid()} listening on {args.bind[0]}:{args.bind[1]} (SIGHUP reloads, SIGTERM stops).")
+    while True:
+        sig = signal.sigwait(SIGNALS)
+        if sig == signal.SIGHUP:
+            log.info("Reloading: starting a new generation.")
+            new = start_generation(sock, args)
+            if new is None:
+                log.error("Reload aborted, the current generation keeps serving.")
+                continue
+            os.kill(current, signal.SIGTERM)  # reaped below once its in-flight requests are done
+            current = new
+        elif sig in (signal.SIGTERM, signal.SIGINT):
+            log.info("Shutting down.")
+            os.kill(current, signal.SIGTERM)
+            while True:  # also waits for a previous generation still finishing its requests
+                try: os.waitpid(-1, 0)
+                except ChildProcessError: return 0
+        else:
+            while True:
+                try: pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError: break
+                if not pid: break
+                if pid == current:
+                    log.error(f"Generation {pid} exited unexpectedly (status {status}), restarting it.")
+                    current = start_generation(sock, args)
+                    if current is None: return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Shared fixtures. app.py is imported once per session against the SQLite stand-in for MariaDB
+(benchmarks/mariadb_standin.py), with uploads redirected to a temporary directory.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
+
+import loadtest
+
+
+@pytest.fixture(scope="session")
+def gapfill(tmp_path_factory):
+    module = loadtest.load_app(tmp_path_factory.mktemp("gapfill"))
+    module.ensure_schema_migrated()
+    yield module
+    module.shutdown_worker()
+
+
+@pytest.fixture
+def client(gapfill):
+    return gapfill.app.test_client()
+
+
+@pytest.fixture
+def app_context(gapfill):
+    with gapfill.app.app_context():
+        yield
+
+
+@pytest.fixture
+def make_model(gapfill):
+    """ Inserts a gapfill_models row (defaults for every column not given) and returns its id. """
+    def insert(**values):
+        meta = {column: None for column in gapfill.GAPFILL_COLUMNS if column != "id"}
+        meta.update(Species_Name="E. coli", growth_media="LB", gapfill_algorithm="gapseq", annotation_tool="RAST",
+                    file_name="model.xml", file_link="xml_files/model.xml", growth_data="Growth")
+        meta.update(values)
+        with gapfill.app.app_context():
+            cur = gapfill.get_db_cursor()
+            model_id = gapfill.insert_gapfill_row(cur, meta)
+            gapfill.get_db_conn().commit()
+            cur.close()
+        return model_id
+    return insert
+
+
+@pytest.fixture
+def add_results(gapfill):
+    """ Inserts gap_filling_results rows given as (model_id, reaction_id, source_database). """
+    def insert(*rows):
+        with gapfill.app.app_context():
+            cur = gapfill.get_db_cursor()
+            for row in rows: cur.execute("INSERT INTO gap_filling_results (model_id, reaction_id, source_database) VALUES (?, ?, ?)", row)
+            gapfill.get_db_conn().commit()
+            cur.close()
+    return insert
+
+
+@pytest.fixture
+def failing_cursor(gapfill, monkeypatch):
+    """ Makes the next index scan fail after its first fetched batch. """
+    def install():
+        original = gapfill.get_db_cursor
+        def cursor(*args, **kwargs):
+            cur = original(*args, **kwargs)
+            fetchmany, batches = cur.fetchmany, []
+            def fail_after_first(size):
+                batches.append(size)
+                if len(batches) > 1: raise gapfill.mariadb.OperationalError("connection lost")
+                return fetchmany(size)
+            cur.fetchmany = fail_after_first
+            return cur
+        monkeypatch.setattr(gapfill, "get_db_cursor", cursor)
+        monkeypatch.setitem(gapfill.app.config, "STREAM_FETCH_SIZE", 1)
+    return install
@@ -0,0 +1,96 @@
+import io
+import json
+import time
+import uuid
+import zipfile
+
+import pytest
+
+SBML = b'<sbml><model><listOfSpecies><species id="a" charge="-1"/></listOfSpecies><listOfReactions><reaction id="R1"><listOfReactants><speciesReference species="a"/></listOfReactants></reaction></listOfReactions></model></sbml>'
+
+
+@pytest.fixture
+def submit(gapfill, client, monkeypatch):
+    """ Posts a bulk import of `count` models (batch_size 2) and returns a function waiting for the finished job. """
+    monkeypatch.setitem(gapfill.app.config, "JOB_RETRY_DELAY", 0.01)
+    def post(count=6):
+        tag = uuid.uuid4().hex[:8]
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            for i in range(count): zf.writestr(f"m{i}.xml", SBML)
+        manifest = [{"file": f"m{i}.xml", "growth_media": f"bulk-{tag}-{i}", "gapfill_algorithm": "gapseq", "annotation_tool": "RAST"} for i in range(count)]
+        response = client.post("/api/models/bulk", content_type="multipart/form-data", data={
+            "manifest": (io.BytesIO(json.dumps(manifest).encode()), "manifest.json"),
+            "archive": (io.BytesIO(archive.getvalue()), "files.zip"),
+            "batch_size": "2",
+        })
+        assert response.status_code == 202, response.get_json()
+        return response.get_json()["job_id"]
+    yield post
+    gapfill.job_queue.shutdown()
+
+
+def wait_for(client, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").get_json()
+        if job["status"] in ("succeeded", "failed", "cancelled"): return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def model_count(gapfill, ids):
+    with gapfill.app.app_context():
+        cur = gapfill.get_db_cursor()
+        cur.execute(f"SELECT COUNT(*) FROM gapfill_models WHERE id IN ({', '.join('?' * len(ids))})", tuple(ids))
+        count = cur.fetchone()[0]
+        cur.close()
+    return count
+
+
+def test_bulk_import_inserts_every_valid_row(gapfill, client, submit):
+    job = wait_for(client, submit())
+    assert job["status"] == "succeeded"
+    assert (job["result"]["inserted"], job["result"]["failed"]) == (6, 0)
+    assert model_count(gapfill, job["result"]["ids"]) == 6
+
+
+def test_cancelled_import_reports_the_committed_batches(gapfill, client, submit, monkeypatch):
+    original, calls, job_ids = gapfill.insert_gapfill_rows, [], []
+    def cancel_during_second_batch(cur, rows):
+        calls.append(len(rows))
+        if len(calls) == 2: gapfill.job_queue.cancel(job_ids[0])
+        return original(cur, rows)
+    monkeypatch.setattr(gapfill, "insert_gapfill_rows", cancel_during_second_batch)
+    job_ids.append(submit())
+    job = wait_for(client, job_ids[0])
+    assert job["status"] == "cancelled"
+    batches = job["result"]["batches"]
+    assert [batch["rows"] for batch in batches] == [[1, 2], [3, 4]]
+    assert model_count(gapfill, [i for batch in batches for i in batch["ids"]]) == 4
+
+
+def test_retried_import_skips_the_batches_already_committed(gapfill, client, submit, monkeypatch):
+    original, calls = gapfill.insert_gapfill_rows, []
+    def fail_second_batch_once(cur, rows):
+        calls.append(len(rows))
+        if len(calls) == 2: raise gapfill.mariadb.OperationalError("connection lost")
+        return original(cur, rows)
+    monkeypatch.setattr(gapfill, "insert_gapfill_rows", fail_second_batch_once)
+    job = wait_for(client, submit())
+    assert (job["status"], job["attempts"]) == ("succeeded", 2)
+    assert (job["result"]["inserted"], job["result"]["failed"], job["result"]["errors"]) == (6, 0, [])
+    assert len(set(job["result"]["ids"])) == 6 and model_count(gapfill, job["result"]["ids"]) == 6
+    assert calls == [2, 2, 2, 2]
+
+
+def test_failed_import_keeps_the_committed_batches_in_its_result(gapfill, client, submit, monkeypatch):
+    original, calls = gapfill.insert_gapfill_rows, []
+    def fail_third_batch(cur, rows):
+        calls.append(len(rows))
+        if len(calls) == 3: raise RuntimeError("disk full")
+        return original(cur, rows)
+    monkeypatch.setattr(gapfill, "insert_gapfill_rows", fail_third_batch)
+    job = wait_for(client, submit())
+    assert job["status"] == "failed" and job["result"]["status_code"] == 500
+    assert [batch["rows"] for batch in job["result"]["batches"]] == [[1, 2], [3, 4]]
@@ -0,0 +1,23 @@
+import io
+
+
+def stored_objects(gapfill):
+    return sorted(digest for digest, _ in gapfill.content_store.iter_objects())
+
+
+def test_charge_distribution_of_a_csv_upload(client):
+    data = {"dataFile": (io.BytesIO(b"name,charge\nA,1\nB,-2\nC,1\n"), "charges.csv")}
+    response = client.post("/api/charges", data=data)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["count"], body["file_name"]) == (3, "charges.csv")
+    assert {row["charge"]: row["count"] for row in body["histogram"]} == {-2: 1, 1: 2}
+
+
+def test_unsupported_file_is_rejected_before_it_is_stored(gapfill, client):
+    before = stored_objects(gapfill)
+    response = client.post("/api/charges", data={"dataFile": (io.BytesIO(b"\x00" * 2048), "payload.bin")})
+    assert response.status_code == 400 and "Unsupported file type" in response.get_json()["error"]
+    assert client.post("/api/charges", data={"dataFile_ref": "sha256/" + "0" * 64 + "/payload.exe"}).status_code == 400
+    assert client.post("/api/charges").status_code == 400
+    assert stored_objects(gapfill) == before
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+
+class FakeConnection:
+    def __init__(self, mariadb):
+        self.mariadb = mariadb
+        self.alive = True
+        self.closed = False
+        self.pings = 0
+
+    def ping(self):
+        self.pings += 1
+        if not self.alive: raise self.mariadb.OperationalError("server has gone away")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def make_pool(gapfill):
+    def build(**kwargs):
+        opened = []
+        def connect():
+            opened.append(FakeConnection(gapfill.mariadb))
+            return opened[-1]
+        pool = gapfill.ConnectionPool(connect, **{"size": 2, "timeout": 0.05, **kwargs})
+        return pool, opened
+    return build
+
+
+def test_checkout_reuses_the_most_recently_released_connection(make_pool):
+    pool, opened = make_pool()
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert pool.acquire().conn is second.conn
+    stats = pool.stats()
+    assert (stats["open"], stats["in_use"], stats["checkouts"]) == (2, 1, 3)
+    assert len(opened) == 2
+
+
+def test_checkout_times_out_when_every_connection_is_in_use(gapfill, make_pool):
+    pool, _ = make_pool(size=1)
+    held = pool.acquire()
+    with pytest.raises(gapfill.mariadb.OperationalError, match="Timed out"):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    pool.release(held)
+    assert pool.acquire().conn is held.conn
+
+
+def test_waiting_checkout_gets_the_released_connection(make_pool):
+    pool, _ = make_pool(size=1, timeout=5.0)
+    held = pool.acquire()
+    threading.Timer(0.05, pool.release, (held,)).start()
+    assert pool.acquire().conn is held.conn
+    assert pool.stats()["wait_time_max_s"] > 0
+
+
+def test_idle_connection_is_pinged_and_replaced_when_dead(make_pool):
+    pool, opened = make_pool(idle_check=0.0)
+    entry = pool.acquire()
+    pool.release(entry)
+    entry.conn.alive = False
+    fresh = pool.acquire()
+    assert fresh.conn is opened[1] and opened[0].closed
+    assert opened[0].pings == 1
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_recently_used_connection_is_not_pinged(make_pool):
+    pool, opened = make_pool(idle_check=60.0)
+    pool.release(pool.acquire())
+    pool.acquire()
+    assert opened[0].pings == 0
+
+
+def test_connection_is_recycled_after_max_lifetime(make_pool):
+    pool, opened = make_pool(max_lifetime=60.0)
+    entry = pool.acquire()
+    pool.release(entry)
+    entry.created_at = time.monotonic() - 61
+    assert pool.acquire().conn is opened[1]
+    assert opened[0].closed and pool.stats()["open"] == 1
+
+
+def test_discarded_connection_frees_its_slot(make_pool):
+    pool, opened = make_pool(size=1)
+    pool.release(pool.acquire(), discard=True)
+    assert opened[0].closed
+    assert pool.acquire().conn is opened[1]
+
+
+def test_connect_error_is_counted_and_frees_the_slot(gapfill):
+    def connect():
+        raise gapfill.mariadb.OperationalError("connection refused")
+    pool = gapfill.ConnectionPool(connect, size=1, timeout=0.05)
+    with pytest.raises(gapfill.mariadb.OperationalError, match="refused"):
+        pool.acquire()
+    stats = pool.stats()
+    assert (stats["connect_errors"], stats["open"], stats["in_use"]) == (1, 0, 0)
+
+
+def test_requests_check_out_and_return_pooled_connections(gapfill, client):
+    pool = gapfill.get_db_pool()
+    before = pool.stats()["checkouts"]
+    assert client.get("/api/models?limit=1").status_code == 200
+    stats = pool.stats()
+    assert stats["checkouts"] > before and stats["in_use"] == 0
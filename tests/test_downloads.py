@@ -0,0 +1,77 @@
+import gzip
+import io
+import os
+
+import pytest
+
+DATA = os.urandom(5000)
+
+
+@pytest.fixture
+def stored(gapfill):
+    digest = gapfill.content_store.put_stream(io.BytesIO(DATA))[0]
+    return f"/download/{gapfill.make_ref(digest, 'model.xml')}", digest
+
+
+def test_full_download_is_immutable_and_tagged_with_the_hash(client, stored):
+    url, digest = stored
+    response = client.get(url)
+    assert (response.status_code, response.data) == (200, DATA)
+    assert response.headers["ETag"] == f'"{digest}"'
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert 'filename="model.xml"' in response.headers["Content-Disposition"]
+
+
+def test_range_request_returns_partial_content(client, stored):
+    response = client.get(stored[0], headers={"Range": "bytes=100-199"})
+    assert (response.status_code, response.data) == (206, DATA[100:200])
+    assert response.headers["Content-Range"] == f"bytes 100-199/{len(DATA)}"
+    assert client.get(stored[0], headers={"Range": "bytes=-10"}).data == DATA[-10:]
+
+
+def test_unsatisfiable_range_returns_416(client, stored):
+    response = client.get(stored[0], headers={"Range": f"bytes={len(DATA)}-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(DATA)}"
+
+
+def test_matching_etag_returns_304(client, stored):
+    url, digest = stored
+    response = client.get(url, headers={"If-None-Match": f'"{digest}"'})
+    assert (response.status_code, response.data) == (304, b"")
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_range_with_a_stale_etag_sends_the_whole_file(client, stored):
+    url, digest = stored
+    assert client.get(url, headers={"Range": "bytes=0-9", "If-Range": f'"{digest}"'}).status_code == 206
+    response = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert (response.status_code, response.data) == (200, DATA)
+
+
+def test_gzip_is_negotiated_and_ranges_apply_to_the_encoded_body(gapfill, client, stored, monkeypatch):
+    monkeypatch.setitem(gapfill.app.config, "DOWNLOAD_COMPRESS_MIN_SIZE", 1)
+    url, digest = stored
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == f'"{digest}-gzip"'
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data) == DATA
+    partial = client.get(url, headers={"Accept-Encoding": "gzip", "Range": "bytes=0-9"})
+    assert (partial.status_code, partial.data) == (206, response.data[:10])
+
+
+def test_legacy_upload_path_is_served_with_revalidation(gapfill, client):
+    legacy = gapfill.UPLOAD_FOLDER / "xml_files" / "legacy.xml"
+    legacy.parent.mkdir(parents=True, exist_ok=True)
+    legacy.write_bytes(b"<sbml/>")
+    response = client.get("/download/xml_files/legacy.xml")
+    assert (response.status_code, response.data) == (200, b"<sbml/>")
+    assert "immutable" not in response.headers.get("Cache-Control", "")
+    assert client.get("/download/xml_files/legacy.xml", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+@pytest.mark.parametrize("path, status", [("xml_files/missing.xml", 404), ("../app.py", 400), (".partial/x", 400), ("sha256/" + "0" * 64 + "/x.xml", 404)])
+def test_missing_and_unsafe_paths_are_refused(client, path, status):
+    assert client.get(f"/download/{path}").status_code == status
@@ -0,0 +1,120 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def queue(gapfill, app_context, monkeypatch):
+    monkeypatch.setitem(gapfill.app.config, "JOB_RETRY_DELAY", 0.01)
+    monkeypatch.setitem(gapfill.app.config, "JOB_HEARTBEAT_INTERVAL", 0.05)
+    monkeypatch.setitem(gapfill.app.config, "JOB_STALE_AFTER", 60.0)
+    yield gapfill.job_queue
+    gapfill.job_queue.shutdown()
+
+
+@pytest.fixture
+def handler(gapfill, monkeypatch):
+    """ Registers `func` as the handler of a fresh job kind and returns the kind. """
+    def register(func):
+        kind = f"test-{uuid.uuid4().hex[:8]}"
+        monkeypatch.setitem(gapfill.JOB_HANDLERS, kind, func)
+        return kind
+    return register
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("succeeded", "failed", "cancelled"): return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def insert_running_job(queue, kind, heartbeat_at, attempts=1, max_attempts=3):
+    job_id = uuid.uuid4().hex
+    queue._execute(
+        "INSERT INTO upload_jobs (id, kind, status, progress, attempts, max_attempts, payload, created_at, updated_at, owner, heartbeat_at)"
+        " VALUES (?, ?, 'running', 0, ?, ?, '{}', ?, ?, 'elsewhere:1', ?)",
+        (job_id, kind, attempts, max_attempts, heartbeat_at, heartbeat_at, heartbeat_at),
+    )
+    return job_id
+
+
+def test_job_runs_and_stores_its_result(queue, handler):
+    kind = handler(lambda job: {"echo": job.payload["value"]})
+    job = wait_for(queue, queue.submit(kind, {"value": 42}))
+    assert (job["status"], job["result"], job["attempts"], job["progress"]) == ("succeeded", {"echo": 42}, 1, 100)
+
+
+def test_transient_db_error_is_retried(gapfill, queue, handler):
+    attempts = []
+    def flaky(job):
+        attempts.append(job.attempts)
+        if job.attempts == 1: raise gapfill.mariadb.OperationalError("connection lost")
+        return {"ok": True}
+    job = wait_for(queue, queue.submit(handler(flaky), {}))
+    assert job["status"] == "succeeded" and attempts == [1, 2]
+
+
+def test_job_fails_once_its_attempts_are_used_up(gapfill, queue, handler):
+    def broken(job):
+        raise gapfill.mariadb.OperationalError("connection lost")
+    job = wait_for(queue, queue.submit(handler(broken), {}, max_attempts=2))
+    assert (job["status"], job["attempts"], job["result"]) == ("failed", 2, {"status_code": 503})
+
+
+def test_permanent_failure_is_not_retried(gapfill, queue, handler):
+    def rejected(job):
+        raise gapfill.JobFailed("bad input", 422)
+    job = wait_for(queue, queue.submit(handler(rejected), {}))
+    assert (job["status"], job["attempts"], job["error"], job["result"]) == ("failed", 1, "bad input", {"status_code": 422})
+
+
+def test_running_job_refreshes_its_heartbeat(queue, handler):
+    kind = handler(lambda job: time.sleep(0.4))
+    job_id = queue.submit(kind, {})
+    time.sleep(0.1)
+    first = queue._fetch(job_id, "heartbeat_at, owner")
+    time.sleep(0.2)
+    assert first["owner"] == queue.owner
+    assert queue._fetch(job_id, "heartbeat_at")["heartbeat_at"] > first["heartbeat_at"]
+    assert wait_for(queue, job_id)["status"] == "succeeded"
+
+
+def test_recover_requeues_a_job_whose_lease_expired(queue, handler):
+    kind = handler(lambda job: {"attempt": job.attempts})
+    job_id = insert_running_job(queue, kind, datetime.now() - timedelta(minutes=5))
+    queue.recover()
+    job = wait_for(queue, job_id)
+    assert (job["status"], job["result"]) == ("succeeded", {"attempt": 2})
+
+
+def test_recover_leaves_a_job_with_a_live_heartbeat(queue, handler):
+    kind = handler(lambda job: {"stolen": True})
+    job_id = insert_running_job(queue, kind, datetime.now())
+    queue.recover()
+    time.sleep(0.1)
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"]) == ("running", 1)
+
+
+def test_recover_fails_an_expired_job_without_attempts_left(queue, handler):
+    kind = handler(lambda job: {"ran": True})
+    job_id = insert_running_job(queue, kind, datetime.now() - timedelta(minutes=5), attempts=3, max_attempts=3)
+    queue.recover()
+    job = queue.get(job_id)
+    assert (job["status"], job["error"]) == ("failed", "Worker stopped while processing the job.")
+
+
+def test_running_job_stops_at_its_next_checkpoint_when_cancelled(queue, handler):
+    def long_running(job):
+        for _ in range(100):
+            time.sleep(0.02)
+            job.check_cancelled()
+    job_id = queue.submit(handler(long_running), {})
+    time.sleep(0.1)
+    queue.cancel(job_id)
+    assert wait_for(queue, job_id)["status"] == "cancelled"
@@ -0,0 +1,69 @@
+import logging
+
+import pytest
+
+
+@pytest.fixture
+def fresh_db(gapfill, tmp_path):
+    conn = gapfill.mariadb.Connection(str(tmp_path / "fresh.sqlite"))
+    yield conn
+    conn.close()
+
+
+def applied_versions(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT version FROM schema_migrations ORDER BY version")
+    versions = [row[0] for row in cur.fetchall()]
+    cur.close()
+    return versions
+
+
+def test_versions_are_contiguous_and_ascending(gapfill):
+    versions = [version for version, _, _ in gapfill.MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+    assert gapfill.JOBS_SCHEMA_VERSION in versions
+
+
+def test_migrations_apply_in_order_up_to_the_target(gapfill, fresh_db, caplog):
+    latest = gapfill.MIGRATIONS[-1][0]
+    with caplog.at_level(logging.INFO, logger=gapfill.app.logger.name):
+        assert gapfill.migrate(fresh_db, target=3) == (3, [(v, n) for v, n, _ in gapfill.MIGRATIONS[:3]])
+        version, applied = gapfill.migrate(fresh_db)
+    assert version == latest and [v for v, _ in applied] == list(range(4, latest + 1))
+    logged = [int(record.getMessage().split()[3]) for record in caplog.records if record.getMessage().startswith("Applied schema migration")]
+    assert logged == list(range(1, latest + 1))
+    assert applied_versions(fresh_db) == list(range(1, latest + 1))
+    assert gapfill.migrate(fresh_db) == (latest, [])
+
+
+def test_dry_run_lists_pending_migrations_without_applying_them(gapfill, fresh_db):
+    gapfill.migrate(fresh_db, target=2)
+    version, pending = gapfill.migrate(fresh_db, dry_run=True)
+    assert version == 2 and [v for v, _ in pending] == list(range(3, gapfill.MIGRATIONS[-1][0] + 1))
+    assert applied_versions(fresh_db) == [1, 2]
+
+
+def test_appended_migration_runs_once_after_the_released_ones(gapfill, fresh_db, monkeypatch):
+    gapfill.migrate(fresh_db)
+    latest = gapfill.MIGRATIONS[-1][0]
+    monkeypatch.setattr(gapfill, "MIGRATIONS", gapfill.MIGRATIONS + [(latest + 1, "test table", ["CREATE TABLE migration_probe (id INT PRIMARY KEY)"])])
+    assert gapfill.migrate(fresh_db) == (latest + 1, [(latest + 1, "test table")])
+    assert gapfill.migrate(fresh_db) == (latest + 1, [])
+
+
+def test_edited_migration_is_reported_not_rerun(gapfill, fresh_db, monkeypatch, caplog):
+    gapfill.migrate(fresh_db)
+    edited = [(1, "catalog tables", ["CREATE TABLE never_created (id INT)"])] + gapfill.MIGRATIONS[1:]
+    monkeypatch.setattr(gapfill, "MIGRATIONS", edited)
+    with caplog.at_level(logging.WARNING):
+        assert gapfill.migrate(fresh_db)[1] == []
+    assert "Migration 1 (catalog tables) was edited" in caplog.text
+    cur = fresh_db.cursor()
+    with pytest.raises(gapfill.mariadb.Error):
+        cur.execute("SELECT * FROM never_created")
+
+
+def test_migrate_command_reports_the_schema_version(gapfill):
+    result = gapfill.app.test_cli_runner().invoke(args=["migrate", "--dry-run"])
+    assert result.exit_code == 0
+    assert f"Schema version {gapfill.MIGRATIONS[-1][0]}" in result.output
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def model_ids(gapfill, make_model):
+    for i in range(7): make_model(Species_Name=f"Keyset species {i}")
+    with gapfill.app.app_context():
+        cur = gapfill.get_db_cursor()
+        cur.execute("SELECT id FROM gapfill_models ORDER BY id DESC")
+        ids = [row[0] for row in cur.fetchall()]
+        cur.close()
+    return ids
+
+
+def test_keyset_pages_walk_every_model_once(client, model_ids):
+    seen, after_id = [], None
+    while True:
+        response = client.get("/api/models", query_string={"limit": 3, "fields": "id", **({"after_id": after_id} if after_id else {})})
+        assert response.status_code == 200
+        page = [row["id"] for row in response.get_json()]
+        seen += page
+        after_id = response.headers.get("X-Next-After-Id")
+        if after_id is None: break
+        assert int(after_id) == page[-1] and 'rel="next"' in response.headers["Link"]
+    assert seen == model_ids
+
+
+def test_next_link_continues_after_the_last_row(client, model_ids):
+    first = client.get("/api/models?limit=2&fields=id,Species_Name")
+    link = first.headers["Link"].split(">")[0].lstrip("<")
+    second = client.get(link)
+    assert [row["id"] for row in second.get_json()] == model_ids[2:4]
+    assert set(second.get_json()[0]) == {"id", "Species_Name"}
+
+
+def test_bad_paging_arguments_are_rejected(client):
+    assert client.get("/api/models?limit=0").status_code == 400
+    assert client.get("/api/models?stream=xml").status_code == 400
+
+
+@pytest.mark.parametrize("mode", ["ndjson", "json"])
+def test_stream_returns_every_model(client, model_ids, mode):
+    response = client.get(f"/api/models?stream={mode}&fields=id")
+    body = response.get_data(as_text=True)
+    rows = json.loads(body) if mode == "json" else [json.loads(line) for line in body.splitlines()]
+    assert [row["id"] for row in rows] == model_ids
+
+
+@pytest.mark.parametrize("mode", ["ndjson", "json"])
+def test_stream_ends_with_an_error_record_when_the_database_fails(gapfill, client, model_ids, monkeypatch, mode):
+    original = gapfill.iter_dict_rows
+    def failing(cur, batch_size=None):
+        for count, row in enumerate(original(cur, batch_size)):
+            if count == 3: raise gapfill.mariadb.OperationalError("connection lost")
+            yield row
+    monkeypatch.setattr(gapfill, "iter_dict_rows", failing)
+    body = client.get(f"/api/models?stream={mode}&fields=id").get_data(as_text=True)
+    rows = json.loads(body) if mode == "json" else [json.loads(line) for line in body.splitlines()]
+    assert [row["id"] for row in rows[:-1]] == model_ids[:3]
+    assert rows[-1]["streamed"] == 3 and "error" in rows[-1]
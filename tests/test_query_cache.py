@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+SQL = "SELECT id FROM gapfill_models WHERE growth_media = ?"
+
+
+@pytest.fixture
+def make_cache(gapfill):
+    def build(shared_client=None, max_entries=64):
+        shared = gapfill.SharedCacheBackend(shared_client) if shared_client is not None else None
+        return gapfill.QueryCache(gapfill.LocalCacheBackend(max_entries), shared, ttl=60)
+    return build
+
+
+def test_invalidation_makes_older_entries_unreachable(make_cache):
+    cache = make_cache()
+    key = cache.make_key(SQL, ("LB",), ("gapfill_models",))
+    other = cache.make_key("SELECT 1 FROM metabolic_reactions", (), ("metabolic_reactions",))
+    cache.set(key, [{"id": 1}])
+    cache.set(other, [{"1": 1}])
+    cache.invalidate("gapfill_models")
+    new_key = cache.make_key(SQL, ("LB",), ("gapfill_models",))
+    assert new_key != key and cache.get(new_key) is None
+    assert cache.make_key("SELECT 1 FROM metabolic_reactions", (), ("metabolic_reactions",)) == other
+    assert cache.get(other) == [{"1": 1}]
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_keys_ignore_whitespace_but_not_parameters(make_cache):
+    cache = make_cache()
+    assert cache.make_key(SQL, ("LB",), ("gapfill_models",)) == cache.make_key(SQL.replace(" ", "  "), ("LB",), ("gapfill_models",))
+    assert cache.make_key(SQL, ("LB",), ("gapfill_models",)) != cache.make_key(SQL, ("M9",), ("gapfill_models",))
+
+
+def test_workers_sharing_a_backend_see_each_others_invalidations(gapfill, make_cache):
+    client = gapfill.InMemoryCacheClient()
+    first, second = make_cache(client), make_cache(client)
+    key = first.make_key(SQL, ("LB",), ("gapfill_models",))
+    first.set(key, [{"id": 1}])
+    assert second.get(key) == [{"id": 1}] and second.shared_hits == 1
+    second.invalidate("gapfill_models")
+    assert first.generation("gapfill_models") == 1
+    assert first.make_key(SQL, ("LB",), ("gapfill_models",)) != key
+    assert first.invalidated_at(["gapfill_models"]) > 0
+
+
+def test_concurrent_invalidations_each_move_the_generation(gapfill, make_cache):
+    client = gapfill.InMemoryCacheClient()
+    caches = [make_cache(client) for _ in range(4)]
+    def invalidate(cache):
+        for _ in range(100): cache.invalidate("gapfill_models")
+    threads = [threading.Thread(target=invalidate, args=(cache,)) for cache in caches]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert caches[0].generation("gapfill_models") == 400
+
+
+def test_local_backend_evicts_least_recently_used_and_expired_entries(gapfill):
+    local = gapfill.LocalCacheBackend(max_entries=2)
+    local.set("a", 1, 60)
+    local.set("b", 2, 60)
+    local.get("a")
+    local.set("c", 3, 60)
+    assert (local.get("a"), local.get("b"), local.get("c")) == (1, None, 3)
+    assert local.evictions == 1
+    local.delete("a")
+    local.set("d", 4, -1)
+    assert local.get("d") is None and local.evictions == 2 and len(local) == 1
+
+
+def test_cached_query_serves_cached_rows_until_the_table_is_invalidated(gapfill, app_context, make_cache, make_model, monkeypatch):
+    cache = make_cache()
+    monkeypatch.setattr(gapfill, "query_cache", cache)
+    first = make_model(growth_media="cachetest broth")
+    assert gapfill.cached_query(SQL, ("cachetest broth",)) == [{"id": first}]
+    second = make_model(growth_media="cachetest broth")
+    assert gapfill.cached_query(SQL, ("cachetest broth",)) == [{"id": first}]
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.invalidate("gapfill_models")
+    assert gapfill.cached_query(SQL, ("cachetest broth",)) == [{"id": first}, {"id": second}]
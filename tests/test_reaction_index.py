@@ -0,0 +1,25 @@
+import pytest
+
+
+def test_reaction_index_lists_models_per_reaction(gapfill, app_context, add_results, monkeypatch):
+    add_results(("idx_m2", "rxn_idx_a", "kegg"), ("idx_m1", "rxn_idx_a", "modelseed"), ("idx_m1", "rxn_idx_a", "kegg"))
+    index = gapfill.ReactionModelIndex()
+    index.sync()
+    assert index.models_for("rxn_idx_a") == [("idx_m1", ["kegg", "modelseed"]), ("idx_m2", ["kegg"])]
+    assert index.models_for("rxn_idx_a", source="modelseed") == [("idx_m1", ["modelseed"])]
+    add_results(("idx_m3", "rxn_idx_a", "kegg"))
+    monkeypatch.setitem(gapfill.app.config, "REACTION_INDEX_SYNC_INTERVAL", 0)
+    index.sync()
+    assert [model for model, _ in index.models_for("rxn_idx_a")] == ["idx_m1", "idx_m2", "idx_m3"]
+
+
+def test_failed_reaction_index_rebuild_keeps_the_current_index(gapfill, app_context, add_results, failing_cursor):
+    add_results(("keep_m1", "rxn_keep", "kegg"))
+    index = gapfill.ReactionModelIndex()
+    index.sync()
+    before = index.stats()
+    failing_cursor()
+    with pytest.raises(gapfill.mariadb.OperationalError):
+        index.sync(force_rebuild=True)
+    assert index.stats() == before
+    assert index.models_for("rxn_keep") == [("keep_m1", ["kegg"])]
@@ -0,0 +1,23 @@
+import pytest
+
+
+def test_reaction_sets_compare_models(gapfill, app_context, add_results):
+    add_results(("set_a", "rxn_s1", "x"), ("set_a", "rxn_s2", "x"), ("set_b", "rxn_s2", "x"), ("set_b", "rxn_s3", "x"))
+    index = gapfill.ReactionSetIndex("gap_filling_results", "model_id")
+    index.sync()
+    result = index.compare(["set_a", "set_b"], list_limit=10)
+    assert (result["common_reactions"], result["union"], result["jaccard"][0][1]) == (["rxn_s2"], 3, round(1 / 3, 4))
+    assert [model["unique_reactions"] for model in result["models"]] == [["rxn_s1"], ["rxn_s3"]]
+
+
+def test_failed_reaction_set_sync_leaves_the_sets_unchanged(gapfill, app_context, add_results, failing_cursor):
+    add_results(("atomic_a", "rxn_t1", "x"))
+    index = gapfill.ReactionSetIndex("gap_filling_results", "model_id")
+    index.sync()
+    before = index.stats()
+    add_results(("atomic_a", "rxn_t2", "x"), ("atomic_b", "rxn_t3", "x"))
+    failing_cursor()
+    with pytest.raises(gapfill.mariadb.OperationalError):
+        index.sync(force=True)
+    assert index.stats() == before
+    assert index.members(index._sets["atomic_a"]) == ["rxn_t1"]
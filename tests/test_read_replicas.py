@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline: raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def router(gapfill, monkeypatch):
+    monkeypatch.setitem(gapfill.app.config, "DB_REPLICAS", [{"host": "replica-a"}, {"host": "replica-b"}])
+    monkeypatch.setitem(gapfill.app.config, "DB_REPLICA_LAG_CHECK", 0.05)
+    monkeypatch.setattr(gapfill.mariadb, "REPLICATION_LAG", 0)
+    monkeypatch.setattr(gapfill, "db_replicas", None)
+    router = gapfill.get_db_replicas()
+    router.start()
+    wait_until(lambda: all(replica.healthy() for replica in router.replicas))
+    yield router
+    router.close_all()
+
+
+def replica_reads(router):
+    return sum(replica.reads for replica in router.replicas)
+
+
+def test_reads_are_spread_over_healthy_replicas(client, router):
+    for _ in range(4): assert client.get("/api/models?limit=1").status_code == 200
+    assert [replica.reads for replica in router.replicas] == [2, 2]
+    assert router.primary_fallbacks == 0
+
+
+@pytest.mark.parametrize("lag", [60, None])
+def test_lagging_or_stopped_replicas_fall_back_to_the_primary(gapfill, client, router, monkeypatch, lag):
+    monkeypatch.setattr(gapfill.mariadb, "REPLICATION_LAG", lag)
+    wait_until(lambda: not any(replica.healthy() for replica in router.replicas))
+    assert client.get("/api/models?limit=1").status_code == 200
+    assert (replica_reads(router), router.primary_fallbacks) == (0, 1)
+    monkeypatch.setattr(gapfill.mariadb, "REPLICATION_LAG", 0)
+    wait_until(lambda: all(replica.healthy() for replica in router.replicas))
+    client.get("/api/models?limit=1")
+    assert replica_reads(router) == 1
+
+
+def test_lag_is_measured_off_the_request_path(gapfill, client, router, monkeypatch):
+    threads = []
+    def measure(replica):
+        threads.append(threading.current_thread().name)
+        return 0.0
+    monkeypatch.setattr(gapfill.ReplicaPool, "_measure", measure)
+    for _ in range(20): client.get("/api/models?limit=1")
+    wait_until(lambda: len(threads) >= 4)
+    assert set(threads) == {"replica-lag"}
+
+
+def test_replica_with_a_stale_lag_check_gets_no_reads(router):
+    router.close_all()  # stops the lag checks
+    replica = router.replicas[0]
+    replica.checked_at = time.time() - (replica.STALE_CHECKS + 1) * replica.check_interval
+    assert not replica.usable()
+
+
+def test_recent_write_reads_from_a_replica_that_has_applied_it(gapfill, client, router):
+    wrote_at = time.time()
+    client.get("/api/models?limit=1", headers={"X-Last-Write": f"{wrote_at:.3f}"})
+    assert (replica_reads(router), router.primary_fallbacks) == (0, 1)
+    client.set_cookie(gapfill.LAST_WRITE_COOKIE, f"{wrote_at:.3f}")
+    client.get("/api/models?limit=1")
+    assert (replica_reads(router), router.primary_fallbacks) == (0, 2)
+    time.sleep(1.2)  # Seconds_Behind_Master has one-second resolution
+    wait_until(lambda: all(replica.applied_through() >= wrote_at for replica in router.replicas))
+    client.get("/api/models?limit=1")
+    assert replica_reads(router) == 1
+
+
+def test_expired_last_write_no_longer_pins_reads_to_the_primary(gapfill, client, router):
+    old = time.time() - gapfill.app.config["DB_READ_YOUR_WRITES"] - 1
+    client.get("/api/models?limit=1", headers={"X-Last-Write": f"{old:.3f}"})
+    assert (replica_reads(router), router.primary_fallbacks) == (1, 0)
+
+
+def test_write_sets_the_last_write_header_and_cookie(gapfill, router):
+    with gapfill.app.test_request_context("/"):
+        gapfill.note_write(1234.5)
+        response = gapfill.remember_last_write(gapfill.app.response_class("ok"))
+    assert response.headers["X-Last-Write"] == "1234.500"
+    cookie = response.headers["Set-Cookie"]
+    assert cookie.startswith(f"{gapfill.LAST_WRITE_COOKIE}=1234.500") and "HttpOnly" in cookie
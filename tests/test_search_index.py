@@ -0,0 +1,77 @@
+import pytest
+
+
+@pytest.fixture
+def index(gapfill, app_context):
+    index = gapfill.SearchIndex()
+    index.sync()
+    return index
+
+
+def test_matches_rank_by_field_weight_then_exact_token(index, make_model):
+    species_exact = make_model(Species_Name="Zorbose eater", growth_media="M9")
+    media_prefix = make_model(growth_media="zorbosex broth")
+    media_exact = make_model(growth_media="zorbose broth")
+    index.sync(force_rebuild=True)
+    assert index.query("zorbose") == ([media_exact, media_prefix, species_exact], 3)
+
+
+def test_equal_scores_list_the_newest_model_first(index, make_model):
+    older, newer = make_model(growth_media="quillet agar"), make_model(growth_media="quillet agar")
+    index.sync(force_rebuild=True)
+    assert index.query("quillet")[0] == [newer, older]
+
+
+def test_terms_are_and_combined_and_can_target_one_field(index, make_model):
+    both = make_model(growth_media="vandrel", annotation_tool="prokka")
+    make_model(growth_media="vandrel", annotation_tool="RAST")
+    make_model(Species_Name="Vandrel coli", annotation_tool="prokka")
+    index.sync(force_rebuild=True)
+    assert index.query("vandrel prokka")[0][0] == both
+    assert index.query("media:vandrel tool:prokka") == ([both], 1)
+    with pytest.raises(ValueError, match="Unknown search field"):
+        index.query("colour:red")
+
+
+def test_growth_filter_and_limit(index, make_model):
+    growing = make_model(growth_media="plenth", growth_data="Growth")
+    not_growing = [make_model(growth_media="plenth", growth_data="No Growth") for _ in range(3)]
+    index.sync(force_rebuild=True)
+    assert index.query("plenth", "growth") == ([growing], 1)
+    assert index.query("plenth", "no_growth", limit=2) == (not_growing[::-1][:2], 3)
+
+
+def test_incremental_sync_picks_up_new_rows_after_the_interval(gapfill, index, make_model, monkeypatch):
+    model_id = make_model(growth_media="brindle")
+    index.sync()
+    assert index.query("brindle") == ([], 0)  # within SEARCH_SYNC_INTERVAL
+    monkeypatch.setitem(gapfill.app.config, "SEARCH_SYNC_INTERVAL", 0)
+    index.sync()
+    assert index.query("brindle") == ([model_id], 1)
+    assert index.max_id >= model_id
+
+
+def test_added_document_is_searchable_immediately(index):
+    index.add_document(10**9, {"growth_media": "saffrel", "growth_data": "Growth"})
+    assert index.query("saffrel", "growth") == ([10**9], 1)
+    assert index.query("")[0][0] == 10**9
+
+
+def test_failed_rebuild_keeps_serving_the_current_index(gapfill, index, make_model, monkeypatch):
+    model_id = make_model(growth_media="tarvish")
+    index.sync(force_rebuild=True)
+    def broken_cursor(*args, **kwargs):
+        raise gapfill.mariadb.OperationalError("connection lost")
+    monkeypatch.setattr(gapfill, "get_db_cursor", broken_cursor)
+    with pytest.raises(gapfill.mariadb.OperationalError):
+        index.sync(force_rebuild=True)
+    assert index.query("tarvish") == ([model_id], 1)
+
+
+def test_search_route_returns_ranked_rows(gapfill, client, make_model):
+    model_id = make_model(growth_media="welkin medium")
+    with gapfill.app.app_context(): gapfill.search_index.sync(force_rebuild=True)
+    response = client.post("/search?format=json", data={"media_search": "welkin", "growth_filter": "growth"})
+    assert response.status_code == 200
+    assert response.get_json()["total"] == 1
+    assert [row["id"] for row in response.get_json()["results"]] == [model_id]
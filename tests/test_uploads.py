@@ -0,0 +1,81 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+DATA = os.urandom(3000)
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_store_deduplicates_by_sha256(gapfill, tmp_path, compression):
+    store = gapfill.ContentStore(tmp_path, compression=compression, chunk_size=1024)
+    digest, size, deduplicated = store.put_stream(io.BytesIO(DATA))
+    assert (digest, size, deduplicated) == (hashlib.sha256(DATA).hexdigest(), len(DATA), False)
+    assert store.put_stream(io.BytesIO(DATA)) == (digest, len(DATA), True)
+    assert [found for found, _ in store.iter_objects()] == [digest]
+    assert store.locate(digest)[1] == compression
+    with store.open(digest) as fh: assert fh.read() == DATA
+    assert not any((tmp_path / ".tmp").iterdir())
+
+
+def test_store_rejects_malformed_digests(gapfill, tmp_path):
+    store = gapfill.ContentStore(tmp_path)
+    assert store.locate("../../etc/passwd") == (None, None)
+    with pytest.raises(FileNotFoundError):
+        store.open("0" * 64)
+
+
+def start_upload(client, size=len(DATA), filename="model.xml"):
+    response = client.post("/api/uploads", json={"filename": filename, "size": size})
+    assert response.status_code == 201
+    return response.get_json()["upload_id"]
+
+
+def put_chunk(client, upload_id, start, chunk, total=len(DATA)):
+    content_range = f"bytes {start}-{start + len(chunk) - 1}/{total}"
+    return client.put(f"/api/uploads/{upload_id}", data=chunk, headers={"Content-Range": content_range})
+
+
+def test_resumable_upload_resumes_from_the_reported_offset(gapfill, client):
+    upload_id = start_upload(client)
+    assert put_chunk(client, upload_id, 0, DATA[:1000]).get_json()["offset"] == 1000
+    assert client.get(f"/api/uploads/{upload_id}").get_json()["offset"] == 1000
+    response = client.put(f"/api/uploads/{upload_id}", data=DATA[1000:], headers={"Upload-Offset": "1000"})
+    assert response.get_json()["offset"] == len(DATA)
+    done = client.post(f"/api/uploads/{upload_id}/complete").get_json()
+    digest = hashlib.sha256(DATA).hexdigest()
+    assert (done["sha256"], done["size"], done["ref"]) == (digest, len(DATA), f"sha256/{digest}/model.xml")
+    with gapfill.content_store.open(digest) as fh: assert fh.read() == DATA
+    assert client.get(f"/api/uploads/{upload_id}").status_code == 404
+
+
+def test_identical_upload_is_deduplicated(client):
+    for deduplicated in (False, True):
+        data = DATA[:100]
+        upload_id = start_upload(client, size=len(data))
+        put_chunk(client, upload_id, 0, data, total=len(data))
+        assert client.post(f"/api/uploads/{upload_id}/complete").get_json()["deduplicated"] is deduplicated
+
+
+def test_chunk_at_the_wrong_offset_is_rejected_with_the_current_one(client):
+    upload_id = start_upload(client)
+    put_chunk(client, upload_id, 0, DATA[:1000])
+    for start in (0, 1500):
+        response = put_chunk(client, upload_id, start, DATA[start:start + 500])
+        assert (response.status_code, response.get_json()["offset"]) == (409, 1000)
+    assert client.get(f"/api/uploads/{upload_id}").get_json()["offset"] == 1000
+
+
+def test_incomplete_or_oversized_uploads_are_refused(client):
+    upload_id = start_upload(client, size=1000)
+    put_chunk(client, upload_id, 0, DATA[:600], total=1000)
+    response = client.post(f"/api/uploads/{upload_id}/complete")
+    assert (response.status_code, response.get_json()["offset"]) == (409, 600)
+    assert put_chunk(client, upload_id, 600, DATA[600:1600], total=1000).status_code == 413
+
+
+def test_upload_ids_and_filenames_are_validated(client):
+    assert client.post("/api/uploads", json={"filename": "../"}).status_code == 400
+    assert client.post("/api/uploads", json={"filename": "a.xml", "size": -1}).status_code == 400
+    assert client.get("/api/uploads/not-an-id").status_code == 404